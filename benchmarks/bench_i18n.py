@@ -0,0 +1,72 @@
+"""
+i18n microbenchmark: tr() lookups as the GUI makes them, against the previous lookup path
+Created by Aviel.AI
+
+Usage: python benchmarks/bench_i18n.py [--number 200000] [--repeat 5] [--lang he] [--json]
+Each case is timed with timeit (best of --repeat); "before" is the lookup tr() did up to v2.2 - the translator
+fetched per call, two dict lookups and str.format(**kwargs) - kept here as the reference.
+"""
+
+import argparse
+import json
+import sys
+import time
+import timeit
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import i18n
+from i18n import BUILT_IN_TRANSLATIONS, Translation, get_translator, tr
+
+def tr_before(key: str, **kwargs) -> str:
+    translation = BUILT_IN_TRANSLATIONS.get(get_translator().current_language, {}).get(key, key)
+    if kwargs:
+        try: return translation.format(**kwargs)
+        except (KeyError, ValueError): return translation
+    return translation
+
+def progress_event(t):
+    """The four strings update_dl_progress builds per progress event"""
+    t("download_current", filename="video_1234.mp4"); t("download_progress", current=120, total=480)
+    t("download_eta", eta="3:20"); t("download_speed", speed="12.4 MB/s")
+
+def steps(t):
+    """init_ui's step labels"""
+    t("step_setup"); t("step_scan"); t("step_select"); t("step_download")
+
+CASES = {
+    'plain': lambda t: t("btn_start_scan"),
+    'formatted': lambda t: t("download_progress", current=120, total=480),
+    'missing_key': lambda t: t("no_such_key"),
+    'progress_event': progress_event,
+    'init_ui_steps': steps,
+}
+
+def best_us(fn, number: int, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number * 1e6
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--number', type=int, default=200000, help="calls per timing")
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--lang', default='he', choices=sorted(BUILT_IN_TRANSLATIONS))
+    ap.add_argument('--json', action='store_true', help="one JSON object, for tracking across releases")
+    args = ap.parse_args()
+
+    get_translator().set_language(args.lang)
+    results = {}
+    for name, case in CASES.items():
+        before, after = best_us(lambda: case(tr_before), args.number, args.repeat), best_us(lambda: case(tr), args.number, args.repeat)
+        results[name] = {'before_us': round(before, 3), 'after_us': round(after, 3), 'speedup': round(before / after, 2)}
+    t = time.perf_counter(); translator = Translation(args.lang); construct = time.perf_counter() - t
+    t = time.perf_counter(); translator.set_language('en' if args.lang != 'en' else 'he'); switch = time.perf_counter() - t
+    report = {'lang': args.lang, 'cases': results, 'construct_us': round(construct * 1e6, 1), 'set_language_us': round(switch * 1e6, 1),
+              'translations_dir': i18n.TRANSLATIONS_DIR.exists()}
+    if args.json: print(json.dumps(report)); return
+    print(f"{'case':>15} | {'before':>9} | {'after':>9} | speedup")
+    for name, r in results.items(): print(f"{name:>15} | {r['before_us']:>6.3f} us | {r['after_us']:>6.3f} us | {r['speedup']:.2f}x")
+    print(f"\nTranslation(): {report['construct_us']:.0f} us, set_language: {report['set_language_us']:.0f} us")
+
+if __name__ == '__main__': main()
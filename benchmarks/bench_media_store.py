@@ -0,0 +1,79 @@
+"""
+Memory benchmark: scan results as dicts holding Message objects vs MediaStore
+Created by Aviel.AI
+
+Usage: python benchmarks/bench_media_store.py [--counts 10000 100000 200000]
+"""
+
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from telethon.tl.types import (
+    Message, PeerChannel, MessageMediaPhoto, MessageMediaDocument, Photo, PhotoSize,
+    Document, DocumentAttributeFilename, DocumentAttributeVideo
+)
+from core.media_store import MediaStore, type_for_name, TYPES
+
+EXTS = ['mp4', 'mkv', 'zip', 'pdf', 'jpg', 'bin']
+
+def make_message(i: int, rnd: random.Random) -> Message:
+    """A message shaped like what get_messages returns for a media post"""
+    date = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i)
+    if rnd.random() < 0.3:
+        media = MessageMediaPhoto(photo=Photo(
+            id=rnd.getrandbits(62), access_hash=rnd.getrandbits(62), file_reference=rnd.randbytes(29), date=date, dc_id=4,
+            sizes=[PhotoSize('m', 320, 240, 15000), PhotoSize('x', 800, 600, 60000), PhotoSize('y', 1280, 960, 140000)]))
+    else:
+        ext = rnd.choice(EXTS)
+        media = MessageMediaDocument(document=Document(
+            id=rnd.getrandbits(62), access_hash=rnd.getrandbits(62), file_reference=rnd.randbytes(29), date=date,
+            mime_type='application/octet-stream', size=rnd.randint(10_000, 2_000_000_000), dc_id=4,
+            attributes=[DocumentAttributeVideo(duration=120, w=1280, h=720), DocumentAttributeFilename(f"Episode_{i}_1080p.{ext}")]))
+    return Message(id=i, peer_id=PeerChannel(1234567890), date=date, message=f"caption for post {i} " * 3, media=media)
+
+def as_dict(msg) -> dict:
+    """The pre-MediaStore scan item"""
+    item = {'id': msg.id, 'date': msg.date, 'message': msg, 'type': 'file', 'name': f"file_{msg.id}", 'size': 0, 'thumb': None}
+    if isinstance(msg.media, MessageMediaPhoto):
+        item['type'], item['name'] = 'photo', f"photo_{msg.id}.jpg"
+    else:
+        doc = msg.media.document
+        item['size'] = doc.size
+        item['name'] = next((a.file_name for a in doc.attributes if hasattr(a, 'file_name')), item['name'])
+        item['type'] = TYPES[type_for_name(item['name'])]
+    return item
+
+def measure(build, n: int) -> int:
+    gc.collect(); tracemalloc.start()
+    result = build(n)
+    gc.collect(); current, _ = tracemalloc.get_traced_memory(); tracemalloc.stop()
+    del result
+    return current
+
+def build_dicts(n):
+    rnd = random.Random(n)
+    return [as_dict(make_message(i, rnd)) for i in range(n)]
+
+def build_store(n):
+    rnd = random.Random(n)
+    store = MediaStore()
+    for i in range(n): store.add_message(make_message(i, rnd))
+    return store
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--counts', type=int, nargs='+', default=[10_000, 100_000, 200_000])
+    args = ap.parse_args()
+    print(f"{'items':>8} | {'dict+Message':>14} | {'MediaStore':>12} | {'ratio':>6} | bytes/item (dict / store)")
+    for n in args.counts:
+        d, s = measure(build_dicts, n), measure(build_store, n)
+        print(f"{n:>8} | {d / 2**20:>11.1f} MB | {s / 2**20:>9.1f} MB | {d / s:>5.1f}x | {d // n} / {s // n}")
+
+if __name__ == '__main__': main()
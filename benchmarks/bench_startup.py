@@ -0,0 +1,88 @@
+"""
+Startup benchmark: import-time breakdown (-X importtime) and time to first paint of the GUI
+Created by Aviel.AI
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--top 15] [--onscreen] [--json]
+Each run is a fresh interpreter with empty settings (first-launch path); the clock starts before the
+interpreter is spawned, so interpreter startup is included. Headless machines use QT_QPA_PLATFORM=offscreen.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Runs in the child interpreter: prints seconds since the parent's timestamp at import end and first Paint event
+CHILD = r'''
+import sys, time
+t0 = float(sys.argv[1]); sys.path.insert(0, sys.argv[2])
+import telegram_downloader as td
+imported = time.time() - t0
+from PyQt6.QtCore import QObject, QEvent, QTimer
+app = td.QApplication(sys.argv[:1])
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Type.Paint and app.property('painted') is None:
+            app.setProperty('painted', True)
+            print(f"{imported:.6f} {time.time() - t0:.6f}", flush=True); app.exit(0)
+        return False
+watcher = FirstPaint(); app.installEventFilter(watcher)
+window = td.ModernWindow(); window.show()
+QTimer.singleShot(20000, lambda: app.exit(1))
+sys.exit(app.exec())
+'''
+
+def child_env(onscreen: bool) -> dict:
+    env = dict(os.environ)
+    home = tempfile.mkdtemp(prefix='tgdl-bench-')  # no saved account or settings
+    env.update(HOME=home, USERPROFILE=home, XDG_CONFIG_HOME=home)
+    if not onscreen: env['QT_QPA_PLATFORM'] = 'offscreen'
+    return env
+
+def import_breakdown(top: int):
+    """(total seconds, [(cumulative s, self s, module)] for the slowest top-level imports)"""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import telegram_downloader'], cwd=ROOT, capture_output=True, text=True, env=child_env(False))
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line: continue
+        self_us, cum_us, name = line[len('import time:'):].split('|')
+        rows.append((int(cum_us) / 1e6, int(self_us) / 1e6, name[1:].rstrip()))  # leading spaces = nesting depth
+    total = next((cum for cum, _, name in rows if name == 'telegram_downloader'), 0.0)
+    direct = [r for r in rows if len(r[2]) - len(r[2].lstrip()) <= 2]  # the app module and what it imports itself
+    return total, sorted(direct, reverse=True)[:top]
+
+def first_paint(onscreen: bool):
+    t0 = time.time()
+    out = subprocess.run([sys.executable, '-c', CHILD, repr(t0), str(ROOT)], cwd=ROOT, capture_output=True, text=True, env=child_env(onscreen), timeout=60)
+    if out.returncode != 0: raise RuntimeError(out.stderr.strip() or f"exit code {out.returncode}")
+    imported, painted = map(float, out.stdout.split())
+    return imported, painted
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--runs', type=int, default=5)
+    ap.add_argument('--top', type=int, default=15)
+    ap.add_argument('--onscreen', action='store_true', help="use the real display instead of the offscreen platform")
+    ap.add_argument('--json', action='store_true', help="one JSON object, for tracking across releases")
+    args = ap.parse_args()
+
+    total, slowest = import_breakdown(args.top)
+    runs = [first_paint(args.onscreen) for _ in range(args.runs)]
+    imported, painted = statistics.median(r[0] for r in runs), statistics.median(r[1] for r in runs)
+    if args.json:
+        print(json.dumps({'import_s': total, 'import_top': [{'module': m.strip(), 'cumulative_s': c, 'self_s': s} for c, s, m in slowest],
+                          'runs': args.runs, 'imported_s': imported, 'first_paint_s': painted}))
+        return
+    print(f"import telegram_downloader: {total * 1000:.1f} ms (-X importtime)")
+    print(f"{'cumulative':>12} | {'self':>9} | module")
+    for cum, own, name in slowest: print(f"{cum * 1000:>9.1f} ms | {own * 1000:>6.1f} ms | {name.strip()}")
+    print(f"\nmedian of {args.runs} runs (interpreter start included): imported {imported * 1000:.0f} ms, first paint {painted * 1000:.0f} ms")
+
+if __name__ == '__main__': main()
@@ -0,0 +1,243 @@
+"""
+Offline performance suite: scan, re-scan, download, filter and UI list population against a fake Telegram backend
+Created by Aviel.AI
+
+Usage: python benchmarks/bench_suite.py [--scenarios scan,rescan,download,filter,ui] [--messages 20000] [--files 300]
+           [--latency-ms 20] [--bandwidth-mbps 0] [--flood-rate 0] [--out result.json] [--baseline old.json]
+
+Each scenario runs in a fresh interpreter (so peak RSS is its own) with a temporary HOME; nothing touches
+~/.telegram_downloader or the network. Results are one JSON document - keep one per release and pass it as
+--baseline to see what a change did. `ui` needs PyQt6 (offscreen platform).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SCENARIOS = ('scan', 'rescan', 'download', 'filter', 'ui')
+# The figure each scenario is compared on (higher is better unless listed in LOWER_IS_BETTER)
+HEADLINE = {'scan': 'messages_per_s', 'rescan': 'seconds', 'download': 'mb_per_s', 'filter': 'query_ms.p95', 'ui': 'append_ms.p95'}
+LOWER_IS_BETTER = ('seconds', 'query_ms.p95', 'append_ms.p95')
+
+def percentiles(samples) -> dict:
+    """p50 / p95 / p99 / max of samples given in seconds, in milliseconds"""
+    if not samples: return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    s = sorted(samples)
+    pick = lambda q: s[min(len(s) - 1, int(q * len(s)))] * 1000
+    return {'p50': round(pick(0.50), 3), 'p95': round(pick(0.95), 3), 'p99': round(pick(0.99), 3), 'max': round(s[-1] * 1000, 3)}
+
+def peak_rss_mb():
+    try: import resource
+    except ImportError: return None  # Windows
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)  # bytes on macOS, KB elsewhere
+
+def make_backend(args):
+    from benchmarks.fake_telegram import FakeTelegram
+    mix = dict((k, float(v)) for k, v in (p.split('=') for p in args.mix.split(','))) if args.mix else None
+    return FakeTelegram(args.messages, args.media_ratio, mix, int(args.min_size_kb * 2**10), int(args.max_size_kb * 2**10), args.latency_ms / 1000,
+                        int(args.bandwidth_mbps * 2**20 / 8), args.flood_rate, args.flood_seconds, args.seed)
+
+def synthetic_store(backend, files: int):
+    """The newest `files` media messages as a MediaStore - what a scan would have produced"""
+    from core.media_store import MediaStore
+    from telethon.tl.types import InputPeerChannel
+    from benchmarks.fake_telegram import CHANNEL_ID
+    store = MediaStore(InputPeerChannel(CHANNEL_ID, 0))
+    for msg_id in range(backend.messages, 0, -1):
+        if len(store) >= files: break
+        store.add_message(backend.message(msg_id))
+    return store
+
+class LoopLag:
+    """How late a 5 ms timer fires while the scenario runs - event loop stalls (disk, CPU) show up here"""
+    TICK = 0.005
+
+    def __init__(self): self.samples, self.task = [], None
+
+    async def tick(self):
+        while True:
+            t = time.perf_counter(); await asyncio.sleep(self.TICK)
+            self.samples.append(max(0.0, time.perf_counter() - t - self.TICK))
+
+    def __enter__(self): self.task = asyncio.ensure_future(self.tick()); return self
+    def __exit__(self, *exc): self.task.cancel()
+
+async def run_scan(args, backend, tmp: Path, use_index=False) -> dict:
+    from core.scanner import Scanner
+    from core.media_store import MediaFilter
+    gaps, last = [], [time.perf_counter()]
+    def batch(_):
+        now = time.perf_counter(); gaps.append(now - last[0]); last[0] = now
+    scanner = Scanner('@bench', args.messages, use_index, index_path=tmp / 'index.db', batch_callback=batch,
+                      media_filter=MediaFilter(args.scan_types.split(',') if args.scan_types else None))
+    with LoopLag() as lag:
+        t = time.perf_counter(); found = await scanner.run(backend.client()); elapsed = time.perf_counter() - t
+    return {'messages': scanner.seen, 'files': found, 'seconds': round(elapsed, 4), 'messages_per_s': round(scanner.seen / elapsed, 1) if elapsed else 0,
+            'batch_interval_ms': percentiles(gaps), 'loop_lag_ms': percentiles(lag.samples), 'requests': backend.requests, 'search': scanner.search, 'flood_waits': scanner.retry.stats['flood_waits']}
+
+async def bench_scan(args, tmp: Path) -> dict: return await run_scan(args, make_backend(args), tmp)
+
+async def bench_rescan(args, tmp: Path) -> dict:
+    """Second scan of an indexed chat: the index is loaded from disk and only new messages are read"""
+    backend = make_backend(args)
+    await run_scan(args, backend, tmp, use_index=True)
+    backend.messages += args.new_messages; backend.requests = 0
+    result = await run_scan(args, backend, tmp, use_index=True)
+    result['new_messages'] = args.new_messages
+    return result
+
+async def bench_download(args, tmp: Path) -> dict:
+    from core.downloader import Downloader
+    from benchmarks.fake_telegram import FakeSenderPool
+    backend = make_backend(args)
+    store = synthetic_store(backend, args.files)
+    durations = []
+    (tmp / 'downloads').mkdir()
+
+    class TimedDownloader(Downloader):
+        async def download_item(self, client, pos, i):
+            t = time.perf_counter()
+            try: await super().download_item(client, pos, i)
+            finally: durations.append(time.perf_counter() - t)
+
+    engine = TimedDownloader(store, list(range(len(store))), tmp / 'downloads', args.min_concurrent, args.max_concurrent, split_threshold=args.split_mb * 2**20,
+                             connections=args.connections, link_mode='off', registry_path=None, fsync=args.fsync)
+    with LoopLag() as lag:
+        t = time.perf_counter(); downloaded, failed, stats = await engine.run(backend.client(), FakeSenderPool(backend)); elapsed = time.perf_counter() - t
+    total = sum(store.sizes)
+    return {'files': len(store), 'downloaded': downloaded, 'failed': failed, 'bytes': total, 'seconds': round(elapsed, 4),
+            'mb_per_s': round(total / 2**20 / elapsed, 2) if elapsed else 0, 'files_per_s': round(downloaded / elapsed, 1) if elapsed else 0,
+            'file_ms': percentiles(durations), 'loop_lag_ms': percentiles(lag.samples), 'final_limit': engine.limiter.limit, 'retry': stats}
+
+async def bench_filter(args, tmp: Path) -> dict:
+    """Building the search index, type filters, a name typed one key at a time (each key a query),
+    then erased one key at a time, and fresh searches that do not extend the previous text"""
+    from core.search_index import SearchIndex
+    from core.media_store import TYPES
+    backend = make_backend(args)
+    store = synthetic_store(backend, args.messages)
+    t = time.perf_counter(); index = SearchIndex(store); build = time.perf_counter() - t
+    def timed(texts, types=None):
+        out = []
+        for text in texts: t = time.perf_counter(); index.query(types, text); out.append(time.perf_counter() - t)
+        return out
+    typed = store.name(len(store) // 2).split('.')[0]
+    cases = {'types': [], 'typed': timed(typed[:k] for k in range(1, len(typed) + 1)), 'erased': timed(typed[:k] for k in range(len(typed) - 1, 0, -1)),
+             'fresh': timed([typed[-4:], 'mp4', typed[-5:-1], '.zip', typed])}
+    for code in range(len(TYPES)):
+        t = time.perf_counter(); index.query([code]); cases['types'].append(time.perf_counter() - t)
+    samples = [x for v in cases.values() for x in v]
+    return {'rows': len(store), 'build_ms': round(build * 1000, 3), 'queries': len(samples), 'query_ms': percentiles(samples),
+            **{f'{name}_ms': percentiles(v) for name, v in cases.items()}, 'last_matches': len(index.query(None, typed))}
+
+def bench_ui(args, tmp: Path) -> dict:
+    """Scan batches appended to the select list on screen (offscreen platform), then filter and select all"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    import telegram_downloader as td
+    from PyQt6.QtWidgets import QListView
+    app = td.QApplication.instance() or td.QApplication([])
+    store = synthetic_store(make_backend(args), args.messages)
+    model, proxy, view = td.MediaListModel(), td.MediaFilterProxy(), QListView()
+    proxy.setSourceModel(model); view.setModel(proxy); view.setItemDelegate(td.MediaItemDelegate(False, None, view)); view.setUniformItemSizes(True)
+    view.resize(900, 700); view.show(); app.processEvents()
+    appends = []
+    for k in range(0, len(store), args.batch):
+        batch = store.subset(range(k, min(k + args.batch, len(store))))
+        t = time.perf_counter(); model.append_store(batch); app.processEvents(); appends.append(time.perf_counter() - t)
+    t = time.perf_counter(); proxy.set_filter(['video'], ''); app.processEvents(); filtered = time.perf_counter() - t
+    t = time.perf_counter(); model.set_rows_checked(proxy.rows, False); app.processEvents(); select = time.perf_counter() - t
+    t = time.perf_counter(); proxy.set_filter(None, ''); app.processEvents(); unfiltered = time.perf_counter() - t
+    return {'rows': len(store), 'batches': len(appends), 'append_ms': percentiles(appends), 'append_total_s': round(sum(appends), 4),
+            'filter_ms': round(filtered * 1000, 3), 'select_matching_ms': round(select * 1000, 3), 'clear_filter_ms': round(unfiltered * 1000, 3)}
+
+BENCHES = {'scan': bench_scan, 'rescan': bench_rescan, 'download': bench_download, 'filter': bench_filter, 'ui': bench_ui}
+
+def run_child(args):
+    tmp = Path(tempfile.mkdtemp(prefix='tgdl-suite-'))
+    bench = BENCHES[args.child]
+    result = asyncio.run(bench(args, tmp)) if asyncio.iscoroutinefunction(bench) else bench(args, tmp)
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(json.dumps(result))
+
+def run_scenario(name: str, argv) -> dict:
+    home = tempfile.mkdtemp(prefix='tgdl-suite-home-')
+    env = dict(os.environ, HOME=home, USERPROFILE=home, XDG_CONFIG_HOME=home)
+    out = subprocess.run([sys.executable, __file__, '--child', name] + argv, cwd=ROOT, capture_output=True, text=True, env=env)
+    if out.returncode != 0: return {'error': out.stderr.strip().splitlines()[-1] if out.stderr.strip() else f"exit code {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def lookup(result: dict, path: str):
+    for key in path.split('.'): result = result.get(key, {}) if isinstance(result, dict) else {}
+    return result if isinstance(result, (int, float)) else None
+
+def compare(current: dict, baseline: dict):
+    """One line per scenario: headline figure now vs baseline, and peak RSS"""
+    for name, result in current['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if not old or 'error' in result or 'error' in old: continue
+        key = HEADLINE[name]; now, then = lookup(result, key), lookup(old, key)
+        if not now or not then: continue
+        better = now < then if key in LOWER_IS_BETTER else now > then
+        change = (now - then) / then * 100
+        print(f"{name:>9}: {key} {then:g} -> {now:g} ({change:+.1f}%{', better' if better else ', worse' if abs(change) > 0.5 else ''}) • "
+              f"peak RSS {old.get('peak_rss_mb')} -> {result.get('peak_rss_mb')} MB", file=sys.stderr)
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--scenarios', default=','.join(SCENARIOS))
+    ap.add_argument('--messages', type=int, default=20000, help="chat length (scan) and rows (filter / ui)")
+    ap.add_argument('--new-messages', type=int, default=500, help="messages posted between the two scans of rescan")
+    ap.add_argument('--media-ratio', type=float, default=0.6)
+    ap.add_argument('--scan-types', help="scan only these media types, e.g. photo,video (scan / rescan)")
+    ap.add_argument('--mix', help="media weights, e.g. photo=3,video=3,document=2,archive=1,image=0.5,file=0.5")
+    ap.add_argument('--min-size-kb', type=float, default=32); ap.add_argument('--max-size-kb', type=float, default=4096)
+    ap.add_argument('--latency-ms', type=float, default=20, help="per request")
+    ap.add_argument('--bandwidth-mbps', type=float, default=0, help="per connection, megabits/s (0 = unlimited)")
+    ap.add_argument('--flood-rate', type=float, default=0.0, help="chance a request answers FloodWait")
+    ap.add_argument('--flood-seconds', type=int, default=0)
+    ap.add_argument('--files', type=int, default=300, help="files downloaded")
+    ap.add_argument('--min-concurrent', type=int, default=2); ap.add_argument('--max-concurrent', type=int, default=12)
+    ap.add_argument('--split-mb', type=int, default=64); ap.add_argument('--connections', type=int, default=4)
+    ap.add_argument('--fsync', default='off', choices=('off', 'finish', 'always'))
+    ap.add_argument('--batch', type=int, default=200, help="rows per append in ui (the scanner's batch size)")
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--out', help="also write the JSON here"); ap.add_argument('--baseline', help="earlier JSON output to compare with")
+    ap.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    return ap
+
+def main():
+    argv = sys.argv[1:]
+    args = build_parser().parse_args(argv)
+    if args.child: return run_child(args)
+    names = [n.strip() for n in args.scenarios.split(',') if n.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown: sys.exit(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    skip = {'--out', '--baseline', '--scenarios'}  # everything else is passed on to each scenario's interpreter
+    passed, it = [], iter(argv)
+    for a in it:
+        if a.split('=')[0] in skip:
+            if '=' not in a: next(it, None)
+            continue
+        passed.append(a)
+    report = {'python': platform.python_version(), 'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'config': {k: v for k, v in vars(args).items() if k not in ('out', 'baseline', 'child', 'scenarios')}, 'results': {}}
+    for name in names:
+        print(f"running {name}...", file=sys.stderr)
+        report['results'][name] = run_scenario(name, passed)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out: Path(args.out).write_text(text, encoding='utf-8')
+    if args.baseline: compare(report, json.loads(Path(args.baseline).read_text(encoding='utf-8')))
+
+if __name__ == '__main__': main()
@@ -0,0 +1,182 @@
+"""
+Offline stand-in for TelegramClient, for benchmarks: synthetic chats, latency, bandwidth and FloodWait injection
+Created by Aviel.AI
+
+Covers what the engine calls: get_entity, get_input_entity, get_messages (head / by ids / search counts), iter_messages (both directions,
+offset_date, search filters for photos / video / documents),
+iter_download, download_file, and a SenderPool replacement for segmented downloads (GetFileRequest).
+Messages are generated from a seed on demand, so a 200k-message chat costs nothing until it is read.
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from telethon.errors import FloodWaitError
+from telethon.tl.types import (
+    Message, PeerChannel, InputPeerChannel, MessageMediaDocument, MessageMediaPhoto, Photo, PhotoSize, Document,
+    DocumentAttributeFilename, DocumentAttributeVideo, InputPhotoFileLocation,
+    InputMessagesFilterPhotos, InputMessagesFilterVideo, InputMessagesFilterDocument
+)
+
+PAGE_SIZE = 100  # messages per getHistory request, as Telegram returns them
+CHANNEL_ID = 1234567890
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)  # message n is sent n minutes after this
+EXTENSIONS = {'video': ('mp4', 'mkv'), 'archive': ('zip', 'rar', '7z'), 'document': ('pdf', 'docx'), 'image': ('jpg', 'png'), 'file': ('bin', 'iso')}
+MIX = {'photo': 3, 'video': 3, 'document': 2, 'archive': 1, 'image': 0.5, 'file': 0.5}
+
+class FakeTelegram:
+    """One synthetic channel plus the network model every fake request goes through.
+
+    messages: chat length; media_ratio: share of messages with media; mix: relative weight per media type;
+    min_size / max_size: document sizes (log-uniform) in bytes; latency: seconds per request;
+    bandwidth: bytes/s per connection (0 = unlimited); flood_rate: chance a request answers FloodWait(flood_seconds).
+    """
+
+    def __init__(self, messages=10000, media_ratio=0.6, mix: Optional[Dict[str, float]] = None, min_size=32 * 2**10, max_size=4 * 2**20,
+                 latency=0.0, bandwidth=0, flood_rate=0.0, flood_seconds=0, seed=1):
+        self.messages, self.media_ratio = messages, media_ratio
+        self.mix = list((mix or MIX).items())
+        self.min_size, self.max_size = min_size, max_size
+        self.latency, self.bandwidth, self.flood_rate, self.flood_seconds = latency, bandwidth, flood_rate, flood_seconds
+        self.seed = seed
+        self.rnd = random.Random(seed)  # FloodWait draws
+        self.sizes: Dict[int, int] = {}  # media id -> bytes, filled as messages are generated
+        self.requests = self.floods = 0
+        self.zeros = memoryview(bytes(1024 * 1024))  # every chunk is a zero-copy slice of this
+        self.counts: Dict[type, int] = {}
+
+    def draw(self, msg_id: int):
+        """(kind, size) of a message's media, or None for a text message"""
+        rnd = random.Random(self.seed * 1_000_003 + msg_id)
+        if rnd.random() >= self.media_ratio: return None
+        kind = rnd.choices([k for k, _ in self.mix], [w for _, w in self.mix])[0]
+        return kind, int(self.min_size * (self.max_size / self.min_size) ** rnd.random())
+
+    def matches(self, msg_id: int, search_filter) -> bool:
+        """Whether Telegram's search filter would return the message (photos / videos / other documents)"""
+        drawn = self.draw(msg_id)
+        if drawn is None: return False
+        if isinstance(search_filter, InputMessagesFilterPhotos): return drawn[0] == 'photo'
+        if isinstance(search_filter, InputMessagesFilterVideo): return drawn[0] == 'video'
+        if isinstance(search_filter, InputMessagesFilterDocument): return drawn[0] not in ('photo', 'video')
+        return False  # GIFs, music, voice and round videos are never generated
+
+    def count(self, search_filter) -> int:
+        key = type(search_filter)
+        if key not in self.counts: self.counts[key] = sum(self.matches(i, search_filter) for i in range(1, self.messages + 1))
+        return self.counts[key]
+
+    def message(self, msg_id: int) -> Message:
+        date = EPOCH + timedelta(minutes=msg_id)
+        media, drawn = None, self.draw(msg_id)
+        if drawn:
+            kind, size = drawn
+            rnd = random.Random(self.seed * 7_000_003 + msg_id)  # file name extension
+            self.sizes[msg_id] = size
+            if kind == 'photo':
+                media = MessageMediaPhoto(photo=Photo(id=msg_id, access_hash=msg_id * 7, file_reference=b'ref', date=date, dc_id=2,
+                                                      sizes=[PhotoSize('m', 320, 240, size // 10), PhotoSize('y', 1280, 960, size)]))
+            else:
+                attributes = [DocumentAttributeFilename(f"{kind}_{msg_id}.{rnd.choice(EXTENSIONS[kind])}")]
+                if kind == 'video': attributes.append(DocumentAttributeVideo(duration=120, w=1280, h=720))
+                media = MessageMediaDocument(document=Document(id=msg_id, access_hash=msg_id * 3, file_reference=b'ref', date=date, mime_type='application/octet-stream',
+                                                               size=size, dc_id=2, attributes=attributes))
+        return Message(id=msg_id, peer_id=PeerChannel(CHANNEL_ID), date=date, message=f"post {msg_id}", media=media)
+
+    async def request(self, payload=0):
+        """One round trip: latency, transfer time for payload bytes, and maybe a FloodWait"""
+        self.requests += 1
+        if self.flood_rate and self.rnd.random() < self.flood_rate:
+            self.floods += 1
+            raise FloodWaitError(request=None, capture=self.flood_seconds)
+        delay = self.latency + (payload / self.bandwidth if self.bandwidth else 0)
+        await asyncio.sleep(delay)  # 0 still yields, like a real socket read
+
+    def chunk(self, location, offset: int, limit: int):
+        size = self.sizes.get(location.id, 0)
+        n = max(0, min(limit, size - offset))
+        return self.zeros[:n]
+
+    def client(self) -> 'FakeClient': return FakeClient(self)
+
+class MessageList(list):
+    total = 0
+
+class FakeClient:
+    """The subset of TelegramClient the scanner, downloader and reference refresh use"""
+
+    def __init__(self, backend: FakeTelegram):
+        self.backend = backend
+        self.connected = False
+
+    async def connect(self): self.connected = True
+    def is_connected(self): return self.connected
+    async def is_user_authorized(self): return True
+    async def disconnect(self): self.connected = False
+
+    async def get_entity(self, chat):
+        await self.backend.request()
+        return InputPeerChannel(CHANNEL_ID, 0)
+
+    async def get_input_entity(self, peer):
+        await self.backend.request()
+        return InputPeerChannel(CHANNEL_ID, 0)
+
+    async def get_messages(self, entity, limit=None, ids=None, filter=None):
+        await self.backend.request()
+        if filter is not None:  # only the count is used (limit=0)
+            out = MessageList(); out.total = self.backend.count(filter() if isinstance(filter, type) else filter)
+            return out
+        if ids is not None:
+            return [self.backend.message(i) if 1 <= i <= self.backend.messages else None for i in ids]
+        out = MessageList(self.backend.message(i) for i in range(self.backend.messages, max(0, self.backend.messages - (limit or 1)), -1))
+        out.total = self.backend.messages
+        return out
+
+    async def iter_messages(self, entity, limit=None, offset_id=0, min_id=0, reverse=False, wait_time=None, offset_date=None, filter=None, **kwargs):
+        n = self.backend.messages
+        if offset_date and not offset_id and not reverse: n = min(n, -(-int((offset_date - EPOCH).total_seconds()) // 60) - 1)  # sent before offset_date
+        ids = range(max(min_id, offset_id) + 1, n + 1) if reverse else range(min(offset_id - 1, n) if offset_id else n, min_id, -1)
+        if filter is not None:  # a search: pages of matching messages only
+            search_filter = filter() if isinstance(filter, type) else filter
+            ids = [i for i in ids if self.backend.matches(i, search_filter)]
+        if limit is not None: ids = ids[:limit]
+        for k in range(0, len(ids), PAGE_SIZE):
+            await self.backend.request()
+            for i in ids[k:k + PAGE_SIZE]: yield self.backend.message(i)
+
+    async def iter_download(self, location, offset=0, request_size=512 * 1024, file_size=None, dc_id=None, **kwargs):
+        size = self.backend.sizes.get(location.id, file_size or 0)
+        while offset < size:
+            data = self.backend.chunk(location, offset, request_size)
+            await self.backend.request(len(data))
+            yield data; offset += len(data)
+
+    async def download_file(self, location, file=bytes, dc_id=None, **kwargs):
+        size = self.backend.sizes.get(location.id, 0) // (10 if isinstance(location, InputPhotoFileLocation) else 1)
+        await self.backend.request(size)
+        return bytes(size)
+
+class FileResult:
+    def __init__(self, data): self.bytes = data
+
+class FakeSender:
+    """One extra connection of a segmented download"""
+
+    def __init__(self, backend: FakeTelegram): self.backend = backend
+
+    async def send(self, request):
+        data = self.backend.chunk(request.location, request.offset, request.limit)
+        await self.backend.request(len(data))
+        return FileResult(data)
+
+    async def disconnect(self): pass
+
+class FakeSenderPool:
+    """Stands in for core.segmented.SenderPool"""
+
+    def __init__(self, backend: FakeTelegram): self.backend = backend
+    async def get(self, dc_id: int, count: int): return [FakeSender(self.backend) for _ in range(count)]
+    async def close(self): pass
@@ -0,0 +1,5 @@
+"""
+Qt-free engine of Telegram Downloader ULTIMATE PRO - scan, download, resume
+Shared by the GUI (telegram_downloader.py) and the command line (telegram_downloader_cli.py)
+Created by Aviel.AI
+"""
@@ -0,0 +1,140 @@
+"""
+Multi-account session pool for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from telethon import TelegramClient, utils
+from telethon.errors import RPCError
+
+from .config import APP_DIR
+from .segmented import SenderPool
+
+ACCOUNTS_DIR = APP_DIR / 'accounts'  # <name>.session - logged in with `login --account <name>`
+
+class Account:
+    """One logged-in session: its client, its extra DC connections and its health"""
+
+    def __init__(self, name: str, client, sender_pool):
+        self.name, self.client, self.sender_pool = name, client, sender_pool
+        self.cooldown_until = 0.0  # monotonic time its last FloodWait ends
+        self.in_flight = 0
+        self.files = self.bytes = self.floods = self.flood_seconds = 0
+
+    def available(self, now: float) -> bool: return now >= self.cooldown_until
+
+    def stats(self) -> dict:
+        return {'account': self.name, 'files': self.files, 'bytes': self.bytes, 'floods': self.floods, 'flood_seconds': self.flood_seconds,
+                'cooldown': max(0, round(self.cooldown_until - time.monotonic(), 1))}
+
+class AccountPool:
+    """The accounts one download spreads its files over - the session that scanned plus the extra ones.
+
+    Each file goes to the account with the fewest transfers in flight among those not cooling down.
+    A FloodWait puts only that account on cooldown for the seconds asked, so its share moves to the
+    others until it recovers; only when all of them wait does the download wait. Access hashes and file
+    references are per account, so an extra account re-reads the messages it is given (100 per request,
+    the rows scheduled next) the first time it needs them; a chat it cannot see leaves those rows to the others.
+    """
+    REF_BATCH = 100
+
+    def __init__(self, primary: Account, extra: List[Account], store, chat=None):
+        self.primary, self.accounts = primary, [primary] + list(extra)
+        self.store, self.chat = store, chat
+        self.refs: Dict[str, Dict[int, Optional[tuple]]] = {a.name: {} for a in extra}  # row -> (access_hash, file_reference), None = not visible
+        self.peers: Dict[str, object] = {}  # account -> its InputPeer of the chat, None = cannot see the chat
+        self.locks = {a.name: asyncio.Lock() for a in extra}
+
+    def __len__(self): return len(self.accounts)
+
+    def usable(self, account: Account, i: int) -> bool:
+        return account is self.primary or self.peers.get(account.name, True) is not None and self.refs[account.name].get(i, True) is not None
+
+    def pick(self, i: int) -> Account:
+        """Least busy account that is not cooling down (the primary on ties), else the one that recovers first"""
+        now = time.monotonic()
+        candidates = [a for a in self.accounts if self.usable(a, i)]
+        ready = [a for a in candidates if a.available(now)]
+        return min(ready, key=lambda a: a.in_flight) if ready else min(candidates, key=lambda a: a.cooldown_until)
+
+    def wait_time(self) -> float:
+        """Seconds until some account may send again (0 = one is ready now)"""
+        return max(0.0, min(a.cooldown_until for a in self.accounts) - time.monotonic())
+
+    def cooldown(self, account: Account, seconds: int):
+        account.cooldown_until = max(account.cooldown_until, time.monotonic() + seconds)
+        account.floods += 1; account.flood_seconds += seconds
+
+    async def location(self, account: Account, i: int, upcoming: Callable[[int], List[int]]):
+        """Row i's file location as `account` sees it, or None if it cannot see the media"""
+        if account is self.primary: return self.store.input_location(i)
+        refs = self.refs[account.name]
+        if i not in refs: await self.fetch_refs(account, [i] + [j for j in upcoming(self.REF_BATCH - 1) if j not in refs and j != i])
+        ref = refs.get(i)
+        return None if ref is None else self.store.input_location(i, ref)
+
+    async def refresh(self, account: Account, i: int, upcoming: Callable[[int], List[int]]) -> bool:
+        """An extra account's file reference expired - read its messages again"""
+        refs = self.refs[account.name]
+        batch = [i] + [j for j in upcoming(self.REF_BATCH - 1) if j in refs and j != i]
+        for j in batch: refs.pop(j, None)
+        await self.fetch_refs(account, batch)
+        return refs.get(i) is not None
+
+    async def fetch_refs(self, account: Account, rows: List[int]):
+        store, refs = self.store, self.refs[account.name]
+        async with self.locks[account.name]:
+            rows = [j for j in rows if j not in refs]  # another file may have fetched them meanwhile
+            peer = await self.peer(account)
+            if not rows: return
+            if peer is None:
+                for j in rows: refs[j] = None
+                return
+            messages = await account.client.get_messages(peer, ids=[store.msg_ids[j] for j in rows])
+            for j, msg in zip(rows, messages):
+                media = getattr(msg, 'media', None)
+                obj = getattr(media, 'photo', None) or getattr(media, 'document', None)
+                refs[j] = (obj.access_hash, obj.file_reference) if obj is not None and obj.id == store.doc_ids[j] else None
+
+    async def peer(self, account: Account):
+        if account.name not in self.peers:
+            try: self.peers[account.name] = await account.client.get_input_entity(self.chat or utils.get_peer_id(self.store.peer))
+            except (ValueError, RPCError): self.peers[account.name] = None  # not a member / never seen the chat
+        return self.peers[account.name]
+
+    def stats(self) -> List[dict]: return [a.stats() for a in self.accounts]
+
+def account_sessions(config) -> List[Path]:
+    """Session files of the extra accounts (without the .session suffix, as TelegramClient wants them)"""
+    if not config.get('extra_accounts'): return []
+    return sorted(p.with_suffix('') for p in ACCOUNTS_DIR.glob('*.session'))
+
+async def connect_accounts(config) -> List[Account]:
+    """Connect every extra account; sessions that are not logged in are skipped"""
+    accounts, sessions = [], account_sessions(config)
+    if sessions and (not config.get('api_id') or not config.get('api_hash')): raise ValueError("api_id / api_hash missing")
+    for path in sessions:
+        client = TelegramClient(str(path), int(config['api_id']), config['api_hash'])
+        await client.connect()
+        if await client.is_user_authorized(): accounts.append(Account(path.name, client, SenderPool(client)))
+        else: await client.disconnect()
+    return accounts
+
+async def close_accounts(accounts: List[Account]):
+    for account in accounts:
+        await account.sender_pool.close()
+        await account.client.disconnect()
+
+@asynccontextmanager
+async def open_accounts(config):
+    """The extra accounts, connected, and closed on exit"""
+    accounts = []
+    try:
+        accounts = await connect_accounts(config)
+        yield accounts
+    finally: await close_accounts(accounts)
@@ -0,0 +1,91 @@
+"""
+Shared Telegram connection for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from telethon import TelegramClient
+
+from .accounts import Account, connect_accounts, close_accounts
+from .metrics import configure_metrics, get_metrics
+from .segmented import SenderPool
+
+class ClientService:
+    """One background thread owning a persistent event loop and a single connected TelegramClient.
+
+    Auth, scans and downloads are submitted as jobs - coroutine functions that receive the
+    service - and run side by side on the same connection, session file and per-DC sender
+    pool, so no operation pays for a fresh handshake. submit() returns a
+    concurrent.futures.Future; cancelling it cancels the job on the loop.
+    Extra accounts logged in with `login --account` (core.accounts) are connected on first use
+    of the client too, with the same api_id / api_hash, and handed to downloads as `accounts`.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.config: Optional[Tuple] = None  # (api_id, api_hash, session_path) wanted by the next job
+        self.client_config: Optional[Tuple] = None  # ...and the one the open client was built with
+        self.client: Optional[TelegramClient] = None
+        self.pool: Optional[SenderPool] = None
+        self.accounts: List[Account] = []
+        self.use_accounts = True  # connect the extra accounts too (config extra_accounts)
+        self.lock = asyncio.Lock()
+        self.thread = threading.Thread(target=self.run_loop, name='telegram-client', daemon=True)
+        self.thread.start()
+
+    def run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def configure(self, api_id: int, api_hash: str, session_path):
+        """Credentials for the following jobs - a change reconnects, the same ones keep the open client"""
+        self.config = (api_id, api_hash, str(session_path))
+
+    async def connect(self) -> TelegramClient:
+        async with self.lock:
+            if self.client is not None and self.client_config != self.config: await self.close_client()
+            if self.client is None:
+                if self.config is None: raise RuntimeError("client service is not configured")
+                api_id, api_hash, session_path = self.config
+                self.client = TelegramClient(session_path, api_id, api_hash)
+                self.pool, self.client_config = SenderPool(self.client), self.config
+                if self.use_accounts: self.accounts = await connect_accounts({'extra_accounts': True, 'api_id': api_id, 'api_hash': api_hash})
+            if not self.client.is_connected(): await self.client.connect()
+            return self.client
+
+    async def close_client(self):
+        await close_accounts(self.accounts); self.accounts = []
+        if self.pool: await self.pool.close()
+        if self.client: await self.client.disconnect()
+        self.client = self.pool = self.client_config = None
+
+    def enable_metrics(self, config):
+        """Turn on the metrics outlets config asks for (core.metrics) - served from the loop the jobs run on"""
+        metrics = configure_metrics(config)
+        if metrics.enabled: asyncio.run_coroutine_threadsafe(metrics.start(), self.loop)
+
+    def submit(self, job: Callable[['ClientService'], Awaitable]) -> Future:
+        """Run job(service) on the service loop once the client is connected"""
+        async def run():
+            await self.connect()
+            return await job(self)
+        return asyncio.run_coroutine_threadsafe(run(), self.loop)
+
+    def disconnect(self) -> Future:
+        async def run():
+            async with self.lock: await self.close_client()
+        return asyncio.run_coroutine_threadsafe(run(), self.loop)
+
+    def shutdown(self, timeout=5.0):
+        """Disconnect and stop the loop thread (on application exit)"""
+        if not self.thread.is_alive(): return
+        try: self.disconnect().result(timeout)
+        except Exception: pass
+        try: asyncio.run_coroutine_threadsafe(get_metrics().close(), self.loop).result(timeout)
+        except Exception: pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
@@ -0,0 +1,147 @@
+"""
+Adaptive download concurrency for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import asyncio
+import time
+from collections import deque
+from statistics import median
+
+class AdaptiveLimiter:
+    """AIMD limit on in-flight downloads.
+
+    Every `interval` seconds the measured aggregate throughput and median request latency
+    are compared with the previous window: while all slots are busy and throughput still
+    grows, the limit goes up by one (additive increase); an error or FloodWait halves it
+    (multiplicative decrease), and a median latency 1.5x above the best seen so far trims it by one.
+    Used as `async with limiter:` around each transfer.
+    """
+
+    def __init__(self, minimum=2, maximum=12, initial=3, interval=2.0):
+        self.minimum, self.maximum = max(1, minimum), max(1, minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial))
+        self.interval = interval
+        self.in_flight = 0
+        self.waiters = deque()
+        self.window_bytes = 0
+        self.window_errors = 0
+        self.latencies = []
+        self.best_latency = None
+        self.last_throughput = 0.0
+        self.throughput = 0.0
+        self.hold_until = 0.0  # no increases while a FloodWait is being served
+        self.task = None
+
+    async def __aenter__(self): await self.acquire(); return self
+    async def __aexit__(self, *exc): self.release()
+
+    async def acquire(self):
+        while self.in_flight >= self.limit:
+            fut = asyncio.get_running_loop().create_future()
+            self.waiters.append(fut)
+            try: await fut
+            finally:
+                if fut in self.waiters: self.waiters.remove(fut)
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self.wake()
+
+    def wake(self):
+        free = self.limit - self.in_flight
+        while free > 0 and self.waiters:
+            fut = self.waiters.popleft()
+            if not fut.done(): fut.set_result(None); free -= 1
+
+    def add_bytes(self, n: int): self.window_bytes += n
+    def observe_latency(self, seconds: float): self.latencies.append(seconds)
+    def on_error(self): self.window_errors += 1
+
+    def on_flood(self, seconds: float):
+        self.limit = max(self.minimum, self.limit // 2)
+        self.hold_until = time.monotonic() + seconds + self.interval
+
+    def start(self):
+        self.task = asyncio.ensure_future(self.run())
+
+    def stop(self):
+        if self.task: self.task.cancel()
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.adjust()
+
+    def adjust(self):
+        self.throughput = self.window_bytes / self.interval
+        lat = median(self.latencies) if self.latencies else None
+        if lat is not None: self.best_latency = lat if self.best_latency is None else min(self.best_latency, lat)
+        if self.window_errors:
+            self.limit = max(self.minimum, self.limit // 2)
+        elif lat is not None and lat > 1.5 * self.best_latency and self.limit > self.minimum:
+            self.limit -= 1
+        elif self.in_flight >= self.limit and time.monotonic() >= self.hold_until and self.throughput >= 0.95 * self.last_throughput:
+            self.limit = min(self.maximum, self.limit + 1)
+        self.last_throughput = self.throughput
+        self.window_bytes = self.window_errors = 0
+        self.latencies = []
+        self.wake()
+
+class Slots:
+    """Counting semaphore whose size can change while tasks wait on it (0 = unlimited). `async with slots:`"""
+
+    def __init__(self, size=0):
+        self.size, self.in_use = size, 0
+        self.waiters = deque()
+
+    async def __aenter__(self):
+        while self.size and self.in_use >= self.size:
+            fut = asyncio.get_running_loop().create_future()
+            self.waiters.append(fut)
+            try: await fut
+            finally:
+                if fut in self.waiters: self.waiters.remove(fut)
+        self.in_use += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        self.in_use -= 1
+        self.wake()
+
+    def resize(self, size: int):
+        self.size = size
+        self.wake()
+
+    def wake(self):
+        free = (self.size - self.in_use) if self.size else len(self.waiters)
+        while free > 0 and self.waiters:
+            fut = self.waiters.popleft()
+            if not fut.done(): fut.set_result(None); free -= 1
+
+class TransferBudget(Slots):
+    """Limits shared by every download running at once, across jobs: files in flight and bytes per second
+    (0 = unlimited). Each job keeps its own AdaptiveLimiter; this caps their sum.
+    `async with budget:` around each transfer, `await budget.throttle(n)` after each n bytes received.
+    """
+
+    def __init__(self, max_transfers=0, bytes_per_second=0):
+        super().__init__(max_transfers)
+        self.bytes_per_second = bytes_per_second
+        self.tokens = 0.0
+        self.refilled = time.monotonic()
+
+    def configure(self, max_transfers: int, bytes_per_second: int):
+        """New limits take effect immediately (a raised cap wakes waiting downloads)"""
+        self.bytes_per_second = bytes_per_second
+        self.resize(max_transfers)
+
+    async def throttle(self, n: int):
+        """Token bucket holding at most one second of traffic: waits while the shared rate is exceeded"""
+        if not self.bytes_per_second: return
+        now = time.monotonic()
+        self.tokens = min(self.bytes_per_second, self.tokens + (now - self.refilled) * self.bytes_per_second)
+        self.refilled = now
+        self.tokens -= n
+        if self.tokens < 0: await asyncio.sleep(-self.tokens / self.bytes_per_second)
@@ -0,0 +1,81 @@
+"""
+Headless configuration for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+APP_DIR = Path.home() / '.telegram_downloader'
+CONFIG_PATH = APP_DIR / 'config.json'
+
+# Same key names as the GUI settings
+DEFAULTS: Dict[str, Any] = {
+    'api_id': None,
+    'api_hash': None,
+    'phone': None,
+    'session': str(APP_DIR / 'session'),  # shared with the GUI, so a login there works here too
+    'download_path': str(Path.home() / 'Downloads' / 'Telegram'),
+    'max_messages': 200000,
+    'use_index': True,
+    'verify_deleted': False,
+    'scan_types': [],          # scan only these media types (photo,image,video,document,archive,file; empty = all)
+    'scan_since': '',          # scan only media sent on or after this date (YYYY-MM-DD or ISO date-time, local time)
+    'scan_until': '',          # ...and up to this date, inclusive
+    'scan_min_size': 0,        # scan only files of at least this many bytes
+    'scan_max_size': 0,        # ...and at most this many (0 = no limit)
+    'concurrency_min': 2,
+    'concurrency_max': 12,
+    'download_order': 'list',
+    'split_threshold_mb': 64,
+    'split_connections': 4,
+    'link_mode': 'hardlink',  # media already downloaded from another chat: hardlink / reflink / symlink / copy, or 'off' to download again
+    'verify_links': False,    # hash files when they finish and re-check before linking (catches copies edited since)
+    'preallocate': True,      # reserve each file's blocks before writing (less fragmentation with parallel downloads)
+    'fsync': 'off',           # off / finish (sync before the final rename) / always (also before each journal write)
+    'postprocess': [],         # steps run on each downloaded file (core.postprocess.STEPS: mime, sha256, exif, duration, extract)
+    'postprocess_workers': 0,  # processes for them (0 = one per CPU core)
+    'extra_accounts': True,    # also download with the sessions logged in under ~/.telegram_downloader/accounts
+    'queue_scans': 2,          # job queue: chats scanned at the same time
+    'queue_downloads': 2,      # job queue: chats downloading at the same time
+    'queue_transfers': 16,     # job queue: files in flight across all its downloads (0 = no cap)
+    'queue_bandwidth_kb': 0,   # job queue: KB/s across all its downloads (0 = unlimited)
+    'metrics_port': 0,         # Prometheus text endpoint on 127.0.0.1:<port>/metrics (0 = off)
+    'metrics_log': '',         # JSON-lines metrics log path ('' = off)
+    'language': 'en',
+    'daemon_socket': str(APP_DIR / 'daemon.sock'),  # Unix socket; platforms without one use daemon_port on 127.0.0.1
+    'daemon_port': 47615,
+    'daemon_token': str(APP_DIR / 'daemon.token'),  # daemon_port only: secret every request must carry (new per start, 0600)
+}
+
+# What to do with media already on disk from another chat (see core.content_registry.link_file)
+LINK_MODES = ('hardlink', 'reflink', 'symlink', 'copy', 'off')
+
+# When downloaded data is forced to disk (see core.partfile.PartFile)
+FSYNC_POLICIES = ('off', 'finish', 'always')
+
+ENV_PREFIX = 'TGDL_'  # e.g. TGDL_API_ID, TGDL_DOWNLOAD_PATH
+
+def convert(key: str, value):
+    """Coerce a string from the environment to the type of its default"""
+    default = DEFAULTS.get(key)
+    if key == 'api_id' or isinstance(default, int) and not isinstance(default, bool): return int(value)
+    if isinstance(default, bool): return str(value).lower() in ('1', 'true', 'yes', 'on')
+    if isinstance(default, list): return [v.strip() for v in value.split(',') if v.strip()]
+    return value
+
+def load_config(overrides: Optional[Dict[str, Any]] = None, path=CONFIG_PATH) -> Dict[str, Any]:
+    """Defaults < config.json < TGDL_* environment variables < command-line overrides (None = not given)"""
+    config = dict(DEFAULTS)
+    try: config.update(json.loads(Path(path).read_text(encoding='utf-8')))
+    except FileNotFoundError: pass
+    except ValueError as e: raise ValueError(f"{path}: {e}")
+    for key in DEFAULTS:
+        value = os.environ.get(ENV_PREFIX + key.upper())
+        if value is not None: config[key] = convert(key, value)
+    config.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    for key, allowed in (('fsync', FSYNC_POLICIES), ('link_mode', LINK_MODES)):
+        if config[key] not in allowed: raise ValueError(f"{key}: {config[key]!r} is not one of {', '.join(allowed)}")
+    return config
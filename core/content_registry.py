@@ -0,0 +1,119 @@
+"""
+Cross-chat content registry for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import errno
+import hashlib
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from .media_store import MediaStore, PHOTO
+
+DEFAULT_REGISTRY_PATH = Path.home() / '.telegram_downloader' / 'content.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    kind INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT,
+    added_at REAL,
+    PRIMARY KEY (doc_id, kind, path)
+) WITHOUT ROWID;
+"""
+
+KIND_DOCUMENT, KIND_PHOTO = 0, 1  # photo and document ids are separate id spaces
+LOOKUP_CHUNK = 500  # keys per IN (...) query, under SQLite's parameter limit
+
+FICLONE = 0x40049409  # Linux ioctl: copy-on-write clone (Btrfs, XFS, bcachefs)
+
+def content_key(store: MediaStore, i: int) -> Tuple[int, int, int]:
+    """(kind, id, size) of a store row - what the registry knows files by"""
+    return (KIND_PHOTO if store.types[i] == PHOTO else KIND_DOCUMENT, store.doc_ids[i], store.sizes[i])
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''): h.update(block)
+    return h.hexdigest()
+
+def reflink(src, dst):
+    """Share src's blocks with dst until either is modified; OSError where the filesystem cannot"""
+    if not sys.platform.startswith('linux'): raise OSError(errno.EOPNOTSUPP, "reflink is only supported on Linux")
+    import fcntl
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+def link_file(src, dst, mode: str) -> str:
+    """Give dst the content of src without downloading it. Returns the method used - a plain copy
+    when the requested one is not possible (another filesystem, no CoW support, no symlink rights)."""
+    src, dst = Path(src), Path(dst)
+    tmp = dst.with_name(dst.name + '.link')  # only the final rename puts the real name in place
+    if tmp.is_symlink() or tmp.exists(): tmp.unlink()
+    used = mode
+    try:
+        if mode == 'hardlink': os.link(src, tmp)
+        elif mode == 'symlink': os.symlink(src.resolve(), tmp)
+        elif mode == 'reflink': reflink(src, tmp)
+        else: used = 'copy'
+    except OSError: used = 'copy'
+    if used == 'copy': shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
+    return used
+
+class ContentRegistry:
+    """SQLite (WAL) record of every file we have on disk, keyed by Telegram document / photo id.
+
+    The same media reposted in another chat has the same id, so it can be linked from the copy we
+    already have instead of being downloaded again. One instance per thread, like ScanIndex.
+    """
+
+    def __init__(self, path=DEFAULT_REGISTRY_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self): self.db.close()
+
+    def add(self, kind: int, doc_id: int, path, size: int, sha256: Optional[str] = None):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)", (kind, doc_id, str(Path(path).resolve()), size, sha256, time.time()))
+
+    def candidates(self, kind: int, doc_id: int, size: int) -> List[Tuple[Path, Optional[str]]]:
+        """Files on disk with this content, newest first, with their recorded hash (if any).
+        Entries whose file was deleted or changed size are dropped on the way."""
+        rows = self.db.execute("SELECT path, size, sha256 FROM files WHERE doc_id = ? AND kind = ? ORDER BY added_at DESC", (doc_id, kind)).fetchall()
+        found, stale = [], []
+        for path, known_size, digest in rows:
+            try: ok = known_size == size and os.stat(path).st_size == size
+            except OSError: ok = False
+            if ok: found.append((Path(path), digest))
+            else: stale.append(path)
+        if stale: self.forget(kind, doc_id, stale)
+        return found
+
+    def lookup(self, kind: int, doc_id: int, size: int) -> Optional[Path]:
+        found = self.candidates(kind, doc_id, size)
+        return found[0][0] if found else None
+
+    def forget(self, kind: int, doc_id: int, paths: Iterable[str]):
+        with self.db: self.db.executemany("DELETE FROM files WHERE doc_id = ? AND kind = ? AND path = ?", ((doc_id, kind, str(p)) for p in paths))
+
+    def known(self, keys: List[Tuple[int, int, int]]) -> List[bool]:
+        """For each (kind, doc_id, size): is it registered? Index lookups only - files are not stat'ed,
+        so this is cheap enough for a whole scan result"""
+        have = set()
+        for k in range(0, len(keys), LOOKUP_CHUNK):
+            ids = list({doc_id for _, doc_id, _ in keys[k:k + LOOKUP_CHUNK]})
+            q = f"SELECT kind, doc_id, size FROM files WHERE doc_id IN ({','.join('?' * len(ids))})"
+            have.update(self.db.execute(q, ids).fetchall())
+        return [key in have for key in keys]
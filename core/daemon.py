@@ -0,0 +1,139 @@
+"""
+Background job server for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import asyncio
+import hmac
+import itertools
+import json
+import os
+import secrets
+import socket
+from pathlib import Path
+from typing import Dict
+
+from .accounts import open_accounts
+from .headless import connected, scan, sync_chat, load_pending
+
+JOB_COMMANDS = ('scan', 'download', 'resume')
+
+def use_unix_socket(config) -> bool: return hasattr(socket, 'AF_UNIX') and bool(config.get('daemon_socket'))
+
+def write_token(path) -> str:
+    """A fresh secret for the TCP fallback, in a file only this user can read"""
+    path = Path(path); path.parent.mkdir(parents=True, exist_ok=True)
+    token = secrets.token_hex(32)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.chmod(path, 0o600)  # the file may be left over with wider permissions
+    with os.fdopen(fd, 'w') as f: f.write(token)
+    return token
+
+def read_token(config) -> str: return Path(config['daemon_token']).read_text().strip()
+
+class Daemon:
+    """Keeps one client connected and runs jobs sent as JSON lines over a local socket.
+
+    {"cmd": "download", "chat": "@x", "dest": "...", "types": ["video"], "full": false} (also "scan" / "resume"),
+    {"cmd": "status"}, {"cmd": "cancel", "job": 3} and {"cmd": "shutdown"} - each answered with one JSON line.
+    The socket is a Unix socket readable only by this user; where there is none, 127.0.0.1:daemon_port - any local
+    user can reach that, so each request there must also carry "token": the contents of daemon_token (0600, new per start).
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.jobs: Dict[int, dict] = {}
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self.ids = itertools.count(1)
+        self.client = self.pool = None
+        self.accounts = []
+        self.stopped = None
+        self.token = None
+
+    async def serve(self, ready_callback=None):
+        self.stopped = asyncio.Event()
+        async with connected(self.config) as (self.client, self.pool), open_accounts(self.config) as self.accounts:
+            server = await self.listen()
+            if ready_callback: ready_callback()
+            async with server: await self.stopped.wait()
+            for task in self.tasks.values(): task.cancel()
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        try: os.unlink(self.config['daemon_socket'] if use_unix_socket(self.config) else self.config['daemon_token'])
+        except OSError: pass
+
+    async def listen(self):
+        if not use_unix_socket(self.config):
+            if not self.config.get('daemon_token'): raise ValueError("daemon_token is required when the daemon listens on TCP")
+            self.token = write_token(self.config['daemon_token'])
+            return await asyncio.start_server(self.handle, '127.0.0.1', self.config['daemon_port'])
+        path = Path(self.config['daemon_socket']); path.parent.mkdir(parents=True, exist_ok=True)
+        try: path.unlink()  # left over from a daemon that did not shut down cleanly
+        except FileNotFoundError: pass
+        old = os.umask(0o177)  # created 0600 - only this user may submit jobs
+        try: return await asyncio.start_unix_server(self.handle, str(path))
+        finally: os.umask(old)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                try:
+                    request = json.loads(line)
+                    if self.token and not hmac.compare_digest(str(request.pop('token', '')), self.token):
+                        writer.write(b'{"ok": false, "error": "bad token"}\n'); await writer.drain(); break
+                    reply = self.dispatch(request)
+                except Exception as e: reply = {'ok': False, 'error': str(e)}
+                writer.write(json.dumps(reply, ensure_ascii=False).encode('utf-8') + b'\n')
+                await writer.drain()
+        except (asyncio.CancelledError, ConnectionError): pass  # client went away, or the daemon is shutting down
+        finally: writer.close()
+
+    def dispatch(self, request: dict) -> dict:
+        cmd = request.get('cmd')
+        if cmd == 'status': return {'ok': True, 'jobs': list(self.jobs.values())}
+        if cmd == 'cancel':
+            task = self.tasks.get(int(request['job']))
+            if task: task.cancel()
+            return {'ok': task is not None}
+        if cmd == 'shutdown': self.stopped.set(); return {'ok': True}
+        if cmd not in JOB_COMMANDS: raise ValueError(f"unknown command: {cmd}")
+        if cmd == 'resume' and not request.get('chat'):  # every unfinished download
+            return {'ok': True, 'jobs': [self.submit(dict(p, cmd='resume', chat=chat)) for chat, p in load_pending().items()]}
+        if not request.get('chat'): raise ValueError("chat is required")
+        return {'ok': True, 'jobs': [self.submit(request)]}
+
+    def submit(self, request: dict) -> int:
+        job_id = next(self.ids)
+        self.jobs[job_id] = {'id': job_id, 'cmd': request['cmd'], 'chat': request['chat'], 'state': 'running', 'progress': {}, 'result': None, 'error': None}
+        self.tasks[job_id] = asyncio.ensure_future(self.run_job(self.jobs[job_id], request))
+        return job_id
+
+    async def run_job(self, job: dict, request: dict):
+        try:
+            if request['cmd'] == 'scan':
+                def progress(seen, total, found): job['progress'] = {'seen': seen, 'total': total, 'found': found}
+                store, _ = await scan(self.client, self.config, request['chat'], request.get('full', False), progress_callback=progress)
+                job['result'] = {'chat': request['chat'], 'found': len(store)}
+            else:
+                def progress(snapshot): job['progress'] = snapshot
+                job['result'] = await sync_chat(self.client, self.pool, self.config, request['chat'], request.get('dest'), request.get('types'), request.get('full', False),
+                                                rescan=request['cmd'] == 'download', progress_callback=progress, accounts=self.accounts)
+            job['state'] = 'done'
+        except asyncio.CancelledError: job['state'] = 'cancelled'
+        except Exception as e: job['state'], job['error'] = 'failed', str(e)
+        finally: self.tasks.pop(job['id'], None)
+
+def send_request(config, request: dict, timeout=30.0) -> dict:
+    """Client side: one request to a running daemon"""
+    if use_unix_socket(config): sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM); address = config['daemon_socket']
+    else: sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM); address = ('127.0.0.1', config['daemon_port']); request = dict(request, token=read_token(config))
+    with sock:
+        sock.settimeout(timeout); sock.connect(address)
+        sock.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = sock.recv(65536)
+            if not chunk: break
+            data += chunk
+    return json.loads(data)
@@ -0,0 +1,249 @@
+"""
+Parallel download engine for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import asyncio
+import functools
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .accounts import Account, AccountPool
+from .concurrency import AdaptiveLimiter, TransferBudget
+from .content_registry import ContentRegistry, DEFAULT_REGISTRY_PATH, content_key, file_sha256, link_file
+from .media_store import MediaStore, refresh_references
+from .metrics import get_metrics
+from .partfile import PartFile
+from .postprocess import PostProcessor
+from .progress import ProgressAggregator
+from .retry import RetryEngine, is_retryable, classify, FLOOD
+from .scheduler import DownloadScheduler
+from .segmented import SegmentedDownload, StreamDownload
+
+class Downloader:
+    """Downloads store rows into a folder with adaptive concurrency, resumable parts and retries.
+
+    No UI here: progress_callback(snapshot) is called about 10 times per second with a
+    ProgressAggregator snapshot, and run() returns (downloaded, failed, retry stats).
+    Media already on disk from another chat (same document id) is linked with link_mode instead
+    of downloaded; linked / linked_bytes count those.
+    Extra logged-in accounts passed to run() share the files (AccountPool) - the concurrency limits
+    then apply per account, and a FloodWait on one account moves its files to the others.
+    With postprocess steps, every downloaded or linked file also goes through a PostProcessor
+    (process pool, manifest.jsonl in the folder) - run() returns once those are done too.
+    """
+    PROGRESS_INTERVAL = 0.1  # UI updates are coalesced to ~10 per second, however many chunks arrive
+    REFRESH_BATCH = 100  # file references re-fetched per request when one expires
+    MAX_REQUEUES = 2     # times a file that used up its retries goes back to the end of the queue
+
+    def __init__(self, store: MediaStore, indices: List[int], download_path, min_concurrent=2, max_concurrent=12, split_threshold=64 * 2**20, connections=4,
+                 policy='list', priorities=None, link_mode='hardlink', verify_links=False, registry_path=DEFAULT_REGISTRY_PATH, budget: Optional[TransferBudget] = None,
+                 preallocate=True, fsync='off', chat=None, postprocess: Optional[List[str]] = None, postprocess_workers=0,
+                 progress_callback: Optional[Callable[[dict], None]] = None):
+        self.download_path = Path(download_path)
+        self.store, self.indices = store, indices
+        self.scheduler = DownloadScheduler(store, indices, policy, priorities, large_threshold=split_threshold)
+        self.limiter = AdaptiveLimiter(min_concurrent, max_concurrent)
+        self.metrics = get_metrics()
+        self.retry = RetryEngine(on_flood=self.on_flood, on_retry=self.metrics.retry_hook('download'))
+        self.chat = chat  # link of the scanned chat, so extra accounts can resolve it
+        self.post = PostProcessor(download_path, postprocess, postprocess_workers) if postprocess else None  # checks the step names up front
+        self.accounts: Optional[AccountPool] = None
+        self.requeues: Dict[int, int] = {}
+        self.split_threshold, self.connections = split_threshold, connections  # documents above the threshold use several connections
+        self.progress_callback = progress_callback
+        self.budget = budget  # shared with other jobs running at the same time (queue runner), or None
+        self.preallocate, self.fsync = preallocate, fsync
+        self.is_running = True
+        self.downloaded = 0
+        self.failed = 0
+        self.meter = ProgressAggregator(len(indices), sum(store.sizes[i] for i in indices))
+        self.refreshed = set()  # rows whose reference was refreshed since their current attempt started
+        self.refresh_lock = None
+        self.link_mode, self.verify_links, self.registry_path = link_mode, verify_links, registry_path
+        self.registry = None
+        self.fetching: Dict[tuple, asyncio.Future] = {}  # content key -> its download in this run, so duplicates wait and link
+        self.linked = self.linked_bytes = 0
+
+    def stop(self): self.is_running = False  # workers wind down and run() still reports what finished
+
+    async def run(self, client, sender_pool, accounts: List[Account] = ()) -> Tuple[int, int, dict]:
+        self.refresh_lock = asyncio.Lock()
+        self.accounts = AccountPool(Account('main', client, sender_pool), accounts, self.store, self.chat)
+        if accounts:  # every account gets the configured limits; FloodWait only waits when all of them are cooling down
+            self.limiter.minimum, self.limiter.maximum = self.limiter.minimum * len(self.accounts), self.limiter.maximum * len(self.accounts)
+            self.limiter.limit = max(self.limiter.limit, self.limiter.minimum)
+            self.retry.flood_delay = lambda seconds: self.accounts.wait_time()
+        if self.registry_path: self.registry = ContentRegistry(self.registry_path)  # opened here - sqlite connections belong to the loop thread
+        self.limiter.start()
+        ticker = asyncio.ensure_future(self.report_progress())
+        gauges = [self.metrics.gauge('download_queue_depth', lambda: len(self.scheduler)), self.metrics.gauge('download_in_flight', lambda: self.limiter.in_flight),
+                  self.metrics.gauge('download_limit', lambda: self.limiter.limit)]
+        started = time.monotonic()
+        try:
+            if self.post: await self.post.start()
+            # A fixed pool of workers pulls from the scheduler - no task per item, even for 100k-file batches
+            await asyncio.gather(*(self.worker(client) for _ in range(self.limiter.maximum)))
+        finally:
+            if self.post and self.post.executor: await self.post.close()
+            self.limiter.stop(); ticker.cancel()
+            for token in gauges: self.metrics.unregister(token)
+            if self.registry: self.registry.close(); self.registry = None
+            self.emit_progress()
+            self.metrics.event('download', files=len(self.indices), downloaded=self.downloaded, failed=self.failed, linked=self.linked, bytes=self.meter.transferred,
+                               seconds=round(time.monotonic() - started, 3), accounts=self.accounts.stats(), **self.retry.stats)
+        return self.downloaded, self.failed, self.retry.stats
+
+    async def worker(self, client):
+        while self.is_running:
+            async with self.limiter, self.budget or nullcontext():
+                job = self.scheduler.pop()  # picked only once a slot is free, so the policy sees the latest state
+                if job is None: return
+                try: await self.download_item(client, *job)
+                finally: self.scheduler.done(job[1])
+
+    async def download_item(self, client, pos, i):
+        store = self.store
+        name, size = store.name(i), store.sizes[i]
+        try:
+            file_path = self.download_path / name
+            # Already complete - partial files never carry the final name
+            if file_path.exists() and file_path.stat().st_size == size and size > 0:
+                self.downloaded += 1
+                self.meter.skip(size)
+                self.register(i, file_path)  # so an existing library is found from other chats too
+                self.metrics.inc('download_files_total', result='skipped')
+                return
+            if await self.link_existing(i, file_path): return
+
+            started, first, received_total = time.monotonic(), None, 0
+            def prog_callback(received, total):
+                nonlocal first, received_total
+                if not self.is_running: raise Exception("Stopped")
+                delta = self.meter.update(i, received)
+                self.limiter.add_bytes(delta)
+                if delta:
+                    if first is None: first = time.monotonic()
+                    received_total += delta; self.metrics.inc('download_bytes_total', delta)
+
+            key = content_key(store, i)
+            self.fetching[key] = fetched = asyncio.get_running_loop().create_future()
+            used = [None]  # account of the current attempt - its file reference is the one to refresh
+            try:
+                # Retries resume from the .part journal, so a retried file only re-fetches what is missing - possibly on another account
+                await self.retry.call(lambda: self.fetch_on_account(i, file_path, prog_callback, used), refresh=lambda: self.refresh_reference(client, i, used[0]))
+                self.register(i, file_path, await asyncio.to_thread(file_sha256, file_path) if self.verify_links else None)
+            finally:
+                if self.fetching.get(key) is fetched: del self.fetching[key]
+                fetched.set_result(file_path.exists())
+            self.downloaded += 1
+            self.meter.finish(i, True, size)
+            self.file_metrics(i, time.monotonic() - started, first and first - started, received_total)
+            await self.post_process(i, file_path)
+        except Exception as e:
+            self.limiter.on_error()
+            if self.is_running and is_retryable(e) and self.requeues.get(i, 0) < self.MAX_REQUEUES:
+                self.requeues[i] = self.requeues.get(i, 0) + 1; self.retry.stats['requeued'] += 1
+                self.meter.finish(i, False, size, requeued=True)
+                self.scheduler.requeue(pos, i)
+            else:
+                self.failed += 1
+                self.meter.finish(i, False, size)
+                if self.is_running: self.retry.stats['gave_up'] += 1; self.metrics.inc('download_files_total', result='failed')
+
+    def file_metrics(self, i, seconds: float, ttfb: Optional[float], received: int):
+        """Per-file timing: total time, time to first byte and average rate of the bytes fetched in this run"""
+        metrics = self.metrics
+        if not metrics.enabled: return
+        rate = received / seconds if seconds > 0 and received else None
+        metrics.inc('download_files_total', result='downloaded')
+        metrics.observe('file_seconds', seconds)
+        if ttfb is not None: metrics.observe('file_ttfb_seconds', ttfb)
+        if rate is not None: metrics.observe('file_bytes_per_second', rate)
+        metrics.event('file', name=self.store.name(i), size=self.store.sizes[i], received=received, dc=self.store.dc_ids[i], seconds=round(seconds, 3),
+                      ttfb=None if ttfb is None else round(ttfb, 3), bytes_per_s=None if rate is None else round(rate))
+
+    async def link_existing(self, i, file_path) -> bool:
+        """Link the file from a copy we already have (or one this run is downloading right now)"""
+        if self.link_mode == 'off' or not self.registry or not self.store.sizes[i]: return False
+        key = content_key(self.store, i)
+        fetched = self.fetching.get(key)
+        if fetched is not None: await fetched  # the same media twice in one batch - link the second when the first lands
+        src = await self.find_source(key)
+        if src is None or src == file_path.resolve(): return False
+        try: used = await asyncio.to_thread(link_file, src, file_path, self.link_mode)  # a copy fallback must not stall the loop
+        except OSError: return False  # source vanished or the folder is not writable - download instead
+        if used != 'symlink': self.register(i, file_path)  # a symlink breaks with its target, so only real copies are sources
+        self.downloaded += 1; self.linked += 1; self.linked_bytes += key[2]
+        self.meter.skip(key[2])
+        self.metrics.inc('download_files_total', result='linked')
+        await self.post_process(i, file_path, linked=used)
+        return True
+
+    async def post_process(self, i, file_path, **extra):
+        if self.post: await self.post.submit(file_path, {'msg_id': self.store.msg_ids[i], 'doc_id': self.store.doc_ids[i], 'date': self.store.dates[i],
+                                                         'type': self.store.type_name(i), 'size': self.store.sizes[i], **extra})
+
+    async def find_source(self, key):
+        for path, digest in self.registry.candidates(*key):
+            # with verify_links a copy edited since it was downloaded is not linked (hashing runs off the loop)
+            if not self.verify_links or not digest or await asyncio.to_thread(file_sha256, path) == digest: return path
+            self.registry.forget(key[0], key[1], [path])
+        return None
+
+    def register(self, i, file_path, digest=None):
+        if self.registry: self.registry.add(*content_key(self.store, i)[:2], file_path, self.store.sizes[i], digest)
+
+    def on_flood(self, seconds):
+        if len(self.accounts) == 1 or self.accounts.wait_time() > 0: self.limiter.on_flood(seconds)  # every account is waiting
+        else: self.limiter.limit = max(self.limiter.minimum, self.limiter.limit - self.limiter.limit // len(self.accounts))  # drop one account's share
+
+    def observe_latency(self, dc, seconds):
+        self.limiter.observe_latency(seconds); self.metrics.observe('request_seconds', seconds, dc=dc)
+
+    async def fetch_on_account(self, i, file_path, prog_callback, used):
+        """One attempt at row i on the account AccountPool picks (the primary if the picked one cannot see the file)"""
+        pool = self.accounts
+        account = pool.pick(i)
+        self.refreshed.discard(i)  # this attempt uses the reference as it is now - if it expires again, it needs a new refresh
+        location = await pool.location(account, i, self.scheduler.upcoming)
+        if location is None: account, location = pool.primary, self.store.input_location(i)
+        used[0] = account
+        account.in_flight += 1
+        try: await self.fetch(account.client, account.sender_pool, location, i, file_path, prog_callback)
+        except Exception as e:
+            if classify(e) == FLOOD: pool.cooldown(account, e.seconds)
+            raise
+        finally: account.in_flight -= 1
+        account.files += 1; account.bytes += self.store.sizes[i]
+
+    async def fetch(self, client, sender_pool, location, i, file_path, prog_callback):
+        # Data goes to <name>.part with a journal of finished ranges, so an interrupted file resumes mid-way
+        store, size = self.store, self.store.sizes[i]
+        part = PartFile(file_path, size, store.doc_ids[i], self.preallocate, self.fsync)
+        self.meter.start(i, file_path.name, part.done)  # every attempt restarts from what the journal confirms
+        throttle = self.budget.throttle if self.budget else None
+        latency = functools.partial(self.observe_latency, store.dc_ids[i]) if self.metrics.enabled else self.limiter.observe_latency
+        if self.connections > 1 and store.type_name(i) != 'photo' and size >= self.split_threshold:
+            await SegmentedDownload(sender_pool, location, part, store.dc_ids[i], self.connections, prog_callback, latency, throttle).run()
+        else: await StreamDownload(client, location, part, store.dc_ids[i], prog_callback, latency, throttle, size_estimated=store.type_name(i) == 'photo').run()
+
+    async def refresh_reference(self, client, i, account: Optional[Account] = None) -> bool:
+        """File references expire after a while - re-fetch this message and the ones scheduled next in one batch"""
+        if account is not None and account is not self.accounts.primary: return await self.accounts.refresh(account, i, self.scheduler.upcoming)
+        async with self.refresh_lock:
+            if i in self.refreshed: return True  # refreshed in another download's batch while this attempt ran
+            batch = [i] + [j for j in self.scheduler.upcoming(self.REFRESH_BATCH - 1) if j not in self.refreshed]
+            missing = await refresh_references(client, self.store, batch)
+            self.refreshed.update(batch)
+        return i not in missing
+
+    async def report_progress(self):
+        while True:
+            await asyncio.sleep(self.PROGRESS_INTERVAL)
+            self.emit_progress()
+
+    def emit_progress(self):
+        if self.progress_callback: self.progress_callback(self.meter.snapshot())
@@ -0,0 +1,120 @@
+"""
+Headless jobs (scan / download / resume / watch) for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import json
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from telethon import TelegramClient, utils
+
+from .config import APP_DIR
+from .downloader import Downloader
+from .media_store import MediaFilter, MediaStore
+from .scan_index import ScanIndex, DEFAULT_INDEX_PATH
+from .scanner import Scanner
+from .segmented import SenderPool
+
+PENDING_PATH = APP_DIR / 'pending.json'  # downloads started but not finished, for `resume`
+
+class NotAuthorizedError(Exception):
+    """The session file has no logged-in account"""
+
+@asynccontextmanager
+async def connected(config, login_required=True):
+    """A connected client and its per-DC sender pool, closed on exit"""
+    if not config.get('api_id') or not config.get('api_hash'): raise ValueError("api_id / api_hash missing (config.json, TGDL_API_ID / TGDL_API_HASH or --api-id / --api-hash)")
+    Path(config['session']).parent.mkdir(parents=True, exist_ok=True)
+    client = TelegramClient(config['session'], int(config['api_id']), config['api_hash'])
+    await client.connect()
+    pool = SenderPool(client)
+    try:
+        if login_required and not await client.is_user_authorized(): raise NotAuthorizedError(config['session'])
+        yield client, pool
+    finally:
+        await pool.close()
+        await client.disconnect()
+
+def parse_date(value, end=False) -> Optional[datetime]:
+    """YYYY-MM-DD or an ISO date-time, local time unless it says otherwise; end=True turns a bare date into the next midnight"""
+    if not value: return None
+    try: date = datetime.fromisoformat(str(value))
+    except ValueError: raise ValueError(f"invalid date: {value} (YYYY-MM-DD)")
+    if end and len(str(value)) == 10: date += timedelta(days=1)
+    return date.astimezone() if date.tzinfo is None else date
+
+def scan_filter(config, types=None, min_size=None, max_size=None) -> MediaFilter:
+    """The scan's MediaFilter from config (scan_types / scan_since / scan_until / scan_min_size / scan_max_size);
+    a job's own types and size bounds take their place"""
+    return MediaFilter(types or config['scan_types'] or None, parse_date(config['scan_since']), parse_date(config['scan_until'], end=True),
+                       config['scan_min_size'] if min_size is None else min_size, config['scan_max_size'] if max_size is None else max_size)
+
+async def scan(client, config, chat, full=False, progress_callback=None, status_callback=None, scanner_callback=None, media_filter=None) -> Tuple[MediaStore, Scanner]:
+    """Incremental (or full) scan of a chat; returns every indexed file (that media_filter keeps - default: scan_filter(config)) and the scanner for its stats"""
+    store, removed = MediaStore(), []
+    scanner = Scanner(chat, config['max_messages'], config['use_index'] and not full, config['verify_deleted'], batch_callback=store.extend,
+                      progress_callback=progress_callback, status_callback=status_callback, removed_callback=removed.extend,
+                      media_filter=scan_filter(config) if media_filter is None else media_filter)
+    if scanner_callback: scanner_callback(scanner)
+    await scanner.run(client)
+    if removed:
+        gone = set(removed)
+        store = store.subset([i for i in range(len(store)) if store.msg_ids[i] not in gone])
+    return store, scanner
+
+async def load_indexed(client, chat) -> MediaStore:
+    """What the local index holds for a chat, without reading any messages"""
+    entity = await client.get_entity(chat)
+    index = ScanIndex(DEFAULT_INDEX_PATH)
+    try: return index.load(utils.get_peer_id(entity), utils.get_input_peer(entity))
+    finally: index.close()
+
+def select(store: MediaStore, types: Optional[Iterable[str]] = None, newer_than=0, search='', min_size=0, max_size=0) -> List[int]:
+    """Rows matching the filter rules: type names, newer than a message id, name containing search, size bounds in bytes (0 = none)"""
+    types = set(types) if types else None
+    search = (search or '').casefold()
+    return [i for i in range(len(store)) if store.msg_ids[i] > newer_than and (types is None or store.type_name(i) in types)
+            and store.sizes[i] >= min_size and (not max_size or store.sizes[i] <= max_size) and (not search or search in store.name(i).casefold())]
+
+def make_downloader(config, store, indices, dest=None, progress_callback=None, budget=None, chat=None) -> Downloader:
+    return Downloader(store, indices, dest or config['download_path'], config['concurrency_min'], config['concurrency_max'], split_threshold=config['split_threshold_mb'] * 2**20,
+                      connections=config['split_connections'], policy=config['download_order'], link_mode=config['link_mode'], verify_links=config['verify_links'],
+                      preallocate=config['preallocate'], fsync=config['fsync'], budget=budget, chat=chat, postprocess=config['postprocess'], postprocess_workers=config['postprocess_workers'],
+                      progress_callback=progress_callback)
+
+def load_pending(path=PENDING_PATH) -> Dict[str, dict]:
+    try: return json.loads(Path(path).read_text(encoding='utf-8'))
+    except (OSError, ValueError): return {}
+
+def save_pending(pending: Dict[str, dict], path=PENDING_PATH):
+    path = Path(path); path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(pending, ensure_ascii=False, indent=2), encoding='utf-8')
+    os.replace(tmp, path)
+
+async def sync_chat(client, pool, config, chat, dest=None, types=None, full=False, rescan=True, only_new=False,
+                    progress_callback: Optional[Callable[[dict], None]] = None, status_callback: Optional[Callable[[str], None]] = None,
+                    engine_callback: Optional[Callable[[Downloader], None]] = None, accounts=()) -> dict:
+    """Scan a chat and download its media - the work behind `download`, `resume` and each `watch` round.
+    Existing files are skipped and .part files continue, so running it again is always safe.
+    accounts: extra connected accounts (core.accounts) that share the download."""
+    dest = str(dest or config['download_path'])
+    pending = load_pending(); pending[chat] = {'dest': dest, 'types': sorted(types) if types else None}; save_pending(pending)
+    watermark = 0
+    if rescan:
+        # watch rounds leave the types to select(): only an unfiltered scan moves the watermark they count from
+        store, scanner = await scan(client, config, chat, full, status_callback=status_callback, media_filter=scan_filter(config, None if only_new else types))
+        watermark = scanner.watermark
+    else: store = await load_indexed(client, chat)
+    indices = select(store, types, watermark if only_new else 0)
+    Path(dest).mkdir(parents=True, exist_ok=True)
+    engine = make_downloader(config, store, indices, dest, progress_callback, chat=chat)
+    if engine_callback: engine_callback(engine)
+    downloaded, failed, stats = await engine.run(client, pool, accounts)
+    if not failed and engine.is_running:
+        pending = load_pending(); pending.pop(chat, None); save_pending(pending)
+    return {'chat': chat, 'found': len(store), 'selected': len(indices), 'downloaded': downloaded, 'failed': failed, 'linked': engine.linked, 'linked_bytes': engine.linked_bytes, 'stats': stats}
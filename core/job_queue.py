@@ -0,0 +1,163 @@
+"""
+Persistent multi-chat job queue for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .concurrency import Slots, TransferBudget
+from .config import APP_DIR
+from .headless import scan, scan_filter, select, make_downloader
+
+JOBS_PATH = APP_DIR / 'jobs.json'
+
+QUEUED, SCANNING, WAITING, DOWNLOADING, PAUSED, DONE, FAILED = 'queued', 'scanning', 'waiting', 'downloading', 'paused', 'done', 'failed'
+ACTIVE = (SCANNING, WAITING, DOWNLOADING)
+
+class JobQueue:
+    """The chats to mirror, each with a destination, filter rules and a state, kept in jobs.json so the
+    queue survives restarts. Jobs are dicts: id, chat, dest, rules (types, search, min_size, max_size),
+    state, result, error - plus 'progress', which is only kept in memory.
+    """
+
+    def __init__(self, path=JOBS_PATH):
+        self.path = Path(path)
+        self.jobs: Dict[int, dict] = {}
+        try: saved = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError): saved = []
+        for job in saved:
+            if job['state'] in ACTIVE: job['state'] = QUEUED  # cut off by a restart - the index and .part journals keep what was done
+            job['progress'] = {}
+            self.jobs[job['id']] = job
+        self.next_id = max(self.jobs, default=0) + 1
+
+    def __len__(self): return len(self.jobs)
+
+    def add(self, chat: str, dest=None, types: Optional[Iterable[str]] = None, search='', min_size=0, max_size=0) -> dict:
+        job = {'id': self.next_id, 'chat': chat, 'dest': str(dest) if dest else None,
+               'rules': {'types': sorted(types) if types else None, 'search': search or '', 'min_size': min_size, 'max_size': max_size},
+               'state': QUEUED, 'result': None, 'error': None, 'progress': {}}
+        self.jobs[job['id']] = job; self.next_id += 1
+        self.save()
+        return job
+
+    def remove(self, job_id: int):
+        self.jobs.pop(job_id, None); self.save()
+
+    def runnable(self) -> List[dict]: return [job for job in self.jobs.values() if job['state'] == QUEUED]
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        jobs = [{k: v for k, v in job.items() if k != 'progress'} for job in self.jobs.values()]
+        tmp.write_text(json.dumps(jobs, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+class JobRunner:
+    """Works through a JobQueue on one connected client: each job is scanned, filtered by its rules and downloaded.
+
+    Up to queue_scans jobs scan and up to queue_downloads download at once, so the next chat's scan overlaps
+    the previous one's download; all downloads share one TransferBudget (files in flight, bytes per second).
+    pause() stops a job where it is - the scan index and the .part journals keep its progress - and resume()
+    queues it again. Every method runs on the loop thread; update_callback gets a copy of each changed job.
+    """
+
+    def __init__(self, queue: JobQueue, config, update_callback: Optional[Callable[[dict], None]] = None):
+        self.queue, self.config, self.update_callback = queue, config, update_callback
+        self.scan_slots, self.download_slots = Slots(config['queue_scans']), Slots(config['queue_downloads'])
+        self.budget = TransferBudget(config['queue_transfers'], config['queue_bandwidth_kb'] * 1024)
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self.workers: Dict[int, object] = {}  # job id -> its running Scanner or Downloader (both have stop())
+        self.client = self.pool = None
+        self.accounts = ()
+        self.stopped = None
+
+    async def run(self, client, pool, until_idle=False, accounts=()):
+        """Runs the queued jobs, and any added or resumed meanwhile, until stop() - or until none is left running.
+        Extra accounts (core.accounts) share every job's downloads."""
+        self.client, self.pool, self.accounts, self.stopped = client, pool, accounts, asyncio.Event()
+        for job in self.queue.runnable(): self.start(job)
+        try:
+            if not until_idle: await self.stopped.wait()
+            while until_idle and self.tasks: await asyncio.wait(list(self.tasks.values()))
+        finally:
+            for task in list(self.tasks.values()): task.cancel()
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def stop(self):
+        if self.stopped: self.stopped.set()
+
+    def configure(self, scans: int, downloads: int, transfers: int, bandwidth_kb: int):
+        self.scan_slots.resize(scans); self.download_slots.resize(downloads)
+        self.budget.configure(transfers, bandwidth_kb * 1024)
+
+    def add(self, chat: str, **rules) -> dict:
+        job = self.queue.add(chat, **rules)
+        self.notify(job); self.start(job)
+        return job
+
+    def pause(self, job_id: int):
+        job = self.queue.jobs.get(job_id)
+        if job is None or job['state'] not in (QUEUED,) + ACTIVE: return
+        self.set(job, state=PAUSED)
+        worker = self.workers.get(job_id)
+        if worker: worker.stop()  # returns after the files in flight are journaled
+        elif job_id in self.tasks: self.tasks[job_id].cancel()  # still waiting for a slot
+
+    def resume(self, job_id: int):
+        """Queue a paused, finished or failed job again - a finished one picks up what is new in its chat"""
+        job = self.queue.jobs.get(job_id)
+        if job is None or job['state'] not in (PAUSED, DONE, FAILED) or job_id in self.tasks: return
+        self.set(job, state=QUEUED, error=None)
+        self.start(job)
+
+    def remove(self, job_id: int):
+        self.pause(job_id)
+        self.queue.remove(job_id)
+
+    def start(self, job: dict):
+        if self.stopped is None or job['id'] in self.tasks: return  # not running yet: run() starts every queued job
+        self.tasks[job['id']] = asyncio.ensure_future(self.run_job(job))
+
+    def set(self, job: dict, **changes):
+        job.update(changes); self.queue.save(); self.notify(job)
+
+    def progress(self, job: dict, progress: dict):
+        job['progress'] = progress; self.notify(job)
+
+    def notify_all(self):
+        for job in list(self.queue.jobs.values()): self.notify(job)
+
+    def notify(self, job: dict):
+        if self.update_callback and job['id'] in self.queue.jobs: self.update_callback(dict(job))  # removed jobs go quiet
+
+    async def run_job(self, job: dict):
+        job_id, rules = job['id'], job['rules']
+        try:
+            async with self.scan_slots:
+                self.set(job, state=SCANNING, error=None)
+                store, _ = await scan(self.client, self.config, job['chat'], progress_callback=lambda seen, total, found: self.progress(job, {'seen': seen, 'total': total, 'found': found}),
+                                      scanner_callback=lambda scanner: self.workers.__setitem__(job_id, scanner), media_filter=scan_filter(self.config, rules['types'], rules['min_size'] or None, rules['max_size'] or None))
+                self.workers.pop(job_id, None)
+            if job['state'] == PAUSED: return
+            indices = select(store, rules['types'], search=rules['search'], min_size=rules['min_size'], max_size=rules['max_size'])
+            self.set(job, state=WAITING, progress={'found': len(store), 'selected': len(indices)})
+            async with self.download_slots:
+                self.set(job, state=DOWNLOADING)
+                dest = job['dest'] or self.config['download_path']
+                Path(dest).mkdir(parents=True, exist_ok=True)
+                engine = self.workers[job_id] = make_downloader(self.config, store, indices, dest, lambda snap: self.progress(job, snap), self.budget, job['chat'])
+                downloaded, failed, stats = await engine.run(self.client, self.pool, self.accounts)
+            result = {'chat': job['chat'], 'found': len(store), 'selected': len(indices), 'downloaded': downloaded, 'failed': failed,
+                      'linked': engine.linked, 'linked_bytes': engine.linked_bytes, 'stats': stats}
+            self.set(job, result=result, **({} if job['state'] == PAUSED else {'state': DONE}))
+        except asyncio.CancelledError:
+            if job['state'] in ACTIVE: self.set(job, state=QUEUED)  # runner stopped - the next run continues it
+            if job['state'] != PAUSED: raise
+        except Exception as e: self.set(job, state=FAILED, error=str(e))
+        finally:
+            self.tasks.pop(job_id, None); self.workers.pop(job_id, None)
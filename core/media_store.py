@@ -0,0 +1,193 @@
+"""
+Compact media record store for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from telethon.tl.types import (
+    MessageMediaPhoto, MessageMediaDocument, PhotoSize, PhotoSizeProgressive,
+    InputDocumentFileLocation, InputPhotoFileLocation
+)
+
+TYPES = ('photo', 'image', 'video', 'document', 'archive', 'file')
+TYPE_CODES = {t: i for i, t in enumerate(TYPES)}
+PHOTO, IMAGE, VIDEO, DOCUMENT, ARCHIVE, FILE = range(len(TYPES))
+
+EXTENSIONS = (
+    (IMAGE, ('.jpg', '.jpeg', '.png', '.gif', '.webp')),
+    (VIDEO, ('.mp4', '.avi', '.mkv', '.mov', '.wmv')),
+    (DOCUMENT, ('.pdf', '.doc', '.docx', '.txt', '.epub')),
+    (ARCHIVE, ('.zip', '.rar', '.7z', '.tar', '.gz')),
+)
+
+def type_for_name(filename: str) -> int:
+    ext = filename.lower()
+    return next((code for code, exts in EXTENSIONS if ext.endswith(exts)), FILE)
+
+class MediaFilter:
+    """What a scan keeps: type names, a date range (min_date inclusive, max_date exclusive) and size bounds in bytes (0 = none).
+    An empty filter keeps everything and is false."""
+
+    def __init__(self, types=None, min_date: Optional[datetime] = None, max_date: Optional[datetime] = None, min_size=0, max_size=0):
+        unknown = [t for t in types or () if t not in TYPE_CODES]
+        if unknown: raise ValueError(f"unknown media type: {', '.join(unknown)} (known: {', '.join(TYPES)})")
+        self.types = [t for t in TYPES if t in set(types)] if types and set(types) != set(TYPES) else None
+        self.codes = frozenset(TYPE_CODES[t] for t in self.types) if self.types else None
+        self.min_date, self.max_date = min_date, max_date
+        self.min_ts = int(min_date.timestamp()) if min_date else None
+        self.max_ts = int(max_date.timestamp()) if max_date else None
+        self.min_size, self.max_size = min_size or 0, max_size or 0
+
+    def __bool__(self): return bool(self.codes or self.min_date or self.max_date or self.min_size or self.max_size)
+
+    def accepts(self, type_code: int, date: int, size: int) -> bool:
+        return ((self.codes is None or type_code in self.codes) and (self.min_ts is None or date >= self.min_ts) and (self.max_ts is None or date < self.max_ts)
+                and size >= self.min_size and (not self.max_size or size <= self.max_size))
+
+    def rows(self, store: 'MediaStore') -> List[int]:
+        return [i for i in range(len(store)) if self.accepts(store.types[i], store.dates[i], store.sizes[i])]
+
+PREVIEW_MIN_SIDE = 90  # smallest side worth showing in a list row; the stripped 'i' blurs are smaller
+
+def preview_size_type(sizes) -> str:
+    """Type of the smallest downloadable thumbnail that still fills a list row ('' = none)"""
+    fitting = sorted((max(s.w, s.h), s.type) for s in sizes or () if isinstance(s, (PhotoSize, PhotoSizeProgressive)))
+    return next((t for side, t in fitting if side >= PREVIEW_MIN_SIDE), fitting[-1][1] if fitting else '')
+
+def largest_photo_size(photo):
+    """(type, bytes) of the biggest downloadable size - what download_media would pick"""
+    best = None
+    for s in photo.sizes:
+        if isinstance(s, PhotoSize): size = s.size
+        elif isinstance(s, PhotoSizeProgressive): size = max(s.sizes)
+        else: continue
+        if best is None or size > best[1]: best = (s.type, size)
+    return best
+
+class MediaStore:
+    """Scan results as parallel arrays - keeps only what the download needs, never the Message objects.
+
+    Row i is described by msg_ids[i], dates[i], ... file_refs[i]. Names are interned in a shared
+    table and generated names (photo_<id>.jpg, file_<id>) are not stored at all (name id 0).
+    preview_ids[i] is the thumbnail size to show for the row (interned like thumb_ids, 0 = none).
+    """
+
+    def __init__(self, peer=None):
+        self.peer = peer  # InputPeer of the scanned chat, used to re-fetch messages by id
+        self.msg_ids, self.dates, self.sizes = array('q'), array('q'), array('q')
+        self.doc_ids, self.access_hashes = array('q'), array('q')
+        self.dc_ids, self.types = array('B'), array('B')
+        self.name_ids, self.thumb_ids, self.preview_ids = array('I'), array('B'), array('B')
+        self.file_refs: List[bytes] = []
+        self.names: List[str] = ['']  # 0 = generated name
+        self.name_index: Dict[str, int] = {}
+        self.thumb_types: List[str] = ['']  # interned photo size types ('y', 'w', ...)
+
+    def __len__(self): return len(self.msg_ids)
+
+    def intern_name(self, name: str) -> int:
+        nid = self.name_index.get(name)
+        if nid is None:
+            nid = self.name_index[name] = len(self.names); self.names.append(name)
+        return nid
+
+    def intern_thumb(self, t: str) -> int:
+        try: return self.thumb_types.index(t)
+        except ValueError: self.thumb_types.append(t); return len(self.thumb_types) - 1
+
+    def append(self, msg_id, date, type_code, name_id, size, doc_id, access_hash, dc_id, file_ref, thumb_id=0, preview_id=0):
+        self.msg_ids.append(msg_id); self.dates.append(date); self.types.append(type_code); self.name_ids.append(name_id)
+        self.sizes.append(size); self.doc_ids.append(doc_id); self.access_hashes.append(access_hash)
+        self.dc_ids.append(dc_id); self.file_refs.append(file_ref); self.thumb_ids.append(thumb_id); self.preview_ids.append(preview_id)
+
+    def add_message(self, msg, media_filter: Optional[MediaFilter] = None) -> bool:
+        """Classify a message and append it if it carries downloadable media (that media_filter accepts)"""
+        media = msg.media
+        if isinstance(media, MessageMediaPhoto) and media.photo:
+            photo = media.photo
+            best = largest_photo_size(photo)
+            if best is None: return False
+            date = int(msg.date.timestamp())
+            if media_filter and not media_filter.accepts(PHOTO, date, best[1]): return False
+            self.append(msg.id, date, PHOTO, 0, best[1], photo.id, photo.access_hash, photo.dc_id, photo.file_reference, self.intern_thumb(best[0]),
+                        self.intern_thumb(preview_size_type(photo.sizes)))
+            return True
+        if isinstance(media, MessageMediaDocument) and media.document:
+            doc = media.document
+            filename = next((attr.file_name for attr in doc.attributes if hasattr(attr, 'file_name')), None)
+            date, type_code = int(msg.date.timestamp()), type_for_name(filename) if filename else FILE
+            if media_filter and not media_filter.accepts(type_code, date, doc.size): return False
+            self.append(msg.id, date, type_code,
+                        self.intern_name(filename) if filename else 0, doc.size, doc.id, doc.access_hash, doc.dc_id, doc.file_reference, 0, self.intern_thumb(preview_size_type(doc.thumbs)))
+            return True
+        return False
+
+    def extend(self, other: 'MediaStore'):
+        """Append another store (e.g. a scan batch), re-interning its names"""
+        if self.peer is None: self.peer = other.peer
+        name_map = [0] + [self.intern_name(n) for n in other.names[1:]]
+        thumb_map = [0] + [self.intern_thumb(t) for t in other.thumb_types[1:]]
+        self.msg_ids.extend(other.msg_ids); self.dates.extend(other.dates); self.types.extend(other.types)
+        self.name_ids.extend(array('I', (name_map[n] for n in other.name_ids)))
+        self.thumb_ids.extend(array('B', (thumb_map[t] for t in other.thumb_ids))); self.preview_ids.extend(array('B', (thumb_map[t] for t in other.preview_ids)))
+        self.sizes.extend(other.sizes); self.doc_ids.extend(other.doc_ids); self.access_hashes.extend(other.access_hashes)
+        self.dc_ids.extend(other.dc_ids); self.file_refs.extend(other.file_refs)
+
+    def subset(self, indices) -> 'MediaStore':
+        """A new store with only the given rows (names are re-interned, so the table shrinks too)"""
+        out = MediaStore(self.peer)
+        for i in indices:
+            nid, tid, pid = self.name_ids[i], self.thumb_ids[i], self.preview_ids[i]
+            out.append(self.msg_ids[i], self.dates[i], self.types[i], out.intern_name(self.names[nid]) if nid else 0, self.sizes[i], self.doc_ids[i],
+                       self.access_hashes[i], self.dc_ids[i], self.file_refs[i], out.intern_thumb(self.thumb_types[tid]) if tid else 0, out.intern_thumb(self.thumb_types[pid]) if pid else 0)
+        return out
+
+    def type_name(self, i: int) -> str: return TYPES[self.types[i]]
+
+    def name(self, i: int) -> str:
+        nid = self.name_ids[i]
+        if nid: return self.names[nid]
+        return f"photo_{self.msg_ids[i]}.jpg" if self.types[i] == PHOTO else f"file_{self.msg_ids[i]}"
+
+    def date(self, i: int) -> datetime: return datetime.fromtimestamp(self.dates[i], timezone.utc)
+
+    def input_location(self, i: int, ref=None):
+        """Where row i's file is; ref = (access_hash, file_reference) as another account sees it"""
+        access_hash, file_ref = ref or (self.access_hashes[i], self.file_refs[i])
+        if self.types[i] == PHOTO:
+            return InputPhotoFileLocation(id=self.doc_ids[i], access_hash=access_hash, file_reference=file_ref, thumb_size=self.thumb_types[self.thumb_ids[i]])
+        return InputDocumentFileLocation(id=self.doc_ids[i], access_hash=access_hash, file_reference=file_ref, thumb_size='')
+
+    def preview_key(self, i: int):
+        """(is photo, id, size type) naming the row's thumbnail in caches, or None"""
+        pid = self.preview_ids[i]
+        return (self.types[i] == PHOTO, self.doc_ids[i], self.thumb_types[pid]) if pid else None
+
+    def preview_location(self, i: int):
+        """Where the row's list thumbnail is, or None if it has none"""
+        pid = self.preview_ids[i]
+        if not pid: return None
+        cls = InputPhotoFileLocation if self.types[i] == PHOTO else InputDocumentFileLocation
+        return cls(id=self.doc_ids[i], access_hash=self.access_hashes[i], file_reference=self.file_refs[i], thumb_size=self.thumb_types[pid])
+
+    def refresh_from_message(self, i: int, msg) -> bool:
+        """Take the fresh file reference from a re-fetched message; False if the media is gone"""
+        media = getattr(msg, 'media', None)
+        obj = getattr(media, 'photo', None) or getattr(media, 'document', None)
+        if obj is None or obj.id != self.doc_ids[i]: return False
+        self.file_refs[i] = obj.file_reference; self.access_hashes[i] = obj.access_hash
+        return True
+
+async def refresh_references(client, store: MediaStore, indices: List[int]) -> List[int]:
+    """Re-fetch messages by id (100 per request) and update their file references.
+    Returns the indices whose media no longer exists."""
+    missing = []
+    for k in range(0, len(indices), 100):
+        chunk = indices[k:k + 100]
+        messages = await client.get_messages(store.peer, ids=[store.msg_ids[i] for i in chunk])
+        for i, msg in zip(chunk, messages):
+            if not store.refresh_from_message(i, msg): missing.append(i)
+    return missing
@@ -0,0 +1,189 @@
+"""
+Engine metrics for Telegram Downloader ULTIMATE PRO - Prometheus text endpoint and JSON-lines log
+Created by Aviel.AI
+"""
+
+import asyncio
+import json
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+PREFIX = 'tgdl_'
+SECONDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+RATES = (64e3, 256e3, 1e6, 2e6, 5e6, 10e6, 20e6, 50e6, 100e6)  # bytes per second
+DISK = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'scan_messages_total': ('counter', "Messages read by scans", None),
+    'scan_media_total': ('counter', "Messages with media found by scans", None),
+    'download_bytes_total': ('counter', "Bytes received from Telegram", None),
+    'download_files_total': ('counter', "Files finished, by result (downloaded / linked / skipped / failed)", None),
+    'download_queue_depth': ('gauge', "Files waiting for a download slot", None),
+    'download_in_flight': ('gauge', "Files downloading right now", None),
+    'download_limit': ('gauge', "Current adaptive concurrency limit", None),
+    'file_seconds': ('histogram', "Time to download one file", SECONDS),
+    'file_ttfb_seconds': ('histogram', "Time from starting a file to its first bytes", SECONDS),
+    'file_bytes_per_second': ('histogram', "Average rate of each downloaded file", RATES),
+    'request_seconds': ('histogram', "Duration of file requests, by data center", SECONDS),
+    'retries_total': ('counter', "Retries, by engine and policy (flood / reference / transient)", None),
+    'flood_wait_seconds_total': ('counter', "Seconds FloodWait asked for, by engine", None),
+    'disk_write_seconds': ('histogram', "Duration of each write to a .part file", DISK),
+    'disk_write_bytes_total': ('counter', "Bytes written to .part files", None),
+    'postprocess_seconds': ('histogram', "Time to post-process one file (all its steps)", SECONDS),
+    'postprocess_queue_depth': ('gauge', "Downloaded files waiting for post-processing", None),
+}
+
+def label_key(labels: dict) -> tuple: return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def format_value(value) -> str: return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+def format_labels(key: tuple, extra=()) -> str:
+    pairs = list(key) + list(extra)
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}' if pairs else ''
+
+class NullMetrics:
+    """What the engines report to while metrics are off - every call returns at once"""
+    enabled = False
+
+    def inc(self, name: str, value=1, **labels): pass
+    def observe(self, name: str, value: float, **labels): pass
+    def gauge(self, name: str, fn: Callable[[], float], **labels): return None
+    def unregister(self, token): pass
+    def event(self, kind: str, **fields): pass
+    def retry_hook(self, engine: str): return None
+    async def start(self): pass
+    async def close(self): pass
+
+class Metrics(NullMetrics):
+    """Counters, histograms and gauges of the scan and download engines, with two outlets:
+
+    - a Prometheus text endpoint on http://127.0.0.1:port/metrics (port 0 = none)
+    - a JSON-lines log: one line per finished file and scan, and a sample of every metric
+      (plus messages/s, media ratio and bytes/s over the interval) every SAMPLE_INTERVAL seconds
+
+    Everything is recorded and served on the engine's event loop thread - no locks.
+    Gauges are callables read when sampled, so a queue depth costs nothing until someone looks.
+    """
+    enabled = True
+    SAMPLE_INTERVAL = 10.0
+
+    def __init__(self, port=0, log_path=None, host='127.0.0.1'):
+        self.port, self.host = port, host
+        self.log_path = Path(log_path) if log_path else None
+        self.counters: Dict[Tuple[str, tuple], float] = {}
+        self.histograms: Dict[Tuple[str, tuple], list] = {}  # bucket counts (+Inf last), then sum and count
+        self.gauges: Dict[int, Tuple[str, tuple, Callable[[], float]]] = {}
+        self.next_token = 0
+        self.log = self.server = self.sampler = None
+
+    def inc(self, name: str, value=1, **labels):
+        key = (name, label_key(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, label_key(labels))
+        h = self.histograms.get(key)
+        buckets = METRICS[name][2]
+        if h is None: h = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+        h[bisect_left(buckets, value)] += 1; h[-2] += value; h[-1] += 1
+
+    def gauge(self, name: str, fn: Callable[[], float], **labels) -> int:
+        """Register a gauge read from fn(); gauges of the same name and labels add up (e.g. two running downloads)"""
+        self.next_token += 1
+        self.gauges[self.next_token] = (name, label_key(labels), fn)
+        return self.next_token
+
+    def unregister(self, token): self.gauges.pop(token, None)
+
+    def gauge_values(self) -> Dict[Tuple[str, tuple], float]:
+        values = {}
+        for name, key, fn in self.gauges.values(): values[name, key] = values.get((name, key), 0) + fn()
+        return values
+
+    def retry_hook(self, engine: str) -> Callable[[str, float], None]:
+        """RetryEngine on_retry callback counting retries and FloodWait seconds for one engine (scan / download)"""
+        def record(policy: str, seconds: float):
+            self.inc('retries_total', engine=engine, policy=policy)
+            if policy == 'flood': self.inc('flood_wait_seconds_total', seconds, engine=engine)
+        return record
+
+    def event(self, kind: str, **fields):
+        if self.log: self.log.write(json.dumps({'t': round(time.time(), 3), 'event': kind, **fields}, ensure_ascii=False) + '\n')
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        gauges = self.gauge_values()
+        lines = []
+        for name, (kind, text, buckets) in METRICS.items():
+            full = PREFIX + name
+            if kind == 'counter': samples = [(key, value) for (n, key), value in self.counters.items() if n == name]
+            elif kind == 'gauge': samples = [(key, value) for (n, key), value in gauges.items() if n == name]
+            else: samples = [(key, h) for (n, key), h in self.histograms.items() if n == name]
+            lines += [f"# HELP {full} {text}", f"# TYPE {full} {kind}"]
+            for key, value in sorted(samples, key=lambda s: s[0]):
+                if kind != 'histogram': lines.append(f"{full}{format_labels(key)} {format_value(value)}"); continue
+                total = 0
+                for bound, count in zip(list(buckets) + ['+Inf'], value):
+                    total += count
+                    lines.append(f"{full}_bucket{format_labels(key, [('le', bound if bound == '+Inf' else format_value(bound))])} {total}")
+                lines += [f"{full}_sum{format_labels(key)} {format_value(value[-2])}", f"{full}_count{format_labels(key)} {value[-1]}"]
+        return '\n'.join(lines) + '\n'
+
+    def flat(self) -> dict:
+        """Counters and gauges as {'name{labels}': value} - the body of a log sample"""
+        out = {f"{name}{format_labels(key)}": value for (name, key), value in self.counters.items()}
+        out.update((f"{name}{format_labels(key)}", value) for (name, key), value in self.gauge_values().items())
+        return out
+
+    def total(self, name: str) -> float: return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    async def start(self):
+        """Open the log and the endpoint - on the loop the engines run on"""
+        if self.log_path:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            self.log = open(self.log_path, 'a', encoding='utf-8', buffering=1)  # line-buffered: tail -f shows each event
+            self.sampler = asyncio.ensure_future(self.sample())
+        if self.port: self.server = await asyncio.start_server(self.handle, self.host, self.port)
+
+    async def close(self):
+        if self.sampler: self.sampler.cancel()
+        if self.server: self.server.close(); await self.server.wait_closed()
+        if self.log: self.event('sample', **self.flat()); self.log.close()
+        self.log = self.server = self.sampler = None
+
+    async def sample(self):
+        last = (time.monotonic(), 0, 0, 0)
+        while True:
+            await asyncio.sleep(self.SAMPLE_INTERVAL)
+            now, messages, media, received = time.monotonic(), self.total('scan_messages_total'), self.total('scan_media_total'), self.total('download_bytes_total')
+            elapsed, d_messages = now - last[0], messages - last[1]
+            self.event('sample', scan_messages_per_s=round(d_messages / elapsed, 1), scan_media_ratio=round((media - last[2]) / d_messages, 3) if d_messages else None,
+                       download_bytes_per_s=round((received - last[3]) / elapsed), **self.flat())
+            last = (now, messages, media, received)
+
+    async def handle(self, reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()).strip(): pass  # headers
+            path = request.split()[1] if len(request.split()) > 1 else b''
+            if path.split(b'?')[0] in (b'/metrics', b'/'): status, body = '200 OK', self.render().encode('utf-8')
+            else: status, body = '404 Not Found', b'not found\n'
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('ascii') + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError): pass
+        finally: writer.close()
+
+_metrics = NullMetrics()
+
+def get_metrics():
+    """The metrics the engines report to (a NullMetrics unless configure_metrics turned them on)"""
+    return _metrics
+
+def configure_metrics(config) -> NullMetrics:
+    """Metrics as config says (metrics_port / metrics_log); engines created afterwards report to them"""
+    global _metrics
+    _metrics = Metrics(config.get('metrics_port') or 0, config.get('metrics_log') or None) if config.get('metrics_port') or config.get('metrics_log') else NullMetrics()
+    return _metrics
@@ -0,0 +1,103 @@
+"""
+Resumable partial downloads for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+class PartFile:
+    """A download in progress: <name>.part holds the data, <name>.part.json the byte ranges
+    confirmed written. A stopped or crashed download continues from the journal, and the
+    finished file only appears under its real name through an atomic rename.
+
+    fsync: 'off' leaves flushing to the OS, 'finish' syncs the data before the rename,
+    'always' also before every journal write (the journal never claims bytes that are not on disk).
+    open(), save() and finalize() may block on the disk - PartWriter runs them on a worker thread.
+    """
+    SAVE_INTERVAL = 1.0  # seconds between journal writes while downloading
+
+    def __init__(self, final_path, size: int, doc_id: int, preallocate=True, fsync='off'):
+        self.final = Path(final_path)
+        self.part = self.final.with_name(self.final.name + '.part')
+        self.journal = self.final.with_name(self.final.name + '.part.json')
+        self.size, self.doc_id = size, doc_id
+        self.preallocate, self.fsync = preallocate, fsync
+        self.ranges: List[Tuple[int, int]] = []  # sorted, merged [start, end)
+        self.last_save = 0.0
+        self.fd = None
+        self.load()
+
+    def load(self):
+        try:
+            j = json.loads(self.journal.read_text())
+            if j['size'] == self.size and j['doc_id'] == self.doc_id and self.part.exists():
+                self.ranges = [tuple(r) for r in j['ranges']]
+                return
+        except (OSError, ValueError, KeyError): pass
+        self.ranges = []  # no journal, or it belongs to another file - start over
+
+    def open(self) -> int:
+        """Data file opened for positional writes at its final size. A new file gets its blocks reserved up front
+        where the filesystem can (posix_fallocate), so downloads writing side by side do not interleave fragments."""
+        fresh = not (self.part.exists() and self.ranges)
+        self.fd = fd = os.open(self.part, os.O_RDWR | os.O_CREAT | (os.O_TRUNC if fresh else 0) | getattr(os, 'O_BINARY', 0), 0o666)
+        if os.fstat(fd).st_size != self.size:
+            try:
+                if not (fresh and self.preallocate and self.size and hasattr(os, 'posix_fallocate')): raise OSError
+                os.posix_fallocate(fd, 0, self.size)
+            except OSError: os.ftruncate(fd, self.size)  # sparse file - filesystems without allocation support (or Windows)
+        return fd
+
+    def close(self):
+        if self.fd is not None: self.save(); os.close(self.fd); self.fd = None
+
+    @property
+    def done(self) -> int: return sum(e - s for s, e in self.ranges)
+
+    def contiguous(self) -> int:
+        """End of the completed range that starts at byte 0"""
+        return self.ranges[0][1] if self.ranges and self.ranges[0][0] == 0 else 0
+
+    def missing(self, part_size: int) -> List[int]:
+        """Aligned part offsets that are not fully covered yet"""
+        out, k = [], 0
+        for offset in range(0, self.size, part_size):
+            end = min(offset + part_size, self.size)
+            while k < len(self.ranges) and self.ranges[k][1] <= offset: k += 1
+            if not (k < len(self.ranges) and self.ranges[k][0] <= offset and self.ranges[k][1] >= end): out.append(offset)
+        return out
+
+    def mark(self, start: int, end: int):
+        """Record [start, end) as written (the caller saves the journal when save_due)"""
+        merged = []
+        for s, e in self.ranges:
+            if e < start or s > end: merged.append((s, e))
+            else: start, end = min(s, start), max(e, end)
+        merged.append((start, end)); merged.sort()
+        self.ranges = merged  # replaced, never mutated - save() may be reading the old list on another thread
+
+    @property
+    def save_due(self) -> bool: return time.monotonic() - self.last_save >= self.SAVE_INTERVAL
+
+    def save(self):
+        self.last_save = time.monotonic()
+        if self.fsync == 'always' and self.fd is not None: os.fsync(self.fd)
+        tmp = self.journal.with_name(self.journal.name + '.tmp')
+        tmp.write_text(json.dumps({'size': self.size, 'doc_id': self.doc_id, 'ranges': self.ranges}))
+        os.replace(tmp, self.journal)
+
+    def finalize(self, actual_size: int = None):
+        """Move the completed data to its real name and drop the journal"""
+        if self.fd is not None: os.close(self.fd); self.fd = None
+        if actual_size is not None and actual_size != self.size: os.truncate(self.part, actual_size)
+        if self.fsync != 'off':
+            fd = os.open(self.part, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            try: os.fsync(fd)  # data durable before the real name appears
+            finally: os.close(fd)
+        os.replace(self.part, self.final)
+        try: self.journal.unlink()
+        except FileNotFoundError: pass
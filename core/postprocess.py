@@ -0,0 +1,155 @@
+"""
+Post-download processing for Telegram Downloader ULTIMATE PRO - MIME sniffing, checksums, metadata, archive extraction
+Created by Aviel.AI
+"""
+
+import asyncio
+import json
+import mimetypes
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tarfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .content_registry import file_sha256
+from .metrics import get_metrics
+
+MANIFEST_NAME = 'manifest.jsonl'  # one JSON line per processed file, in the download folder
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+EXIF_FIELDS = ('Make', 'Model', 'DateTime', 'DateTimeOriginal', 'Orientation', 'Software', 'LensModel')
+
+# Steps run in worker processes: module-level functions taking the file path and returning what goes into its manifest line
+
+def sniff_mime(path: Path) -> dict:
+    """Type from the file's content (python-magic / libmagic), or from its extension where that is missing"""
+    try: import magic
+    except ImportError: return {'mime': mimetypes.guess_type(path.name)[0], 'mime_source': 'extension'}
+    return {'mime': magic.from_file(str(path), mime=True)}
+
+def checksum(path: Path) -> dict: return {'sha256': file_sha256(path)}
+
+def image_metadata(path: Path) -> dict:
+    """Format, dimensions and the main EXIF tags of an image (pillow)"""
+    if path.suffix.lower() not in ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.tif', '.tiff', '.heic'): return {}
+    from PIL import Image, ExifTags
+    with Image.open(path) as image:
+        exif = image.getexif()
+        tags = {ExifTags.TAGS.get(k, k): v for k, v in exif.items()}
+        tags.update((ExifTags.TAGS.get(k, k), v) for k, v in exif.get_ifd(0x8769).items())  # Exif sub-IFD: DateTimeOriginal, LensModel...
+        return {'image': {'format': image.format, 'width': image.width, 'height': image.height,
+                          **{name: str(tags[name]) for name in EXIF_FIELDS if name in tags}}}
+
+def video_duration(path: Path) -> dict:
+    """Duration in seconds from ffprobe (when it is on PATH)"""
+    if path.suffix.lower() not in ('.mp4', '.mkv', '.mov', '.avi', '.wmv', '.webm', '.m4v'): return {}
+    ffprobe = shutil.which('ffprobe')
+    if not ffprobe: raise RuntimeError("ffprobe not found")
+    out = subprocess.run([ffprobe, '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=nw=1:nk=1', str(path)],
+                         capture_output=True, text=True, timeout=60, check=True).stdout.strip()
+    return {'duration': round(float(out), 3)} if out and out != 'N/A' else {}
+
+def extract_archive(path: Path) -> dict:
+    """Unpack zip / tar archives into a folder named after the archive; members pointing outside it are refused"""
+    name = path.name.lower()
+    suffix = next((s for s in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True) if name.endswith(s)), None)
+    if suffix is None: return {}
+    target = path.with_name(path.name[:-len(suffix)] or path.stem)
+    if target.exists(): return {'extracted': str(target), 'extract_skipped': 'exists'}
+    tmp = target.with_name(target.name + '.extracting')
+    shutil.rmtree(tmp, ignore_errors=True)
+    root = tmp.resolve()
+    if name.endswith('.zip'):
+        with zipfile.ZipFile(path) as z:
+            members = z.namelist()
+            if any(not (root / m).resolve().is_relative_to(root) for m in members): raise ValueError("archive member outside the target folder")
+            z.extractall(tmp)
+    else:
+        with tarfile.open(path) as t:
+            members = t.getnames()
+            t.extractall(tmp, filter='data')  # no absolute paths, links out of the folder or device files
+    os.replace(tmp, target)
+    return {'extracted': str(target), 'members': len(members)}
+
+STEPS: Dict[str, Callable[[Path], dict]] = {'mime': sniff_mime, 'sha256': checksum, 'exif': image_metadata, 'duration': video_duration, 'extract': extract_archive}
+# What a step cannot run without (mime falls back to the extension instead)
+REQUIRES = {'exif': ('pillow', lambda: find_spec('PIL') is not None), 'duration': ('ffprobe (ffmpeg)', lambda: shutil.which('ffprobe') is not None)}
+
+def register_step(name: str, fn: Callable[[Path], dict]):
+    """Add a step - fn must be importable by the worker processes (a module-level function)"""
+    STEPS[name] = fn
+
+def process_file(path: str, steps: List[str], fns: Optional[Dict[str, Callable]] = None) -> dict:
+    """Run the steps on one file (in a worker process); a failing step is recorded and the others still run"""
+    path, out, errors = Path(path), {}, {}
+    t = time.monotonic()
+    for name in steps:
+        try: out.update(((fns or {}).get(name) or STEPS[name])(path))
+        except Exception as e: errors[name] = f"{type(e).__name__}: {e}"
+    out['seconds'] = round(time.monotonic() - t, 3)
+    if errors: out['errors'] = errors
+    return out
+
+class PostProcessor:
+    """Runs post-download steps on finished files in a process pool, off the network loop.
+
+    submit() puts a file on a bounded queue and returns at once while there is room - a download
+    only waits when processing is QUEUE_SIZE files behind. Up to `workers` files are processed at
+    once, each in its own process, so hashing and metadata use every core without stalling the
+    event loop. Each result is appended as one JSON line to manifest.jsonl in the download folder.
+    """
+    QUEUE_SIZE = 256
+
+    def __init__(self, folder, steps: List[str], workers=0):
+        unknown = [s for s in steps if s not in STEPS]
+        if unknown: raise ValueError(f"unknown post-processing step: {', '.join(unknown)} (known: {', '.join(STEPS)})")
+        missing = [f"{s} needs {REQUIRES[s][0]}" for s in steps if s in REQUIRES and not REQUIRES[s][1]()]
+        if missing: raise ValueError(f"post-processing: {', '.join(missing)}")
+        self.folder, self.steps = Path(folder), list(steps)
+        self.workers = workers or os.cpu_count() or 2
+        self.fns = {s: STEPS[s] for s in self.steps if STEPS[s].__module__ != __name__}  # registered steps travel by reference
+        self.queue = self.executor = self.manifest = None
+        self.tasks = []
+        self.processed = self.failed = 0
+        self.metrics = get_metrics()
+        self.gauge = None
+
+    async def start(self):
+        self.queue = asyncio.Queue(self.QUEUE_SIZE)
+        # spawn, not fork: the process already runs the client loop thread (and Qt in the GUI)
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        self.manifest = open(self.folder / MANIFEST_NAME, 'a', encoding='utf-8', buffering=1)
+        self.tasks = [asyncio.ensure_future(self.worker()) for _ in range(self.workers)]
+        self.gauge = self.metrics.gauge('postprocess_queue_depth', self.queue.qsize)
+
+    async def submit(self, path: Path, info: dict):
+        """Queue a finished file; info (message id, date...) goes into its manifest line as is"""
+        await self.queue.put((path, info))
+
+    async def worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            path, info = await self.queue.get()
+            try:
+                try: result = await loop.run_in_executor(self.executor, process_file, str(path), self.steps, self.fns or None)
+                except Exception as e: result = {'errors': {'pool': f"{type(e).__name__}: {e}"}}  # e.g. the worker process died
+                self.processed += 1; self.failed += 'errors' in result
+                self.metrics.observe('postprocess_seconds', result.get('seconds', 0))
+                self.manifest.write(json.dumps({'file': path.name, **info, **result}, ensure_ascii=False, default=str) + '\n')
+            finally: self.queue.task_done()
+
+    async def close(self):
+        """Finish what is queued, then stop the workers and the pool"""
+        try: await self.queue.join()
+        finally:
+            for task in self.tasks: task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+            self.metrics.unregister(self.gauge)
+            await asyncio.to_thread(self.executor.shutdown, True, cancel_futures=True)
+            self.manifest.close()
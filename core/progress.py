@@ -0,0 +1,75 @@
+"""
+Download progress aggregation for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import time
+from typing import Dict, List, Optional
+
+def format_eta(seconds: Optional[float]) -> str:
+    if seconds is None: return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class ProgressAggregator:
+    """Byte-accurate progress for many concurrent files.
+
+    Progress callbacks report cumulative bytes per file; update() turns them into deltas.
+    Nothing here talks to the UI - a timer calls snapshot() at a fixed rate, which is
+    where the EWMA speed and the byte-based ETA are computed.
+    """
+
+    def __init__(self, total_files: int, total_bytes: int, alpha=0.3):
+        self.total_files, self.total_bytes, self.alpha = total_files, total_bytes, alpha
+        self.files_done = 0
+        self.bytes_done = 0      # bytes that are on disk, resumed ones included
+        self.transferred = 0     # bytes actually received in this run - drives the speed
+        self.active: Dict[int, List] = {}  # key -> [name, cumulative bytes reported]
+        self.current_name = ""
+        self.speed = None
+        self.last_time = self.last_transferred = None
+
+    def start(self, key: int, name: str, already: int = 0):
+        """A file (re)starts; `already` bytes are on disk from an earlier attempt"""
+        prev = self.active.get(key, [name, 0])[1]
+        self.bytes_done += already - prev
+        self.active[key] = [name, already]
+        self.current_name = name
+
+    def update(self, key: int, received: int) -> int:
+        """Cumulative callback value for one file -> new bytes since its last call"""
+        entry = self.active.get(key)
+        if entry is None: return 0
+        delta = received - entry[1]
+        if delta <= 0: return 0  # a resumed stream re-sends a few bytes before it catches up
+        entry[1] = received
+        self.bytes_done += delta; self.transferred += delta
+        self.current_name = entry[0]
+        return delta
+
+    def finish(self, key: int, ok: bool, size: int = 0, requeued=False):
+        """A file ended. Failed files leave the totals; requeued ones will start() again later."""
+        entry = self.active.pop(key, None)
+        received = entry[1] if entry else 0
+        if ok:
+            self.bytes_done += size - received  # exact size on disk, whatever the callbacks said
+            self.files_done += 1
+            return
+        self.bytes_done -= received
+        if not requeued: self.total_bytes -= size; self.files_done += 1
+
+    def skip(self, size: int):
+        """Already complete on disk"""
+        self.bytes_done += size; self.files_done += 1
+
+    def snapshot(self, now: float = None) -> dict:
+        now = time.monotonic() if now is None else now
+        if self.last_time is not None and now > self.last_time:
+            inst = (self.transferred - self.last_transferred) / (now - self.last_time)
+            self.speed = inst if self.speed is None else self.alpha * inst + (1 - self.alpha) * self.speed
+        self.last_time, self.last_transferred = now, self.transferred
+        remaining = max(0, self.total_bytes - self.bytes_done)
+        eta = remaining / self.speed if self.speed else None
+        percent = int(self.bytes_done * 100 / self.total_bytes) if self.total_bytes > 0 else int(self.files_done * 100 / max(1, self.total_files))
+        return {'percent': max(0, min(100, percent)), 'name': self.current_name, 'files_done': self.files_done, 'total_files': self.total_files,
+                'bytes_done': self.bytes_done, 'total_bytes': self.total_bytes, 'speed': self.speed or 0.0, 'eta': eta}
@@ -0,0 +1,71 @@
+"""
+Retry and backoff policies for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import asyncio
+import random
+from typing import Awaitable, Callable, Dict, Optional
+
+from telethon.errors import (
+    FloodError, FileReferenceExpiredError, FileReferenceInvalidError, ServerError, TimedOutError, RpcCallFailError
+)
+
+FLOOD, REFERENCE, TRANSIENT, FATAL = 'flood', 'reference', 'transient', 'fatal'
+
+def classify(exc: BaseException) -> str:
+    """Which retry policy an error falls under"""
+    if isinstance(exc, FloodError) and getattr(exc, 'seconds', None) is not None: return FLOOD
+    if isinstance(exc, (FileReferenceExpiredError, FileReferenceInvalidError)): return REFERENCE
+    if isinstance(exc, (asyncio.TimeoutError, ConnectionError, ServerError, TimedOutError, RpcCallFailError)): return TRANSIENT
+    return FATAL
+
+class RetryEngine:
+    """One place that decides whether and how long to wait before trying again.
+
+    - FloodWait: sleep exactly what the server asked for (up to `max_flood_wait`) - or, with flood_delay, only until another account is free
+    - expired/invalid file reference: call the refresh hook and retry at once
+    - timeouts, dropped connections, Telegram 5xx: jittered exponential backoff
+    - anything else is raised immediately
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0, max_flood_wait=3600, on_flood: Optional[Callable[[int], None]] = None,
+                 on_retry: Optional[Callable[[str, float], None]] = None, flood_delay: Optional[Callable[[int], float]] = None):
+        self.max_attempts, self.base_delay, self.max_delay, self.max_flood_wait = max_attempts, base_delay, max_delay, max_flood_wait
+        self.on_flood = on_flood
+        self.on_retry = on_retry  # (policy, seconds waited) after each recovered failure - metrics
+        self.flood_delay = flood_delay  # FloodWait seconds -> seconds to actually wait (another account may go on at once)
+        self.stats: Dict[str, int] = {'retries': 0, 'flood_waits': 0, 'flood_seconds': 0, 'refreshes': 0, 'requeued': 0, 'gave_up': 0}
+
+    def backoff(self, attempt: int) -> float:
+        return min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    async def wait(self, exc: BaseException, attempt: int, refresh: Optional[Callable[[], Awaitable[bool]]] = None) -> str:
+        """Handle the failure of try number `attempt` (0-based): sleep or refresh as its policy says,
+        or re-raise it when it is not recoverable or the attempts are used up. Returns the policy used."""
+        kind = classify(exc)
+        if kind == FATAL or attempt + 1 >= self.max_attempts: raise exc
+        if kind == FLOOD:
+            delay = self.flood_delay(exc.seconds) if self.flood_delay else exc.seconds
+            if delay > self.max_flood_wait: raise exc
+            self.stats['flood_waits'] += 1; self.stats['flood_seconds'] += exc.seconds
+            if self.on_flood: self.on_flood(exc.seconds)
+            await asyncio.sleep(delay + random.uniform(0, 1))
+        elif kind == REFERENCE:
+            if refresh is None or not await refresh(): raise exc  # media gone -> give up
+            self.stats['refreshes'] += 1; delay = 0
+        else: delay = self.backoff(attempt); await asyncio.sleep(delay)
+        self.stats['retries'] += 1
+        if self.on_retry: self.on_retry(kind, exc.seconds if kind == FLOOD else delay)
+        return kind
+
+    async def call(self, fn: Callable[[], Awaitable], refresh: Optional[Callable[[], Awaitable[bool]]] = None):
+        """Run fn() until it succeeds or its error is not worth retrying"""
+        attempt = 0
+        while True:
+            try: return await fn()
+            except Exception as e:
+                if await self.wait(e, attempt, refresh) == REFERENCE: refresh = None  # a second expiry right after a refresh is not going to heal
+            attempt += 1
+
+def is_retryable(exc: BaseException) -> bool: return classify(exc) != FATAL
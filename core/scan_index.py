@@ -0,0 +1,101 @@
+"""
+Persistent per-chat scan index for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+from typing import Iterable, List
+
+from .media_store import MediaStore
+
+DEFAULT_INDEX_PATH = Path.home() / '.telegram_downloader' / 'index.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    chat_id INTEGER PRIMARY KEY,
+    max_id INTEGER NOT NULL DEFAULT 0,
+    low_id INTEGER NOT NULL DEFAULT 0,
+    scanned_at REAL
+);
+CREATE TABLE IF NOT EXISTS media (
+    chat_id INTEGER NOT NULL,
+    msg_id INTEGER NOT NULL,
+    date INTEGER NOT NULL,
+    type INTEGER NOT NULL,
+    name TEXT,
+    size INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL,
+    access_hash INTEGER NOT NULL,
+    dc_id INTEGER NOT NULL,
+    file_ref BLOB,
+    thumb TEXT,
+    preview TEXT,
+    PRIMARY KEY (chat_id, msg_id)
+) WITHOUT ROWID;
+"""
+
+class ScanIndex:
+    """SQLite (WAL) index of every media message seen per chat, plus the highest message id scanned.
+
+    One instance per thread - sqlite3 connections must not be shared between threads.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        if 'preview' not in {r[1] for r in self.db.execute("PRAGMA table_info(media)")}:  # index written before list thumbnails
+            self.db.execute("ALTER TABLE media ADD COLUMN preview TEXT")
+        if 'low_id' not in {r[1] for r in self.db.execute("PRAGMA table_info(chats)")}:  # index written before partial scans resumed
+            self.db.execute("ALTER TABLE chats ADD COLUMN low_id INTEGER NOT NULL DEFAULT 0")
+
+    def close(self): self.db.close()
+
+    def watermark(self, chat_id: int) -> int:
+        row = self.db.execute("SELECT max_id FROM chats WHERE chat_id = ?", (chat_id,)).fetchone()
+        return row[0] if row else 0
+
+    def load(self, chat_id: int, peer=None) -> MediaStore:
+        """All indexed media of a chat, newest first (the order a fresh scan yields)"""
+        store = MediaStore(peer)
+        rows = self.db.execute("SELECT msg_id, date, type, name, size, doc_id, access_hash, dc_id, file_ref, thumb, preview FROM media WHERE chat_id = ? ORDER BY msg_id DESC", (chat_id,))
+        for msg_id, date, type_code, name, size, doc_id, access_hash, dc_id, file_ref, thumb, preview in rows:
+            store.append(msg_id, date, type_code, store.intern_name(name) if name else 0, size, doc_id, access_hash, dc_id, file_ref,
+                         store.intern_thumb(thumb) if thumb else 0, store.intern_thumb(preview) if preview else 0)
+        return store
+
+    def add(self, chat_id: int, store: MediaStore):
+        """Upsert a batch of records - the watermark moves only when a scan finishes its range (set_watermark)"""
+        if not len(store): return
+        rows = ((chat_id, store.msg_ids[i], store.dates[i], store.types[i], store.names[store.name_ids[i]] or None, store.sizes[i], store.doc_ids[i],
+                 store.access_hashes[i], store.dc_ids[i], store.file_refs[i], store.thumb_types[store.thumb_ids[i]] or None,
+                 store.thumb_types[store.preview_ids[i]] or None) for i in range(len(store)))
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO media (chat_id, msg_id, date, type, name, size, doc_id, access_hash, dc_id, file_ref, thumb, preview) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def low_water(self, chat_id: int) -> int:
+        """Oldest id of the indexed range - messages below it were not scanned yet (0 = none missing)"""
+        row = self.db.execute("SELECT low_id FROM chats WHERE chat_id = ?", (chat_id,)).fetchone()
+        return row[0] if row else 0
+
+    def set_watermark(self, chat_id: int, max_id: int, low_id=0):
+        """Every media message with an id in [low_id, max_id] is indexed"""
+        with self.db:
+            self.db.execute("INSERT INTO chats (chat_id, max_id, low_id, scanned_at) VALUES (?, ?, ?, ?) ON CONFLICT(chat_id) DO UPDATE SET "
+                            "max_id = MAX(max_id, excluded.max_id), low_id = excluded.low_id, scanned_at = excluded.scanned_at", (chat_id, max_id, low_id, time.time()))
+
+    def msg_ids(self, chat_id: int) -> List[int]:
+        return [r[0] for r in self.db.execute("SELECT msg_id FROM media WHERE chat_id = ? ORDER BY msg_id DESC", (chat_id,))]
+
+    def remove(self, chat_id: int, msg_ids: Iterable[int]):
+        with self.db: self.db.executemany("DELETE FROM media WHERE chat_id = ? AND msg_id = ?", ((chat_id, m) for m in msg_ids))
+
+    def clear(self, chat_id: int):
+        with self.db:
+            self.db.execute("DELETE FROM media WHERE chat_id = ?", (chat_id,))
+            self.db.execute("DELETE FROM chats WHERE chat_id = ?", (chat_id,))
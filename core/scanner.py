@@ -0,0 +1,233 @@
+"""
+Streaming chat scanner for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import asyncio
+import math
+import time
+from typing import Callable, List, Optional
+
+from telethon import utils
+from telethon.tl.types import (
+    InputMessagesFilterDocument, InputMessagesFilterGif, InputMessagesFilterMusic, InputMessagesFilterPhotos,
+    InputMessagesFilterRoundVideo, InputMessagesFilterVideo, InputMessagesFilterVoice
+)
+
+from .media_store import MediaFilter, MediaStore, TYPES
+from .metrics import get_metrics
+from .retry import RetryEngine
+from .scan_index import ScanIndex, DEFAULT_INDEX_PATH
+
+PAGE_SIZE = 100  # messages per history or search request
+
+# Search filters that return each media type. Documents are typed by file name, so most types need the generic
+# document filter; audio, voice notes, round videos and GIFs have filters of their own. Stickers have none.
+SEARCH_FILTERS = {
+    'photo': (InputMessagesFilterPhotos,),
+    'image': (InputMessagesFilterDocument,),
+    'video': (InputMessagesFilterVideo, InputMessagesFilterDocument, InputMessagesFilterGif),
+    'document': (InputMessagesFilterDocument,),
+    'archive': (InputMessagesFilterDocument,),
+    'file': (InputMessagesFilterDocument, InputMessagesFilterMusic, InputMessagesFilterVoice, InputMessagesFilterRoundVideo, InputMessagesFilterGif),
+}
+
+def search_filters(types=None) -> list:
+    """The search filters covering the given type names (None = all), each once"""
+    out = []
+    for t in types or TYPES: out += [f for f in SEARCH_FILTERS[t] if f not in out]
+    return out
+
+class Scanner:
+    """Classifies a chat's media page by page and reports results in batches.
+
+    No UI here: front-ends pass callbacks - batch_callback(MediaStore), progress_callback(seen, total, found),
+    status_callback(i18n key), scanned_callback(found) once the messages are read, removed_callback(msg_ids)
+    after verification. run() returns the number of files the chat holds.
+
+    media_filter (core.media_store.MediaFilter) narrows the scan: when the chat is mostly text, the media is read
+    through Telegram's search filters (one stream per filter the wanted types need, merged by message id) instead
+    of paging the whole history; dates bound the streams on the server and sizes are checked before a row is stored.
+    Whichever costs fewer requests is used. Only unfiltered scans move the index watermark.
+    """
+    BATCH_SIZE = 200        # flush after this many items...
+    BATCH_INTERVAL = 0.25   # ...or after this many seconds, whichever comes first
+    SEARCH_SAVING = 0.25    # share of the history requests search filters must save to be used
+
+    def __init__(self, group_link, max_messages, use_index=True, verify_deletions=False, index_path=None,
+                 batch_callback: Optional[Callable] = None, progress_callback: Optional[Callable] = None, status_callback: Optional[Callable] = None,
+                 scanned_callback: Optional[Callable] = None, removed_callback: Optional[Callable] = None, media_filter: Optional[MediaFilter] = None):
+        self.group_link, self.max_messages = group_link, max_messages
+        self.use_index, self.verify_deletions, self.index_path = use_index, verify_deletions, index_path
+        self.batch_callback, self.progress_callback, self.status_callback = batch_callback, progress_callback, status_callback
+        self.scanned_callback, self.removed_callback = scanned_callback, removed_callback
+        self.media_filter = media_filter or None  # an empty filter keeps everything
+        self.search = False  # reading through search filters rather than the history
+        self.index = self.chat_id = None
+        self.watermark = 0  # newest message id indexed before this run
+        self.marks = None  # (watermark, low-water id) this run completed, written after the last batch
+        self.counts = {}  # search filter -> chat-wide matches
+        self.chat_total = 0
+        self.last_flush = 0.0
+        self.metrics = get_metrics()
+        self.retry = RetryEngine(on_retry=self.metrics.retry_hook('scan'))
+        self.is_running = True
+        self.found = self.seen = self.total = 0
+        self.counted = self.media = 0  # messages / media already reported to the metrics
+        self.peer = None
+        self.batch = MediaStore()
+
+    def stop(self): self.is_running = False
+
+    def status(self, key: str):
+        if self.status_callback: self.status_callback(key)
+
+    async def run(self, client) -> int:
+        self.index = ScanIndex(self.index_path or DEFAULT_INDEX_PATH)
+        started = time.monotonic()
+        try:
+            try: await self.stream_messages(client)
+            except asyncio.CancelledError: pass  # stopped mid-page - keep what we have
+            self.flush()
+            if self.marks: self.index.set_watermark(self.chat_id, *self.marks)
+            if self.scanned_callback: self.scanned_callback(self.found)
+            if self.verify_deletions and self.is_running: await self.verify_index(client)
+        finally: self.index.close()
+        seconds = time.monotonic() - started
+        self.metrics.event('scan', chat=self.group_link, messages=self.seen, media=self.media, found=self.found, seconds=round(seconds, 3),
+                           messages_per_s=round(self.seen / seconds, 1) if seconds else None, media_ratio=round(self.media / self.seen, 3) if self.seen else None, search=self.search, **self.retry.stats)
+        return self.found
+
+    async def stream_messages(self, client):
+        self.status("scan_connecting")
+        entity = await self.retry.call(lambda: client.get_entity(self.group_link))
+        self.peer = self.batch.peer = utils.get_input_peer(entity)
+        self.chat_id = utils.get_peer_id(entity)
+        mf = self.media_filter
+        watermark = low = self.watermark = 0
+        known = set()  # ids already reported - merges the search streams, and skips rows indexed outside [low, watermark] by filtered or cut-short scans
+        if self.use_index:
+            cached = self.index.load(self.chat_id, self.peer)
+            watermark = self.watermark = self.index.watermark(self.chat_id)
+            low = self.index.low_water(self.chat_id)
+            known.update(m for m in cached.msg_ids if m > watermark or m < low)
+            if mf: cached = cached.subset(mf.rows(cached))
+            if len(cached):
+                self.found += len(cached)  # the front-end fills from disk right away
+                if self.batch_callback: self.batch_callback(cached)
+        else: self.index.clear(self.chat_id)  # full rescan rebuilds the chat's index
+        head = await self.retry.call(lambda: client.get_messages(entity, limit=1))  # newest message + total count in one request
+        newest = head[0].id if head else 0
+        if not newest: return
+        self.chat_total = head.total or newest
+        max_date = mf.max_date if mf else None
+
+        # The index holds every media message with an id in [low, watermark]. A run reads the messages newer than that,
+        # then the older ones (all of them on a first scan, up to max_messages), each range from the history or through
+        # search filters, whichever costs fewer requests. Ranges are (lower, upper) ids, both exclusive.
+        ranges, budget = [], self.max_messages
+        if watermark:
+            filters = await self.plan(client, entity, newest - watermark)
+            ranges.append((watermark, newest + 1, watermark, filters)); budget -= min(newest - watermark, budget)
+        upper = low if watermark else newest + 1
+        if upper > 1 and budget > 0:
+            floor = max(0, upper - 1 - budget)  # search streams stop at this id; the history stops after `budget` messages
+            ranges.append((0, upper, floor, await self.plan(client, entity, upper - 1 - floor)))
+        self.search = any(filters is not None for *_, filters in ranges)
+        self.total = sum(self.estimate(lower, upper, floor, filters) for lower, upper, floor, filters in ranges)
+
+        self.status("scan_scanning")
+        self.last_flush = time.monotonic()
+        marks = [watermark, low]
+        for lower, upper, floor, filters in ranges:
+            offset = 0 if upper > newest else upper  # ranges reaching the top may start at max_date
+            if filters is not None:
+                for f in filters:
+                    if not self.is_running: break
+                    await self.read(lambda last_id, f=f: client.iter_messages(entity, offset_id=last_id or offset, offset_date=None if last_id or offset else max_date,
+                                                                              min_id=floor, filter=f, wait_time=0), known, merge=True)
+                done = self.is_running  # search streams are not ordered across filters: only a finished range counts
+                if done and lower: marks[0] = newest
+                elif done: marks[0], marks[1] = marks[0] or newest, floor + 1 if floor else 0
+            elif lower and not (max_date or mf and mf.min_date):
+                # Oldest-first from the watermark, so the index stays gap-free even if the limit cuts the run short
+                last = await self.read(lambda last_id: client.iter_messages(entity, limit=self.max_messages - self.seen, min_id=last_id or lower, reverse=True, wait_time=0), known)
+                done = self.is_running and self.seen < self.max_messages
+                if done or last: marks[0] = newest if done else last
+            else:
+                if self.seen >= self.max_messages: break
+                # wait_time=0: telethon otherwise sleeps 1s between pages for limits over 3000
+                last = await self.read(lambda last_id: client.iter_messages(entity, limit=self.max_messages - self.seen, offset_id=last_id or offset,
+                                                                            offset_date=None if last_id or offset else max_date, min_id=lower, wait_time=0), known)
+                done = self.is_running and self.seen < self.max_messages
+                if not lower and (done or last): marks[0], marks[1] = marks[0] or newest, 0 if done else last
+            if not done: break  # the older range only continues a complete newer one
+        if not mf and marks != [watermark, low]: self.marks = tuple(marks)  # recorded by run() once the last batch is in the index
+
+    async def read(self, open_stream: Callable, known: set, merge=False) -> Optional[int]:
+        """Drain one message stream, reopening it after the last message read on errors; returns that message's id"""
+        mf = self.media_filter
+        min_date = mf.min_date if mf else None
+        last_id, attempt, seen_at_error = None, 0, -1
+        while True:
+            try:
+                async for msg in open_stream(last_id):
+                    if not self.is_running or min_date and msg.date < min_date: break
+                    self.seen += 1; last_id = msg.id
+                    # the Message itself is dropped right here
+                    if msg.media and msg.id not in known and self.batch.add_message(msg, mf) and merge: known.add(msg.id)
+                    now = time.monotonic()
+                    if len(self.batch) >= self.BATCH_SIZE or (len(self.batch) and now - self.last_flush >= self.BATCH_INTERVAL) or self.seen % 100 == 0:
+                        self.flush(); self.last_flush = now
+                return last_id
+            except Exception as e:
+                # FloodWait / dropped connection mid-scan: wait as the retry policy says and continue after the last message
+                if self.seen > seen_at_error: attempt = 0
+                seen_at_error = self.seen
+                await self.retry.wait(e, attempt); attempt += 1
+                if not merge and self.seen >= self.max_messages: return last_id
+
+    async def plan(self, client, entity, span: int) -> Optional[List[type]]:
+        """Search filters to read a span of ids through (only those with matches), or None when paging its history
+        is about as cheap. Costs are requests: one count per filter (once per run), then a page per 100 of its matches
+        in the span (the chat-wide count scaled to the span); search pages are slower on the server, so searching
+        has to save SEARCH_SAVING of the history requests."""
+        filters = search_filters(self.media_filter.types if self.media_filter else None)
+        history = math.ceil(span / PAGE_SIZE)
+        if history <= 2 * len(filters): return None  # a short incremental run: the counts alone would eat most of the saving
+        for f in filters:
+            if f not in self.counts: self.counts[f] = (await self.retry.call(lambda: client.get_messages(entity, limit=0, filter=f))).total or 0
+        counts = self.span_counts(filters, span)
+        if len(filters) + sum(math.ceil(c / PAGE_SIZE) for c in counts) > history * (1 - self.SEARCH_SAVING): return None
+        return [f for f, c in zip(filters, counts) if c]
+
+    def span_counts(self, filters, span: int) -> List[int]:
+        return [min(self.counts[f], math.ceil(self.counts[f] * span / self.chat_total)) if self.chat_total > span else self.counts[f] for f in filters]
+
+    def estimate(self, lower, upper, floor, filters) -> int:
+        """Messages a range is expected to yield, for the progress total"""
+        if filters is not None: return sum(self.span_counts(filters, upper - 1 - floor))
+        return min(upper - 1 - max(lower, floor), self.max_messages)
+
+    async def verify_index(self, client):
+        """Drop indexed messages that were deleted from the chat (100 ids per request)"""
+        self.status("scan_verifying")
+        ids, gone = self.index.msg_ids(self.chat_id), []
+        for k in range(0, len(ids), 100):
+            if not self.is_running: break
+            chunk = ids[k:k + 100]
+            messages = await self.retry.call(lambda: client.get_messages(self.peer, ids=chunk))
+            gone += [m for m, msg in zip(chunk, messages) if msg is None or not msg.media]
+        self.index.remove(self.chat_id, gone)
+        self.found -= len(gone)
+        if gone and self.removed_callback: self.removed_callback(gone)
+
+    def flush(self):
+        self.metrics.inc('scan_messages_total', self.seen - self.counted); self.counted = self.seen
+        if len(self.batch):
+            self.found += len(self.batch); self.media += len(self.batch)
+            self.metrics.inc('scan_media_total', len(self.batch))
+            self.index.add(self.chat_id, self.batch)
+            if self.batch_callback: self.batch_callback(self.batch)
+            self.batch = MediaStore(self.peer)
+        if self.progress_callback: self.progress_callback(self.seen, self.total, self.found)
@@ -0,0 +1,61 @@
+"""
+Download scheduling for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import heapq
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+POLICIES = ('list', 'smallest', 'largest', 'newest', 'oldest', 'priority')
+
+def policy_key(policy: str, store, priorities: Dict[int, int]):
+    """Sort key for a (position, row) pair - lower goes first"""
+    if policy == 'smallest': return lambda pos, i: store.sizes[i]
+    if policy == 'largest': return lambda pos, i: -store.sizes[i]
+    if policy == 'newest': return lambda pos, i: -store.dates[i]
+    if policy == 'oldest': return lambda pos, i: store.dates[i]
+    if policy == 'priority': return lambda pos, i: -priorities.get(i, 0)
+    return lambda pos, i: 0  # 'list' - selection order, via the position tie-breaker
+
+class DownloadScheduler:
+    """Queue of store rows to download, ordered by a pluggable policy.
+
+    Files at or above `large_threshold` wait in their own lane: at most `max_large` of them
+    run at once while every other slot drains small files, so connections never sit idle
+    behind a single giant transfer. Workers pull with pop() when a slot frees up.
+    """
+
+    def __init__(self, store, indices: List[int], policy='list', priorities: Dict[int, int] = None, large_threshold=64 * 2**20, max_large=1):
+        self.store, self.large_threshold, self.max_large = store, large_threshold, max_large
+        self.key = policy_key(policy, store, priorities or {})
+        self.small: List[Tuple] = []
+        self.large: List[Tuple] = []
+        self.retry = deque()  # failed jobs go to the very back
+        self.large_active = 0
+        for pos, i in enumerate(indices): self.push(pos, i)
+
+    def __len__(self): return len(self.small) + len(self.large) + len(self.retry)
+
+    def is_large(self, i: int) -> bool: return self.store.sizes[i] >= self.large_threshold
+
+    def push(self, pos: int, i: int):
+        heapq.heappush(self.large if self.is_large(i) else self.small, (self.key(pos, i), pos, i))
+
+    def requeue(self, pos: int, i: int): self.retry.append((pos, i))
+
+    def pop(self) -> Optional[Tuple[int, int]]:
+        """Next (position, row) to start, or None when the queue is empty"""
+        if self.large and (self.large_active < self.max_large or not self.small): _, pos, i = heapq.heappop(self.large)
+        elif self.small: _, pos, i = heapq.heappop(self.small)
+        elif self.retry: pos, i = self.retry.popleft()
+        else: return None
+        if self.is_large(i): self.large_active += 1
+        return pos, i
+
+    def done(self, i: int):
+        if self.is_large(i): self.large_active -= 1
+
+    def upcoming(self, n: int) -> List[int]:
+        """Rows most likely to start next (used to batch file reference refreshes) - at most n"""
+        return ([e[2] for e in heapq.nsmallest(n, self.small)] + [e[2] for e in heapq.nsmallest(n, self.large)])[:n]
@@ -0,0 +1,82 @@
+"""
+Search index over scan results for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+from .media_store import MediaStore
+
+class SearchIndex:
+    """Casefolded names, each row's type code, per-type row lists and trigram posting lists of a MediaStore,
+    kept in step as rows are appended.
+
+    query() answers a type filter from the row lists alone. A name search starts from the smallest of:
+    the rows holding the rarest trigram of the text, the rows of the selected types, or the previous answer
+    when the new text extends the previous one - then checks only those rows for the whole text and type.
+    Texts shorter than a trigram scan the type's rows (or the previous answer).
+    Results are sorted row arrays, so they can back a proxy model directly.
+    """
+    GRAM = 3
+
+    def __init__(self, store: Optional[MediaStore] = None):
+        self.names: List[str] = []
+        self.type_of = bytearray()  # row -> type code
+        self.by_type: Dict[int, array] = {}
+        self.grams: Dict[str, array] = {}  # trigram -> sorted rows whose name contains it
+        self.last = None  # (types, text, rows) of the previous query
+        if store is not None: self.extend(store, 0)
+
+    def __len__(self): return len(self.names)
+
+    def extend(self, store: MediaStore, start: int):
+        """Index rows start.. of the store (the rows just appended)"""
+        grams, n = self.grams, self.GRAM
+        for i in range(start, len(store)):
+            name, code = store.name(i).casefold(), store.types[i]
+            self.names.append(name); self.type_of.append(code)
+            rows = self.by_type.get(code)
+            if rows is None: rows = self.by_type[code] = array('I')
+            rows.append(i)
+            for g in {name[k:k + n] for k in range(len(name) - n + 1)}:
+                rows = grams.get(g)
+                if rows is None: rows = grams[g] = array('I')
+                rows.append(i)
+        self.last = None
+
+    def type_rows(self, types: Optional[Iterable[int]], start=0) -> array:
+        if types is None: return array('I', range(start, len(self.names)))
+        lists = [self.by_type[t] for t in types if t in self.by_type]
+        merged = heapq.merge(*lists) if len(lists) > 1 else (lists[0] if lists else ())
+        return array('I', (i for i in merged if i >= start)) if start else array('I', merged)
+
+    def gram_rows(self, text: str) -> Optional[array]:
+        """Rows of the text's rarest trigram (a superset of the matches), or None if the text is too short"""
+        n = self.GRAM
+        if len(text) < n: return None
+        best = None
+        for k in range(len(text) - n + 1):
+            rows = self.grams.get(text[k:k + n])
+            if rows is None: return array('I')
+            if best is None or len(rows) < len(best): best = rows
+        return best
+
+    def query(self, types: Optional[Iterable[int]] = None, text: str = '', start=0) -> array:
+        """Sorted rows (from start on) of the given type codes (None = all) whose name contains text"""
+        types = None if types is None else frozenset(types)
+        text = text.casefold()
+        rows, typed = None, True  # typed: rows are already of the selected types
+        if start == 0 and self.last and self.last[0] == types and text.startswith(self.last[1]) and self.last[1]:
+            rows = self.last[2]  # "fil" -> "file": only rows that matched "fil" can match
+        posting = self.gram_rows(text)
+        type_count = len(self.names) if types is None else sum(len(self.by_type.get(t, ())) for t in types)
+        if posting is not None and len(posting) < min(type_count, len(rows) if rows is not None else type_count + 1):
+            rows, typed = (posting[bisect_left(posting, start):] if start else posting), types is None
+        if rows is None: rows = self.type_rows(types, start)
+        if not typed: type_of = self.type_of; rows = array('I', [i for i in rows if type_of[i] in types])
+        if text: names = self.names; rows = array('I', [i for i in rows if text in names[i]])
+        if start == 0: self.last = (types, text, rows)
+        return rows
@@ -0,0 +1,122 @@
+"""
+Resumable download strategies (single stream / multi-connection segmented) for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import asyncio
+import copy
+import time
+from typing import Dict, List
+
+from telethon.network import MTProtoSender
+from telethon.tl import functions
+from telethon.tl.alltlobjects import LAYER
+
+from .partfile import PartFile
+from .writer import PartWriter
+
+PART_SIZE = 1024 * 1024  # largest upload.getFile limit; offsets stay 1 MB aligned as the API requires
+STREAM_REQUEST_SIZE = 512 * 1024
+
+class SenderPool:
+    """Extra MTProto connections per DC, opened on demand and shared by every segmented download of a run"""
+
+    def __init__(self, client):
+        self.client = client
+        self.senders: Dict[int, List[MTProtoSender]] = {}
+        self.auth_keys = {}
+        self.lock = asyncio.Lock()
+
+    async def get(self, dc_id: int, count: int) -> List[MTProtoSender]:
+        async with self.lock:
+            pool = self.senders.setdefault(dc_id, [])
+            if len(pool) < count:
+                if not pool: pool.append(await self.connect(dc_id))  # first one exports the authorization
+                pool.extend(await asyncio.gather(*(self.connect(dc_id) for _ in range(count - len(pool)))))
+            return pool[:count]
+
+    async def connect(self, dc_id: int) -> MTProtoSender:
+        client = self.client
+        if dc_id == client.session.dc_id: self.auth_keys[dc_id] = client.session.auth_key
+        dc = await client._get_dc(dc_id)
+        sender = MTProtoSender(self.auth_keys.get(dc_id), loggers=client._log)
+        await sender.connect(client._connection(dc.ip_address, dc.port, dc.id, loggers=client._log, proxy=client._proxy))
+        # Each connection is a new session: its first request carries the layer and initConnection (a copy - the client's own stays as it is)
+        init = copy.copy(client._init_request)
+        if dc_id in self.auth_keys: init.query = functions.help.GetConfigRequest(); await sender.send(functions.InvokeWithLayerRequest(LAYER, init))
+        else:
+            auth = await client(functions.auth.ExportAuthorizationRequest(dc_id))
+            init.query = functions.auth.ImportAuthorizationRequest(id=auth.id, bytes=auth.bytes)
+            await sender.send(functions.InvokeWithLayerRequest(LAYER, init))
+            self.auth_keys[dc_id] = sender.auth_key
+        return sender
+
+    async def close(self):
+        for pool in self.senders.values():
+            for sender in pool: await sender.disconnect()
+        self.senders.clear()
+
+class StreamDownload:
+    """Single-connection download into a PartFile, continuing from the last confirmed offset"""
+
+    def __init__(self, client, location, part: PartFile, dc_id: int, progress_callback=None, latency_callback=None, throttle=None, size_estimated=False):
+        self.client, self.location, self.part, self.dc_id, self.progress_callback = client, location, part, dc_id, progress_callback
+        self.size_estimated = size_estimated  # photos: the size is a guess and the stream end is authoritative
+        self.latency_callback = latency_callback  # called with the seconds each request took
+        self.throttle = throttle  # awaited with each chunk's size (shared bandwidth budget)
+
+    async def run(self):
+        part = self.part
+        # Restart at a request boundary - the API wants aligned offsets, re-writing a few bytes is harmless
+        offset = part.contiguous() // STREAM_REQUEST_SIZE * STREAM_REQUEST_SIZE
+        part.ranges = [(0, offset)] if offset else []
+        writer = PartWriter(part)
+        await writer.open()
+        try:
+            t = time.monotonic()
+            async for chunk in self.client.iter_download(self.location, offset=offset, request_size=STREAM_REQUEST_SIZE, file_size=part.size, dc_id=self.dc_id):
+                if self.latency_callback: now = time.monotonic(); self.latency_callback(now - t); t = now
+                await writer.write(offset, chunk); offset += len(chunk)
+                if self.progress_callback: self.progress_callback(offset, part.size)
+                if self.throttle: await self.throttle(len(chunk))
+        finally: await writer.close()
+        if not self.size_estimated and offset != part.size: raise ConnectionError(f"stream ended at {offset} of {part.size} bytes")  # retried, resuming from the journal
+        await asyncio.to_thread(part.finalize, offset if self.size_estimated else None)
+
+class SegmentedDownload:
+    """Downloads one file as 1 MB parts fetched concurrently over several connections,
+    written out of order (through a PartWriter) into a PartFile preallocated to the final size.
+    Only the parts missing from its journal are fetched."""
+
+    def __init__(self, pool: SenderPool, location, part: PartFile, dc_id: int, connections=4, progress_callback=None, latency_callback=None, throttle=None):
+        self.pool, self.location, self.part, self.dc_id = pool, location, part, dc_id
+        self.connections, self.progress_callback, self.latency_callback, self.throttle = connections, progress_callback, latency_callback, throttle
+        self.received = part.done
+
+    async def run(self):
+        parts = self.part.missing(PART_SIZE)
+        queue = asyncio.Queue()
+        for offset in parts: queue.put_nowait(offset)
+        writer = PartWriter(self.part)
+        await writer.open()
+        try:
+            if parts:
+                senders = await self.pool.get(self.dc_id, max(1, min(self.connections, len(parts))))
+                workers = [asyncio.ensure_future(self.worker(sender, queue, writer)) for sender in senders]
+                try: await asyncio.gather(*workers)
+                except BaseException:
+                    for w in workers: w.cancel()
+                    raise
+        finally: await writer.close()
+        await asyncio.to_thread(self.part.finalize)
+
+    async def worker(self, sender, queue, writer: PartWriter):
+        while not queue.empty():
+            offset = queue.get_nowait()
+            t = time.monotonic()
+            result = await sender.send(functions.upload.GetFileRequest(self.location, offset, PART_SIZE))
+            if self.latency_callback: self.latency_callback(time.monotonic() - t)
+            await writer.write(offset, result.bytes)
+            self.received += len(result.bytes)
+            if self.progress_callback: self.progress_callback(self.received, self.part.size)
+            if self.throttle: await self.throttle(len(result.bytes))
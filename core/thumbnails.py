@@ -0,0 +1,51 @@
+"""
+Thumbnail fetching and disk cache for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from typing import Optional
+
+from telethon.errors import FileReferenceExpiredError
+from telethon.tl.types import InputPhotoFileLocation
+
+DEFAULT_THUMB_DIR = Path.home() / '.telegram_downloader' / 'thumbs'
+
+class ThumbnailCache:
+    """Thumbnails as downloaded (small JPEGs), one file per (photo / document id, thumb size), so a re-opened
+    scan shows them without asking Telegram again. Spread over 256 folders to keep directories small."""
+
+    def __init__(self, root=DEFAULT_THUMB_DIR):
+        self.root = Path(root)
+
+    def path(self, location) -> Path:
+        kind = 'p' if isinstance(location, InputPhotoFileLocation) else 'd'  # photo and document ids are separate id spaces
+        return self.root / f"{location.id & 0xff:02x}" / f"{kind}{location.id}_{location.thumb_size}.jpg"
+
+    def read(self, location) -> Optional[bytes]:
+        try: return self.path(location).read_bytes()
+        except OSError: return None
+
+    def write(self, location, data: bytes):
+        path = self.path(location); path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + '.tmp')
+        tmp.write_bytes(data); os.replace(tmp, path)  # a half-written file never has the real name
+
+async def fetch_thumbnail(client, cache: ThumbnailCache, location, dc_id: int, peer=None, msg_id: int = 0) -> bytes:
+    """Thumbnail bytes from the disk cache, else from Telegram (and into the cache). An expired file
+    reference (rows loaded from the scan index are often old) is refreshed from the message once."""
+    data = await asyncio.to_thread(cache.read, location)
+    if data is not None: return data
+    try: data = await client.download_file(location, bytes, dc_id=dc_id)
+    except FileReferenceExpiredError:
+        if peer is None: raise
+        msg = await client.get_messages(peer, ids=msg_id)
+        media = getattr(msg, 'media', None)
+        obj = getattr(media, 'photo', None) or getattr(media, 'document', None)
+        if obj is None or obj.id != location.id: raise
+        location.file_reference = obj.file_reference
+        data = await client.download_file(location, bytes, dc_id=dc_id)
+    await asyncio.to_thread(cache.write, location, data)
+    return data
@@ -0,0 +1,98 @@
+"""
+Download writer stage for Telegram Downloader ULTIMATE PRO
+Created by Aviel.AI
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from .metrics import get_metrics
+from .partfile import PartFile
+
+if hasattr(os, 'pwrite'):
+    def write_at(fd: int, data, offset: int) -> int: return os.pwrite(fd, data, offset)
+else:  # Windows has no pwrite - seek + write, one at a time
+    SEEK_LOCK = threading.Lock()
+    def write_at(fd: int, data, offset: int) -> int:
+        with SEEK_LOCK:
+            os.lseek(fd, offset, os.SEEK_SET)
+            return os.write(fd, data)
+
+class PartWriter:
+    """Writes a download's chunks into its PartFile from worker threads, so a slow disk never holds up
+    network reads on the event loop.
+
+    Contiguous chunks (a stream, or segmented parts arriving in order) are gathered into one buffer,
+    written when it reaches a BUFFER_SIZE boundary - large aligned writes instead of many small ones
+    interleaved with other downloads. Out-of-order parts start a new buffer. Up to MAX_PENDING buffers
+    are written at once, then write() waits (backpressure). A range reaches the journal only after its
+    bytes were written; a write error is raised by the next write() or by close().
+    """
+    BUFFER_SIZE = 4 * 2**20
+    MAX_PENDING = 2
+
+    def __init__(self, part: PartFile):
+        self.part = part
+        self.buffer, self.start = bytearray(), 0  # the buffer holds [start, start + len)
+        self.slots = None
+        self.pending = set()
+        self.saving = False
+        self.error = None
+        self.metrics = get_metrics()
+
+    async def open(self):
+        self.slots = asyncio.Semaphore(self.MAX_PENDING)
+        await asyncio.to_thread(self.part.open)
+
+    async def write(self, offset: int, data: bytes):
+        if self.error: raise self.error
+        while self.buffer and offset != self.start + len(self.buffer): await self.flush()  # another worker may refill it meanwhile
+        if not self.buffer: self.start = offset
+        self.buffer += data
+        end = self.start + len(self.buffer)
+        if len(self.buffer) >= self.BUFFER_SIZE or end % self.BUFFER_SIZE < len(data): await self.flush()  # filled, or crossed a boundary
+
+    async def flush(self):
+        if not self.buffer: return
+        data, start = self.buffer, self.start
+        self.buffer = bytearray()
+        await self.slots.acquire()
+        self.submit(self.write_all, data, start, done=lambda seconds: self.written(start, len(data), seconds))
+
+    def submit(self, fn, *args, done=None):
+        future = asyncio.get_running_loop().run_in_executor(None, fn, *args)
+        self.pending.add(future)
+        future.add_done_callback(lambda f: self.finished(f, done))
+
+    def finished(self, future, done):
+        self.pending.discard(future)
+        if done is None: self.saving = False  # journal save
+        else: self.slots.release()
+        if future.cancelled(): return
+        if future.exception() is not None: self.error = self.error or future.exception(); return
+        if done: done(future.result())
+        if self.part.save_due and not self.saving and not self.error: self.saving = True; self.submit(self.part.save)
+
+    def written(self, start: int, n: int, seconds: float):
+        self.part.mark(start, start + n)
+        self.metrics.observe('disk_write_seconds', seconds); self.metrics.inc('disk_write_bytes_total', n)
+
+    def write_all(self, data: bytearray, offset: int) -> float:
+        """Runs in a worker thread; returns how long the write took"""
+        t = time.monotonic()
+        view = memoryview(data)
+        while view:
+            n = write_at(self.part.fd, view, offset)
+            view, offset = view[n:], offset + n
+        return time.monotonic() - t
+
+    async def close(self):
+        """Writes what is buffered, waits for every write, saves the journal and closes the file - also after errors"""
+        try:
+            if not self.error: await self.flush()
+        finally:
+            while self.pending: await asyncio.wait(list(self.pending))  # never close the fd under a running write
+            await asyncio.to_thread(self.part.close)
+        if self.error: raise self.error
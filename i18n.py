@@ -5,44 +5,54 @@ Created by Aviel.AI
 
 import json
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
+
+TRANSLATIONS_DIR = Path(__file__).parent / "translations"  # <lang>.json: extra languages, or overrides of built-in strings
 
 class Translation:
+    """The strings of one language, resolved when the language is set.
+
+    tr() runs on every progress event, so the active language's catalog is a single dict (the built-in strings
+    merged with translations/<lang>.json, read the first time that language is used) and each key's template
+    keeps its bound format_map - a lookup without arguments is one dict access, with arguments two.
+    A string that cannot be formatted with the given arguments is returned unformatted.
+    """
+
     def __init__(self, language: str = "he"):
         self.current_language = language
-        self.translations: Dict[str, Dict] = {}
-        self.load_translations()
-    
-    def load_translations(self):
-        self.translations = BUILT_IN_TRANSLATIONS.copy()
-        translations_dir = Path(__file__).parent / "translations"
-        if translations_dir.exists():
-            for file in translations_dir.glob("*.json"):
-                lang_code = file.stem
-                try:
-                    with open(file, 'r', encoding='utf-8') as f:
-                        file_translations = json.load(f)
-                        if lang_code in self.translations:
-                            self.translations[lang_code].update(file_translations)
-                        else:
-                            self.translations[lang_code] = file_translations
-                except Exception: continue
-    
+        self.overrides: Dict[str, dict] = {}  # language -> its JSON file ({} = none or unreadable)
+        self.strings: Dict[str, str] = self.catalog(language)
+        self.formatters: Dict[str, Callable[[dict], str]] = {}
+
+    def override(self, language: str) -> dict:
+        if language not in self.overrides:
+            try: self.overrides[language] = json.loads((TRANSLATIONS_DIR / f"{language}.json").read_text(encoding='utf-8'))
+            except (OSError, ValueError): self.overrides[language] = {}
+        return self.overrides[language]
+
+    def catalog(self, language: str) -> Dict[str, str]:
+        built_in, extra = BUILT_IN_TRANSLATIONS.get(language, {}), self.override(language)
+        return {**built_in, **extra} if extra else built_in
+
     def get(self, key: str, **kwargs) -> str:
-        translation = self.translations.get(self.current_language, {}).get(key, key)
-        if kwargs:
-            try: return translation.format(**kwargs)
-            except (KeyError, ValueError): return translation
-        return translation
-    
+        return self.format(key, kwargs) if kwargs else self.strings.get(key, key)
+
+    def format(self, key: str, kwargs: dict) -> str:
+        formatter = self.formatters.get(key)
+        if formatter is None: formatter = self.formatters[key] = self.strings.get(key, key).format_map
+        try: return formatter(kwargs)
+        except (KeyError, ValueError, IndexError): return self.strings.get(key, key)
+
     def set_language(self, language: str):
-        if language in self.translations:
+        if language in BUILT_IN_TRANSLATIONS or self.override(language):
             self.current_language = language
+            self.strings, self.formatters = self.catalog(language), {}
             return True
         return False
-    
+
     def get_available_languages(self) -> Dict[str, str]:
-        return {lang: self.translations[lang].get("language_name", lang) for lang in self.translations.keys()}
+        languages = list(BUILT_IN_TRANSLATIONS) + sorted(p.stem for p in TRANSLATIONS_DIR.glob("*.json") if p.stem not in BUILT_IN_TRANSLATIONS)
+        return {lang: self.catalog(lang).get("language_name", lang) for lang in languages if lang in BUILT_IN_TRANSLATIONS or self.override(lang)}
 
 BUILT_IN_TRANSLATIONS = {
     "en": {
@@ -77,9 +87,16 @@ BUILT_IN_TRANSLATIONS = {
         "scan_connected": "✓ Secure Connection Established",
         "scan_scanning": "Scanning messages...",
         "scan_found_files": "Found {count} files",
+        "scan_progress": "Scanned {seen} / {total} messages • {count} files found",
+        "scan_use_index": "Incremental (local index)",
+        "scan_verify_deleted": "Verify deleted messages",
+        "scan_media_types": "Scan for:",
+        "scan_verifying": "Checking for deleted messages...",
         "select_title": "Select Media Assets",
         "btn_select_all": "Select All",
         "btn_select_none": "Deselect All",
+        "btn_select_matching": "Select Matching",
+        "btn_select_none_matching": "Deselect Matching",
         "filter_label": "Type:",
         "filter_all": "All Files",
         "filter_photos": "Photos",
@@ -89,6 +106,29 @@ BUILT_IN_TRANSLATIONS = {
         "search_placeholder": "Search by filename...",
         "selected_count": "{count} Files Selected",
         "download_path_label": "Download to:",
+        "split_threshold_label": "Split files larger than:",
+        "parallel_label": "Parallel downloads (adaptive):",
+        "parallel_min": "Min",
+        "parallel_max": "Max",
+        "download_parallel": "Parallel: {active}/{limit}",
+        "order_label": "Order:",
+        "order_list": "List order",
+        "order_smallest": "Smallest first",
+        "order_largest": "Largest first",
+        "order_newest": "Newest first",
+        "order_oldest": "Oldest first",
+        "order_priority": "My priority",
+        "priority_first": "⭐ Download first",
+        "priority_normal": "Normal priority",
+        "split_connections_label": "Connections per file:",
+        "link_mode_label": "Already downloaded elsewhere:",
+        "link_hardlink": "Hard link",
+        "link_reflink": "Reflink (copy-on-write)",
+        "link_symlink": "Symbolic link",
+        "link_copy": "Copy",
+        "link_off": "Download again",
+        "already_have_count": "Already have: {count} ({size})",
+        "already_have_badge": "✓ Already have",
         "btn_browse": "Browse",
         "btn_back": "Back",
         "btn_download_selected": "⬇ Download Selected ULTIMATE",
@@ -99,9 +139,41 @@ BUILT_IN_TRANSLATIONS = {
         "download_eta": "ETA: {eta}",
         "download_completed": "✓ ULTIMATE Download Successful!",
         "download_stats": "Downloaded: {downloaded} • Failed: {failed}",
+        "dedup_stats": "Linked from existing copies: {count} ({size})",
+        "retry_stats": "Retries: {retries} • FloodWait: {flood_waits} ({flood_seconds}s) • References refreshed: {refreshes} • Re-queued: {requeued}",
         "btn_stop_download": "Cancel",
         "btn_done": "Finish",
         "btn_open_folder": "Open Folder",
+        "menu_queue": "Job Queue",
+        "queue_title": "Job Queue",
+        "queue_add": "Add to Queue",
+        "queue_search": "Name contains",
+        "queue_min_size": "Min:",
+        "queue_max_size": "Max:",
+        "queue_any_size": "any",
+        "queue_default_dest": "Default folder",
+        "queue_pause": "Pause",
+        "queue_resume": "Resume",
+        "queue_remove": "Remove",
+        "queue_col_chat": "Chat",
+        "queue_col_rules": "Rules",
+        "queue_col_state": "State",
+        "queue_col_progress": "Progress",
+        "queue_limits": "Shared limits",
+        "queue_scans": "Parallel scans:",
+        "queue_downloads": "Parallel downloads:",
+        "queue_transfers": "Files in flight:",
+        "queue_bandwidth": "Bandwidth:",
+        "queue_unlimited": "unlimited",
+        "queue_state_queued": "Queued",
+        "queue_state_scanning": "Scanning",
+        "queue_state_waiting": "Waiting to download",
+        "queue_state_downloading": "Downloading",
+        "queue_state_paused": "Paused",
+        "queue_state_done": "Done",
+        "queue_state_failed": "Failed",
+        "queue_scan_progress": "{seen} scanned • {found} found",
+        "queue_selected": "{selected} of {found} files selected",
         "dialog_code_title": "Auth Code",
         "dialog_code_message": "Enter the code sent to {phone}:",
         "dialog_password_title": "2FA Required",
@@ -116,6 +188,20 @@ BUILT_IN_TRANSLATIONS = {
         "error_no_files_selected": "No files selected",
         "error_connection": "Connection failed: {error}",
         "error_scan": "Scan failed: {error}",
+        "error_config": "Invalid setting in config.json or TGDL_*, using the defaults: {error}",
+        "cli_phone": "Phone number: ",
+        "cli_logged_in": "Logged in as {name}",
+        "cli_login_required": "This session is not logged in - run `login` first",
+        "cli_nothing_pending": "No unfinished downloads",
+        "cli_watch_waiting": "Next check in {seconds}s",
+        "cli_daemon_listening": "Daemon listening on {address}",
+        "cli_daemon_unreachable": "No daemon at {address}: {error}",
+        "cli_queue_added": "Job #{id} added: {chat}",
+        "cli_queue_empty": "The job queue is empty",
+        "cli_queue_unknown": "No job #{id}",
+        "cli_accounts_none": "No extra accounts - add one with `login --account NAME`",
+        "cli_account_logged_out": "not logged in",
+        "cli_accounts_disabled": "Extra accounts are turned off (extra_accounts in config.json)",
         "success_logout": "Logged out",
         "about_title": "About ULTIMATE PRO",
         "about_text": "<h2>Telegram Downloader ULTIMATE PRO</h2><p>The most advanced media retrieval engine.</p><p>Built with ❤️ by Aviel.AI</p>"
@@ -152,9 +238,16 @@ BUILT_IN_TRANSLATIONS = {
         "scan_connected": "✓ חיבור מאובטח נוצר",
         "scan_scanning": "סורק הודעות...",
         "scan_found_files": "נמצאו {count} קבצים",
+        "scan_progress": "נסרקו {seen} מתוך {total} הודעות • נמצאו {count} קבצים",
+        "scan_use_index": "סריקה מצטברת (אינדקס מקומי)",
+        "scan_verify_deleted": "בדוק הודעות שנמחקו",
+        "scan_media_types": "סרוק עבור:",
+        "scan_verifying": "בודק הודעות שנמחקו...",
         "select_title": "בחירת נכסי מדיה",
         "btn_select_all": "בחר הכל",
         "btn_select_none": "בטל הכל",
+        "btn_select_matching": "בחר תואמים",
+        "btn_select_none_matching": "בטל תואמים",
         "filter_label": "סוג:",
         "filter_all": "כל הקבצים",
         "filter_photos": "תמונות",
@@ -164,6 +257,29 @@ BUILT_IN_TRANSLATIONS = {
         "search_placeholder": "חיפוש לפי שם קובץ...",
         "selected_count": "{count} קבצים נבחרו",
         "download_path_label": "הורדה ל:",
+        "split_threshold_label": "פצל קבצים גדולים מ:",
+        "parallel_label": "הורדות במקביל (אדפטיבי):",
+        "parallel_min": "מינימום",
+        "parallel_max": "מקסימום",
+        "download_parallel": "במקביל: {active}/{limit}",
+        "order_label": "סדר:",
+        "order_list": "לפי הרשימה",
+        "order_smallest": "הקטנים קודם",
+        "order_largest": "הגדולים קודם",
+        "order_newest": "החדשים קודם",
+        "order_oldest": "הישנים קודם",
+        "order_priority": "לפי העדיפות שלי",
+        "priority_first": "⭐ הורד ראשון",
+        "priority_normal": "עדיפות רגילה",
+        "split_connections_label": "חיבורים לכל קובץ:",
+        "link_mode_label": "כבר הורד במקום אחר:",
+        "link_hardlink": "קישור קשיח (Hard link)",
+        "link_reflink": "שכפול Copy-on-write (Reflink)",
+        "link_symlink": "קישור סימבולי",
+        "link_copy": "העתקה",
+        "link_off": "להוריד שוב",
+        "already_have_count": "כבר קיימים: {count} ({size})",
+        "already_have_badge": "✓ כבר קיים",
         "btn_browse": "עיון",
         "btn_back": "חזור",
         "btn_download_selected": "⬇ הורד קבצים ULTIMATE",
@@ -174,9 +290,41 @@ BUILT_IN_TRANSLATIONS = {
         "download_eta": "זמן נותר: {eta}",
         "download_completed": "✓ הורדת ULTIMATE הושלמה בהצלחה!",
         "download_stats": "הורדו: {downloaded} • נכשלו: {failed}",
+        "dedup_stats": "קושרו מעותקים קיימים: {count} ({size})",
+        "retry_stats": "ניסיונות חוזרים: {retries} • FloodWait: {flood_waits} ({flood_seconds} שנ') • הפניות שרועננו: {refreshes} • הוחזרו לתור: {requeued}",
         "btn_stop_download": "ביטול",
         "btn_done": "סיום",
         "btn_open_folder": "פתח תיקייה",
+        "menu_queue": "תור משימות",
+        "queue_title": "תור משימות",
+        "queue_add": "הוסף לתור",
+        "queue_search": "השם מכיל",
+        "queue_min_size": "מינימום:",
+        "queue_max_size": "מקסימום:",
+        "queue_any_size": "ללא",
+        "queue_default_dest": "תיקיית ברירת מחדל",
+        "queue_pause": "השהה",
+        "queue_resume": "המשך",
+        "queue_remove": "הסר",
+        "queue_col_chat": "צ'אט",
+        "queue_col_rules": "כללים",
+        "queue_col_state": "מצב",
+        "queue_col_progress": "התקדמות",
+        "queue_limits": "מגבלות משותפות",
+        "queue_scans": "סריקות במקביל:",
+        "queue_downloads": "הורדות במקביל:",
+        "queue_transfers": "קבצים בהעברה:",
+        "queue_bandwidth": "רוחב פס:",
+        "queue_unlimited": "ללא הגבלה",
+        "queue_state_queued": "בתור",
+        "queue_state_scanning": "סורק",
+        "queue_state_waiting": "ממתין להורדה",
+        "queue_state_downloading": "מוריד",
+        "queue_state_paused": "מושהה",
+        "queue_state_done": "הושלם",
+        "queue_state_failed": "נכשל",
+        "queue_scan_progress": "{seen} נסרקו • {found} נמצאו",
+        "queue_selected": "{selected} מתוך {found} קבצים נבחרו",
         "dialog_code_title": "קוד אימות",
         "dialog_code_message": "הזן את הקוד שנשלח ל-{phone}:",
         "dialog_password_title": "נדרש 2FA",
@@ -191,6 +339,20 @@ BUILT_IN_TRANSLATIONS = {
         "error_no_files_selected": "לא נבחרו קבצים",
         "error_connection": "החיבור נכשל: {error}",
         "error_scan": "הסריקה נכשלה: {error}",
+        "error_config": "הגדרה לא תקינה ב-config.json או ב-TGDL_*, נעשה שימוש בברירות המחדל: {error}",
+        "cli_phone": "מספר טלפון: ",
+        "cli_logged_in": "מחובר בתור {name}",
+        "cli_login_required": "ה-Session אינו מחובר - הרץ קודם `login`",
+        "cli_nothing_pending": "אין הורדות שלא הסתיימו",
+        "cli_watch_waiting": "בדיקה הבאה בעוד {seconds} שנ'",
+        "cli_daemon_listening": "השירות מאזין ב-{address}",
+        "cli_daemon_unreachable": "אין שירות פעיל ב-{address}: {error}",
+        "cli_queue_added": "משימה #{id} נוספה: {chat}",
+        "cli_queue_empty": "תור המשימות ריק",
+        "cli_queue_unknown": "אין משימה #{id}",
+        "cli_accounts_none": "אין חשבונות נוספים - הוסף עם `login --account NAME`",
+        "cli_account_logged_out": "לא מחובר",
+        "cli_accounts_disabled": "החשבונות הנוספים כבויים (extra_accounts ב-config.json)",
         "success_logout": "התנתקת בהצלחה",
         "about_title": "אודות ULTIMATE PRO",
         "about_text": "<h2>מוריד טלגרם ULTIMATE PRO</h2><p>מנוע הורדת המדיה המתקדם ביותר.</p><p>נבנה באהבה על ידי Aviel.AI</p>"
@@ -202,4 +364,6 @@ def get_translator() -> Translation:
     global _translator
     if _translator is None: _translator = Translation()
     return _translator
-def tr(key: str, **kwargs) -> str: return get_translator().get(key, **kwargs)
+def tr(key: str, **kwargs) -> str:
+    t = _translator or get_translator()
+    return t.format(key, kwargs) if kwargs else t.strings.get(key, key)
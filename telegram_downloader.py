@@ -5,29 +5,34 @@ Created by Aviel.AI
 """
 
 import sys
-import asyncio
 import os
-import time
-import subprocess
+from importlib.util import find_spec
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from itertools import compress
 from pathlib import Path
 from typing import Optional, List, Dict
-import webbrowser
-from datetime import datetime
-import humanize
 
-from PyQt6.QtWidgets import *
-from PyQt6.QtCore import QThread, pyqtSignal, Qt, QSettings, QSize, QTimer, QPropertyAnimation, QEasingCurve
-from PyQt6.QtGui import QIcon, QFont, QPixmap, QPalette, QColor, QImage
+# Explicit names instead of `import *`; Telethon, the engine, asyncio, subprocess, humanize and webbrowser are imported where used,
+# so the window paints before any of them load (see benchmarks/bench_startup.py)
+from PyQt6.QtWidgets import (
+    QAbstractItemView, QApplication, QCheckBox, QComboBox, QDialog, QFileDialog, QFormLayout, QFrame, QGroupBox, QHBoxLayout, QHeaderView, QInputDialog, QLabel,
+    QLineEdit, QListView, QMainWindow, QMenu, QMessageBox, QProgressBar, QPushButton, QSpinBox, QStackedWidget, QStyle, QStyleOptionButton, QStyledItemDelegate,
+    QSystemTrayIcon, QTableWidget, QTableWidgetItem, QVBoxLayout, QWidget
+)
+from PyQt6.QtCore import QObject, pyqtSignal, Qt, QSettings, QSize, QAbstractTableModel, QAbstractProxyModel, QModelIndex, QRect, QEvent, QTimer
+from PyQt6.QtGui import QFont, QPainter, QColor, QFontMetrics, QImage, QPixmap
 
 from i18n import tr, get_translator
+from core.config import CONFIG_PATH, DEFAULTS, LINK_MODES, load_config
+from core.scheduler import POLICIES
+from core.progress import format_eta
 
-try:
-    from telethon import TelegramClient, events
-    from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
-    from telethon.errors import SessionPasswordNeededError
-    TELETHON_AVAILABLE = True
-except ImportError:
-    TELETHON_AVAILABLE = False
+TELETHON_AVAILABLE = find_spec('telethon') is not None
+
+def naturalsize(n) -> str:
+    import humanize
+    return humanize.naturalsize(n)
 
 # --- ULTIMATE PRO STYLESHEETS ---
 LIGHT_STYLE = """
@@ -59,205 +64,535 @@ QFrame#mediaItem { background-color: #1e1e1e; border: 1px solid #333; }
 QLabel { color: #e0e0e0; }
 """
 
-class AuthThread(QThread):
+class ServiceJob(QObject):
+    """Work submitted to the shared ClientService - runs on its event loop and reports back through Qt signals.
+    Subclasses pass the coroutine function to run there: work(service)."""
+
+    def __init__(self, work):
+        super().__init__()
+        self.work = work
+        self.future = None
+        self.is_running = True
+
+    def start(self, service):
+        self.future = service.submit(self.work)
+        self.future.add_done_callback(self.job_done)
+
+    def job_done(self, future):
+        if future.cancelled(): return
+        e = future.exception()
+        if e is not None: self.job_error(e)  # e.g. the connection itself failed
+
+    def job_error(self, e): pass
+
+    def isRunning(self): return self.future is not None and not self.future.done()
+
+    def stop(self):
+        self.is_running = False
+        if self.future: self.future.cancel()
+
+class AuthJob(ServiceJob):
     code_needed = pyqtSignal(str)
     password_needed = pyqtSignal()
     auth_success = pyqtSignal()
     auth_error = pyqtSignal(str)
     
-    def __init__(self, api_id, api_hash, session_path, phone):
-        super().__init__()
-        self.api_id, self.api_hash, self.session_path, self.phone = api_id, api_hash, session_path, phone
+    def __init__(self, phone):
+        super().__init__(self.execute)
+        self.phone = phone
         self.code = self.password = None
     
-    def run(self):
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            client = TelegramClient(str(self.session_path), self.api_id, self.api_hash, loop=loop)
-            loop.run_until_complete(self.authenticate(client))
-            loop.close()
-        except Exception as e: self.auth_error.emit(str(e))
-    
-    async def authenticate(self, client):
-        await client.connect()
+    def job_error(self, e): self.auth_error.emit(str(e))
+
+    async def execute(self, service):
+        import asyncio
+        client = service.client
         if not await client.is_user_authorized():
             await client.send_code_request(self.phone)
             self.code_needed.emit(self.phone)
             while self.code is None: await asyncio.sleep(0.1)
+            from telethon.errors import SessionPasswordNeededError
             try: await client.sign_in(self.phone, self.code)
             except SessionPasswordNeededError:
                 self.password_needed.emit()
                 while self.password is None: await asyncio.sleep(0.1)
                 await client.sign_in(password=self.password)
-        await client.disconnect()
         self.auth_success.emit()
 
-class ScanThread(QThread):
+class ScanJob(ServiceJob):
+    """GUI side of a core Scanner - its callbacks become Qt signals"""
     progress = pyqtSignal(int, str)
-    content_found = pyqtSignal(list)
+    batch_found = pyqtSignal(object)  # MediaStore holding the new records
+    content_found = pyqtSignal(int)  # total items found, emitted once when the scan ends
+    removed = pyqtSignal(list)  # message ids found deleted while verifying the index
     error = pyqtSignal(str)
     
-    def __init__(self, api_id, api_hash, session_path, group_link, max_messages):
-        super().__init__()
-        self.api_id, self.api_hash, self.session_path, self.group_link, self.max_messages = api_id, api_hash, session_path, group_link, max_messages
-        self.is_running = True
-    
-    def run(self):
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            client = TelegramClient(str(self.session_path), self.api_id, self.api_hash, loop=loop)
-            loop.run_until_complete(self.scan_content(client))
-            loop.close()
-        except Exception as e: self.error.emit(str(e))
-    
-    async def scan_content(self, client):
+    def __init__(self, group_link, max_messages, use_index=True, verify_deletions=False, media_filter=None):
+        super().__init__(self.execute)
+        from core.scanner import Scanner
+        self.scanner = Scanner(group_link, max_messages, use_index, verify_deletions, batch_callback=self.batch_found.emit, progress_callback=self.report_progress,
+                               status_callback=self.report_status, scanned_callback=self.scanned, removed_callback=self.removed.emit, media_filter=media_filter)
+
+    def job_error(self, e): self.error.emit(str(e))
+
+    async def execute(self, service):
+        import asyncio
         try:
-            await client.connect()
-            self.progress.emit(10, tr("scan_connecting"))
-            entity = await client.get_entity(self.group_link)
-            self.progress.emit(30, tr("scan_scanning"))
-            messages = await client.get_messages(entity, limit=self.max_messages)
-            self.progress.emit(50, tr("scan_analyzing"))
-            media_items = []
-            for msg in messages:
-                if not self.is_running: break
-                if msg.media:
-                    item = {'id': msg.id, 'date': msg.date, 'message': msg, 'type': 'file', 'name': f"file_{msg.id}", 'size': 0, 'thumb': None}
-                    if isinstance(msg.media, MessageMediaPhoto):
-                        item['type'] = 'photo'
-                        item['name'] = f"photo_{msg.id}.jpg"
-                    elif isinstance(msg.media, MessageMediaDocument):
-                        doc = msg.media.document
-                        item['size'] = doc.size
-                        filename = next((attr.file_name for attr in doc.attributes if hasattr(attr, 'file_name')), f"file_{msg.id}")
-                        item['name'] = filename
-                        ext = filename.lower()
-                        if ext.endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')): item['type'] = 'image'
-                        elif ext.endswith(('.mp4', '.avi', '.mkv', '.mov', '.wmv')): item['type'] = 'video'
-                        elif ext.endswith(('.pdf', '.doc', '.docx', '.txt', '.epub')): item['type'] = 'document'
-                        elif ext.endswith(('.zip', '.rar', '.7z', '.tar', '.gz')): item['type'] = 'archive'
-                        else: item['type'] = 'file'
-                    media_items.append(item)
-            self.progress.emit(100, tr("scan_found_files", count=len(media_items)))
-            self.content_found.emit(media_items)
-            await client.disconnect()
+            found = await self.scanner.run(service.client)
+            if self.scanner.verify_deletions and self.scanner.is_running: self.progress.emit(100, tr("scan_found_files", count=found))
+        except asyncio.CancelledError: pass
         except Exception as e: self.error.emit(str(e))
-    
-    def stop(self): self.is_running = False
 
-class ParallelDownloadThread(QThread):
-    """ULTIMATE Parallel Downloader with Speed and ETA"""
+    def report_status(self, key): self.progress.emit(100 if key == "scan_verifying" else 0, tr(key))
+
+    def report_progress(self, seen, total, found):
+        p = int(seen * 100 / total) if total else 0
+        self.progress.emit(min(p, 100), tr("scan_progress", seen=seen, total=total, count=found))
+
+    def scanned(self, found):
+        done, stats = tr("scan_found_files", count=found), self.scanner.retry.stats
+        self.progress.emit(100, f"{done} • {tr('retry_stats', **stats)}" if stats['retries'] else done)
+        self.content_found.emit(found)
+
+    def stop(self): self.scanner.stop(); super().stop()
+
+class ParallelDownloadJob(ServiceJob):
+    """GUI side of a core Downloader, with speed and ETA formatted for display"""
     progress = pyqtSignal(int, str, int, int, str, str) # p, name, current, total, speed, eta
-    finished = pyqtSignal(int, int)
-    
-    def __init__(self, api_id, api_hash, session_path, items, download_path, concurrent=3):
-        super().__init__()
-        self.api_id, self.api_hash, self.session_path, self.items, self.download_path = api_id, api_hash, session_path, items, Path(download_path)
-        self.concurrent = concurrent
-        self.is_running = True
-        self.downloaded = 0
-        self.failed = 0
-        self.start_time = 0
-        self.total_bytes = 0
+    finished = pyqtSignal(int, int, dict)  # downloaded, failed, retry stats
     
-    def run(self):
-        try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            client = TelegramClient(str(self.session_path), self.api_id, self.api_hash, loop=loop)
-            loop.run_until_complete(self.start_parallel(client))
-            loop.close()
-        except Exception: self.finished.emit(self.downloaded, self.failed)
-
-    async def start_parallel(self, client):
-        await client.connect()
-        self.start_time = time.time()
-        semaphore = asyncio.Semaphore(self.concurrent)
-        tasks = []
-        for i, item in enumerate(self.items):
-            tasks.append(self.download_item(client, item, i, semaphore))
-        await asyncio.gather(*tasks)
-        await client.disconnect()
-        self.finished.emit(self.downloaded, self.failed)
-
-    async def download_item(self, client, item, index, semaphore):
-        async with semaphore:
-            if not self.is_running: return
-            try:
-                file_path = self.download_path / item['name']
-                # Resume Support
-                if file_path.exists() and file_path.stat().st_size == item['size'] and item['size'] > 0:
-                    self.downloaded += 1
-                    self.update_stats(item['name'], index + 1)
-                    return
-
-                def prog_callback(received, total):
-                    if not self.is_running: raise Exception("Stopped")
-                    self.total_bytes += received
-                    self.update_stats(item['name'], index + 1)
-
-                await client.download_media(item['message'], file=str(file_path), progress_callback=prog_callback)
-                self.downloaded += 1
-            except Exception: self.failed += 1
-
-    def update_stats(self, name, current):
-        elapsed = time.time() - self.start_time
-        speed_val = self.total_bytes / elapsed if elapsed > 0 else 0
-        speed_str = f"{humanize.naturalsize(speed_val)}/s"
-        
-        # ETA calculation
-        remaining_items = len(self.items) - self.downloaded
-        if self.downloaded > 0:
-            avg_time = elapsed / self.downloaded
-            eta_val = avg_time * remaining_items
-            eta_str = str(datetime.utcfromtimestamp(eta_val).strftime('%H:%M:%S'))
-        else: eta_str = "--:--:--"
-        
-        p = int((current / len(self.items)) * 100)
-        self.progress.emit(p, name, current, len(self.items), speed_str, eta_str)
+    def __init__(self, *args, **kwargs):
+        super().__init__(self.execute)
+        from core.downloader import Downloader
+        self.engine = Downloader(*args, progress_callback=self.report_progress, **kwargs)
+        self.limiter = self.engine.limiter
+
+    def job_error(self, e): self.finished.emit(self.engine.downloaded, self.engine.failed, self.engine.retry.stats)
+
+    async def execute(self, service):
+        # extra DC connections in service.pool outlive the job and serve the next one too
+        self.finished.emit(*await self.engine.run(service.client, service.pool, service.accounts))
 
-    def stop(self): self.is_running = False
+    def report_progress(self, snap):
+        self.progress.emit(snap['percent'], snap['name'], snap['files_done'], snap['total_files'],
+                           f"{naturalsize(snap['speed'])}/s", format_eta(snap['eta']))
 
-class MediaItemWidget(QFrame):
-    changed = pyqtSignal()
-    def __init__(self, item: dict, is_dark=False):
+    def stop(self): self.engine.stop()  # workers wind down and still report what finished
+
+class QueueJob(ServiceJob):
+    """GUI side of a core JobRunner - runs for the rest of the session, next to the wizard's own scan and download.
+    Runner methods are called on the service loop (call()); every job change comes back as job_updated."""
+    job_updated = pyqtSignal(object)  # a copy of the job dict
+    error = pyqtSignal(str)
+
+    def __init__(self, config):
+        super().__init__(self.execute)
+        from core.job_queue import JobQueue, JobRunner
+        self.runner = JobRunner(JobQueue(), config, update_callback=self.job_updated.emit)
+        self.service = None
+
+    def start(self, service): self.service = service; super().start(service)
+
+    def job_error(self, e): self.error.emit(str(e))
+
+    async def execute(self, service): await self.runner.run(service.client, service.pool, accounts=service.accounts)
+
+    def call(self, method, *args, **kwargs):
+        if self.service: self.service.loop.call_soon_threadsafe(lambda: method(*args, **kwargs))
+
+    def stop(self): self.call(self.runner.stop)  # jobs cut off here are queued again on the next start
+
+def decode_thumbnail(data: bytes, side: int) -> Optional[QImage]:
+    """JPEG bytes -> a side x side centre crop; QImage (unlike QPixmap) may be built off the GUI thread"""
+    image = QImage.fromData(data)
+    if image.isNull(): return None
+    image = image.scaled(side, side, Qt.AspectRatioMode.KeepAspectRatioByExpanding, Qt.TransformationMode.SmoothTransformation)
+    return image.copy((image.width() - side) // 2, (image.height() - side) // 2, side, side)
+
+class ThumbnailLoader(QObject):
+    """List thumbnails, requested by the delegate only for rows it paints.
+
+    Misses are fetched a few at a time on the shared client, most recently painted first; requests for rows
+    scrolled past long ago are dropped. Bytes come from the disk cache when possible, are decoded on a worker
+    thread, and the pixmaps live in an LRU bounded by bytes, so painting a cached row is a dict lookup.
+    """
+    SIDE = 48
+    MAX_IN_FLIGHT = 4
+    MAX_QUEUED = 64
+    MEMORY_BYTES = 24 * 2**20
+    loaded = pyqtSignal(object, object)  # key, QImage or None - emitted on the service thread, delivered on the GUI thread
+    updated = pyqtSignal()
+
+    def __init__(self, service_getter, parent=None):
+        super().__init__(parent)
+        self.service_getter = service_getter
+        self.memory: 'OrderedDict[tuple, QPixmap]' = OrderedDict(); self.memory_bytes = 0
+        self.queue: 'OrderedDict[tuple, object]' = OrderedDict()  # key -> callable giving (location, dc_id, peer, msg_id)
+        self.in_flight: Dict[tuple, object] = {}
+        self.failed = set()
+        self.disk = None
+        self.loaded.connect(self.on_loaded)
+
+    def get(self, key, make_request) -> Optional[QPixmap]:
+        pixmap = self.memory.get(key)
+        if pixmap is not None: self.memory.move_to_end(key); return pixmap
+        if key in self.in_flight or key in self.failed: return None
+        self.queue[key] = make_request; self.queue.move_to_end(key)
+        while len(self.queue) > self.MAX_QUEUED: self.queue.popitem(last=False)
+        self.pump()
+        return None
+
+    def pump(self):
+        service = self.service_getter()
+        if service is None: return
+        while self.queue and len(self.in_flight) < self.MAX_IN_FLIGHT:
+            key, make_request = self.queue.popitem(last=True)
+            request = make_request()
+            if request is None: self.failed.add(key); continue
+            future = self.in_flight[key] = service.submit(lambda svc, req=request: self.fetch(svc, *req))
+            future.add_done_callback(lambda f, k=key: self.loaded.emit(k, None if f.cancelled() or f.exception() else f.result()))
+
+    async def fetch(self, service, location, dc_id, peer, msg_id):
+        import asyncio
+        from core.thumbnails import ThumbnailCache, fetch_thumbnail
+        if self.disk is None: self.disk = ThumbnailCache()
+        data = await fetch_thumbnail(service.client, self.disk, location, dc_id, peer, msg_id)
+        return await asyncio.to_thread(decode_thumbnail, data, self.SIDE)
+
+    def on_loaded(self, key, image):
+        self.in_flight.pop(key, None)
+        if image is None: self.failed.add(key)
+        else:
+            pixmap = QPixmap.fromImage(image); self.memory[key] = pixmap; self.memory_bytes += pixmap.width() * pixmap.height() * 4
+            while self.memory_bytes > self.MEMORY_BYTES and len(self.memory) > 1:
+                _, old = self.memory.popitem(last=False); self.memory_bytes -= old.width() * old.height() * 4
+            self.updated.emit()
+        self.pump()
+
+    def reset(self):
+        """New scan: forget pending requests and give failed thumbnails another chance (memory cache stays)"""
+        self.queue.clear(); self.failed.clear()
+
+    def stop(self):
+        self.queue.clear()
+        for future in self.in_flight.values(): future.cancel()
+
+ICON_MAP = {'photo': '📷', 'image': '🖼️', 'video': '🎬', 'document': '📄', 'archive': '📦', 'file': '📎'}
+
+class MediaListModel(QAbstractTableModel):
+    """Scan results (a MediaStore) as a model - the view only paints the rows that are visible"""
+    SizeRole, DateRole, TypeRole, HaveRole = Qt.ItemDataRole.UserRole + 1, Qt.ItemDataRole.UserRole + 2, Qt.ItemDataRole.UserRole + 3, Qt.ItemDataRole.UserRole + 4
+    ThumbRole, ThumbRequestRole = Qt.ItemDataRole.UserRole + 5, Qt.ItemDataRole.UserRole + 6
+    selection_changed = pyqtSignal()
+    # Check marks, badges and priorities only change how rows look: views repaint on this instead of dataChanged,
+    # which makes QListView (list mode) lay out every row again - seconds at 200k rows, per click
+    repaint_needed = pyqtSignal()
+
+    def __init__(self):
         super().__init__()
-        self.item = item
-        self.is_dark = is_dark
-        self.init_ui()
-    
-    def init_ui(self):
-        self.setObjectName("mediaItem")
-        self.setFrameShape(QFrame.Shape.StyledPanel)
-        bg = "#1e1e1e" if self.is_dark else "white"
-        border = "#333" if self.is_dark else "#e9ecef"
-        hover = "#2d2d2d" if self.is_dark else "#f1f3f5"
-        
-        self.setStyleSheet(f"QFrame#mediaItem {{ background-color: {bg}; border: 1px solid {border}; border-radius: 10px; }} QFrame#mediaItem:hover {{ background-color: {hover}; border-color: #0088cc; }}")
-        
-        layout = QHBoxLayout(self)
-        self.checkbox = QCheckBox(); self.checkbox.setChecked(True); self.checkbox.stateChanged.connect(lambda: self.changed.emit()); layout.addWidget(self.checkbox)
+        from core.media_store import MediaStore
+        from core.search_index import SearchIndex
+        self.store = MediaStore()
+        self.search = SearchIndex()  # casefolded names + per-type rows, grown with the store
+        self.checked = bytearray()
+        self.selected_count = self.selected_bytes = 0  # running totals - a toggle updates them instead of recounting
+        self.priorities: Dict[int, int] = {}  # row -> user priority, for the 'priority' download order
+        self.have = bytearray()  # 1 = the content registry has this file from an earlier download
+        self.have_count = self.have_bytes = 0
+
+    def rowCount(self, parent=QModelIndex()): return 0 if parent.isValid() else len(self.store)
+    def columnCount(self, parent=QModelIndex()): return 0 if parent.isValid() else 1
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid(): return None
+        row = index.row()
+        if role == Qt.ItemDataRole.DisplayRole: return f"⭐ {self.store.name(row)}" if self.priorities.get(row, 0) > 0 else self.store.name(row)
+        if role == Qt.ItemDataRole.CheckStateRole: return Qt.CheckState.Checked if self.checked[row] else Qt.CheckState.Unchecked
+        if role == Qt.ItemDataRole.DecorationRole: return ICON_MAP.get(self.store.type_name(row), '📎')
+        if role == self.SizeRole: return self.store.sizes[row]
+        if role == self.DateRole: return self.store.date(row)
+        if role == self.TypeRole: return self.store.type_name(row)
+        if role == self.HaveRole: return bool(self.have[row])
+        if role == self.ThumbRole: return self.store.preview_key(row)  # cache key: cheap, asked on every paint
+        if role == self.ThumbRequestRole:  # only built on a cache miss
+            location = self.store.preview_location(row)
+            return (location, self.store.dc_ids[row], self.store.peer, self.store.msg_ids[row]) if location else None
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if not index.isValid() or role != Qt.ItemDataRole.CheckStateRole: return False
+        row, c = index.row(), Qt.CheckState(value) == Qt.CheckState.Checked
+        if self.checked[row] == c: return True
+        self.checked[row] = c; sign = 1 if c else -1
+        self.selected_count += sign; self.selected_bytes += sign * self.store.sizes[row]
+        self.repaint_needed.emit(); self.selection_changed.emit()
+        return True
+
+    def flags(self, index): return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsUserCheckable
+
+    def append_store(self, batch):
+        if not len(batch): return
+        n = len(self.store)
+        self.beginInsertRows(QModelIndex(), n, n + len(batch) - 1)
+        self.store.extend(batch); self.checked.extend(b'\x01' * len(batch)); self.have.extend(bytes(len(batch))); self.search.extend(self.store, n)
+        self.selected_count += len(batch); self.selected_bytes += sum(batch.sizes)
+        self.endInsertRows(); self.selection_changed.emit()
+
+    def clear(self):
+        self.beginResetModel(); self.store = type(self.store)(); self.search = type(self.search)(); self.checked = bytearray(); self.priorities = {}; self.have = bytearray(); self.have_count = self.have_bytes = 0
+        self.selected_count = self.selected_bytes = 0
+        self.endResetModel(); self.selection_changed.emit()
+
+    def remove_msg_ids(self, msg_ids):
+        gone = set(msg_ids)
+        keep = [i for i, m in enumerate(self.store.msg_ids) if m not in gone]
+        if len(keep) == len(self.store): return
+        remap = {old: new for new, old in enumerate(keep)}
+        self.beginResetModel(); self.store = self.store.subset(keep); self.search = type(self.search)(self.store); self.checked = bytearray(self.checked[i] for i in keep); self.have = bytearray(self.have[i] for i in keep)
+        self.have_count = self.have.count(1); self.have_bytes = sum(compress(self.store.sizes, self.have))
+        self.selected_count = self.checked.count(1); self.selected_bytes = sum(compress(self.store.sizes, self.checked))
+        self.priorities = {remap[r]: p for r, p in self.priorities.items() if r in remap}; self.endResetModel(); self.selection_changed.emit()
+
+    def mark_have(self, start: int, flags):
+        """Registry answers for rows start.. (one bool per row)"""
+        for row, flag in enumerate(flags, start):
+            if flag and not self.have[row]: self.have[row] = 1; self.have_count += 1; self.have_bytes += self.store.sizes[row]
+        if flags: self.repaint_needed.emit(); self.selection_changed.emit()
+
+    def set_priority(self, rows, priority: int):
+        for r in rows:
+            if priority: self.priorities[r] = priority
+            else: self.priorities.pop(r, None)
+        self.repaint_needed.emit()
+
+    def set_all_checked(self, c: bool):
+        if not len(self.store): return
+        self.checked[:] = (b'\x01' if c else b'\x00') * len(self.store)
+        self.selected_count, self.selected_bytes = (len(self.store), sum(self.store.sizes)) if c else (0, 0)
+        self.repaint_needed.emit(); self.selection_changed.emit()
+
+    def set_rows_checked(self, rows, c: bool):
+        """Check / uncheck many rows (sorted) - e.g. everything the filter shows - with one notification"""
+        if not len(rows): return
+        checked, sizes, flag = self.checked, self.store.sizes, int(c)
+        changed = [r for r in rows if checked[r] != flag]
+        for r in changed: checked[r] = flag
+        sign = 1 if c else -1
+        self.selected_count += sign * len(changed); self.selected_bytes += sign * sum(sizes[r] for r in changed)
+        self.repaint_needed.emit(); self.selection_changed.emit()
+
+    def checked_count(self) -> int: return self.selected_count
+    def checked_indices(self) -> List[int]: return list(compress(range(len(self.checked)), self.checked))
+
+class MediaFilterProxy(QAbstractProxyModel):
+    """The rows matching the type filter and search, as a sorted array of source rows.
+
+    Matching comes from the model's SearchIndex, so no per-row Python callback runs when the
+    filter changes; with no filter the mapping is the identity and costs nothing.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.types, self.search = None, ""
+        self.rows = None  # source rows shown, or None = all of them
+        self.count = 0  # rows shown, cached: index() runs for every row on each view layout
+
+    def setSourceModel(self, model):
+        self.beginResetModel(); super().setSourceModel(model)
+        model.modelAboutToBeReset.connect(self.beginResetModel); model.modelReset.connect(self.source_reset)
+        model.rowsAboutToBeInserted.connect(self.source_rows_about_to_be_inserted); model.rowsInserted.connect(self.source_rows_inserted)
+        model.dataChanged.connect(self.source_data_changed)
+        self.source_reset()
+
+    def set_filter(self, types, search):
+        from core.media_store import TYPE_CODES
+        self.beginResetModel()
+        self.types = None if types is None else {TYPE_CODES[t] for t in types}
+        self.search = search; self.refilter()
+        self.endResetModel()
+
+    def refilter(self):
+        active = self.types is not None or self.search
+        self.rows = self.sourceModel().search.query(self.types, self.search) if active else None
+        self.count = len(self.sourceModel().store) if self.rows is None else len(self.rows)
+
+    def source_reset(self): self.refilter(); self.endResetModel()
+
+    def source_rows_about_to_be_inserted(self, parent, first, last):
+        if self.rows is None: self.beginInsertRows(QModelIndex(), first, last)
+
+    def source_rows_inserted(self, parent, first, last):
+        if self.rows is None: self.count = len(self.sourceModel().store); self.endInsertRows(); return
+        new = self.sourceModel().search.query(self.types, self.search, start=first)  # appended rows sort after every shown row
+        if not new: return
+        n = len(self.rows)
+        self.beginInsertRows(QModelIndex(), n, n + len(new) - 1); self.rows.extend(new); self.count = len(self.rows); self.endInsertRows()
+
+    def source_data_changed(self, top_left, bottom_right, roles):
+        if self.rows is None: lo, hi = top_left.row(), bottom_right.row()
+        else: lo, hi = bisect_left(self.rows, top_left.row()), bisect_right(self.rows, bottom_right.row()) - 1
+        if lo <= hi: self.dataChanged.emit(self.index(lo, 0), self.index(hi, 0), roles)
+
+    def rowCount(self, parent=QModelIndex()): return 0 if parent.isValid() else self.count
+    def columnCount(self, parent=QModelIndex()): return 0 if parent.isValid() else 1
+    def index(self, row, column, parent=QModelIndex()): return self.createIndex(row, column) if 0 <= row < self.count and column == 0 else QModelIndex()
+    def parent(self, index=QModelIndex()): return QModelIndex()
+
+    def mapToSource(self, index):
+        if not index.isValid(): return QModelIndex()
+        return self.sourceModel().index(index.row() if self.rows is None else self.rows[index.row()], 0)
+
+    def mapFromSource(self, index):
+        if not index.isValid(): return QModelIndex()
+        if self.rows is None: return self.index(index.row(), 0)
+        pos = bisect_left(self.rows, index.row())
+        return self.index(pos, 0) if pos < len(self.rows) and self.rows[pos] == index.row() else QModelIndex()
+
+class MediaItemDelegate(QStyledItemDelegate):
+    """Paints a media card per row - no widgets are created per item"""
+    ROW_HEIGHT = 64
+
+    def __init__(self, is_dark=False, thumbnails: Optional[ThumbnailLoader] = None, parent=None):
+        super().__init__(parent)
+        self.is_dark, self.thumbnails = is_dark, thumbnails
+        self.name_font = QFont("Arial", 10, QFont.Weight.Bold); self.meta_font = QFont("Arial", 8); self.icon_font = QFont("Arial", 16)
+
+    def sizeHint(self, option, index): return QSize(option.rect.width(), self.ROW_HEIGHT)
+
+    def check_rect(self, rect): return QRect(rect.left() + 14, rect.center().y() - 9, 18, 18)
+
+    def paint(self, painter, option, index):
+        painter.save(); painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        r = option.rect.adjusted(2, 3, -2, -3)
+        hover = bool(option.state & QStyle.StateFlag.State_MouseOver)
+        bg = ("#2d2d2d" if hover else "#1e1e1e") if self.is_dark else ("#f1f3f5" if hover else "white")
+        border = "#0088cc" if hover else ("#333" if self.is_dark else "#e9ecef")
+        painter.setPen(QColor(border)); painter.setBrush(QColor(bg)); painter.drawRoundedRect(r, 10, 10)
         
-        icon_map = {'photo': '📷', 'image': '🖼️', 'video': '🎬', 'document': '📄', 'archive': '📦', 'file': '📎'}
-        self.icon_lab = QLabel(icon_map.get(self.item['type'], '📎')); self.icon_lab.setFont(QFont("Arial", 16)); layout.addWidget(self.icon_lab)
+        vis = lambda rect: QStyle.visualRect(option.direction, r, rect)  # mirror for Hebrew (RTL) layouts
+        align = QStyle.visualAlignment(option.direction, Qt.AlignmentFlag.AlignLeft) | Qt.AlignmentFlag.AlignVCenter
+        cb = QStyleOptionButton(); cb.rect = vis(self.check_rect(r)); cb.state = QStyle.StateFlag.State_Enabled
+        cb.state |= QStyle.StateFlag.State_On if index.data(Qt.ItemDataRole.CheckStateRole) == Qt.CheckState.Checked else QStyle.StateFlag.State_Off
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawPrimitive(QStyle.PrimitiveElement.PE_IndicatorCheckBox, cb, painter, option.widget)
         
-        info_l = QVBoxLayout(); name_lab = QLabel(self.item['name']); name_lab.setStyleSheet(f"font-weight: bold; color: {'#fff' if self.is_dark else '#343a40'};"); info_l.addWidget(name_lab)
-        meta_l = QHBoxLayout(); size_lab = QLabel(humanize.naturalsize(self.item['size'])); size_lab.setStyleSheet("color: #6c757d; font-size: 11px;"); meta_l.addWidget(size_lab)
-        date_lab = QLabel(self.item['date'].strftime("%d/%m/%Y")); date_lab.setStyleSheet("color: #888; font-size: 11px;"); meta_l.addWidget(date_lab); meta_l.addStretch(); info_l.addLayout(meta_l)
-        layout.addLayout(info_l, 1)
-
-    def is_checked(self): return self.checkbox.isChecked()
-    def set_checked(self, c): self.checkbox.setChecked(c)
+        key = index.data(MediaListModel.ThumbRole) if self.thumbnails else None
+        pixmap = self.thumbnails.get(key, lambda: index.data(MediaListModel.ThumbRequestRole)) if key else None
+        if pixmap is not None: painter.drawPixmap(vis(QRect(r.left() + 40, r.center().y() - 24, 48, 48)), pixmap)
+        else: painter.setFont(self.icon_font); painter.drawText(vis(QRect(r.left() + 40, r.top(), 48, r.height())), Qt.AlignmentFlag.AlignCenter, index.data(Qt.ItemDataRole.DecorationRole))
+        text_x = r.left() + 98; text_w = r.width() - 108
+        painter.setFont(self.name_font); painter.setPen(QColor('#fff' if self.is_dark else '#343a40'))
+        name = QFontMetrics(self.name_font).elidedText(index.data(Qt.ItemDataRole.DisplayRole), Qt.TextElideMode.ElideMiddle, text_w)
+        painter.drawText(vis(QRect(text_x, r.top() + 8, text_w, 22)), align, name)
+        painter.setFont(self.meta_font); painter.setPen(QColor("#6c757d"))
+        meta = f"{naturalsize(index.data(MediaListModel.SizeRole))}    {index.data(MediaListModel.DateRole).strftime('%d/%m/%Y')}"
+        if index.data(MediaListModel.HaveRole): meta += f"    {tr('already_have_badge')}"
+        painter.drawText(vis(QRect(text_x, r.top() + 30, text_w, 20)), align, meta)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        # Click anywhere on the card (or press space) toggles it, like the old checkbox rows
+        toggle = (event.type() == QEvent.Type.MouseButtonRelease and event.button() == Qt.MouseButton.LeftButton) or \
+                 (event.type() == QEvent.Type.KeyPress and event.key() == Qt.Key.Key_Space)
+        if not toggle: return False
+        checked = index.data(Qt.ItemDataRole.CheckStateRole) == Qt.CheckState.Checked
+        return model.setData(index, Qt.CheckState.Unchecked if checked else Qt.CheckState.Checked, Qt.ItemDataRole.CheckStateRole)
+
+class QueueDialog(QDialog):
+    """The job queue: chats to mirror with their filter rules, per-job progress, pause / resume, and the limits all jobs share"""
+    TYPE_FILTERS = (("filter_all", None), ("filter_photos", ["photo", "image"]), ("filter_videos", ["video"]), ("filter_documents", ["document"]), ("filter_archives", ["archive"]))
+
+    def __init__(self, job: QueueJob, settings: QSettings, parent=None):
+        super().__init__(parent)
+        self.job, self.settings = job, settings
+        self.rows: Dict[int, int] = {}  # job id -> table row
+        self.removed = set()  # updates already on their way when a job is removed are dropped
+        self.setWindowTitle(tr("queue_title")); self.resize(980, 560); self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        l = QVBoxLayout(self)
+        add_l = QHBoxLayout(); self.chat_in = QLineEdit(); self.chat_in.setPlaceholderText(tr("scan_group_placeholder")); add_l.addWidget(self.chat_in, 2)
+        self.type_cb = QComboBox()
+        for key, types in self.TYPE_FILTERS: self.type_cb.addItem(tr(key), types)
+        add_l.addWidget(self.type_cb); self.search_in = QLineEdit(); self.search_in.setPlaceholderText(tr("queue_search")); add_l.addWidget(self.search_in, 1)
+        add_l.addWidget(QLabel(tr("queue_min_size"))); self.min_spin = self.size_spin(); add_l.addWidget(self.min_spin); add_l.addWidget(QLabel(tr("queue_max_size"))); self.max_spin = self.size_spin(); add_l.addWidget(self.max_spin); l.addLayout(add_l)
+        dest_l = QHBoxLayout(); self.dest_in = QLineEdit(); self.dest_in.setPlaceholderText(f"{tr('queue_default_dest')}: {DEFAULTS['download_path']}"); dest_l.addWidget(self.dest_in)
+        bb = QPushButton(tr("btn_browse")); bb.clicked.connect(self.browse_dest); dest_l.addWidget(bb); ab = QPushButton(tr("queue_add")); ab.setObjectName("primaryBtn"); ab.clicked.connect(self.add_job); dest_l.addWidget(ab); l.addLayout(dest_l)
+        self.table = QTableWidget(0, 4); self.table.setHorizontalHeaderLabels([tr("queue_col_chat"), tr("queue_col_rules"), tr("queue_col_state"), tr("queue_col_progress")])
+        self.table.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.Stretch); self.table.verticalHeader().setVisible(False); self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows); l.addWidget(self.table)
+        bl = QHBoxLayout()
+        for key, slot in (("queue_pause", lambda: self.for_selected(self.job.runner.pause)), ("queue_resume", lambda: self.for_selected(self.job.runner.resume)), ("queue_remove", self.remove_selected)):
+            b = QPushButton(tr(key)); b.clicked.connect(slot); bl.addWidget(b)
+        bl.addStretch(); l.addLayout(bl)
+        gb = QGroupBox(tr("queue_limits")); gl = QHBoxLayout(gb); self.limit_spins = []
+        for key, label, top, suffix in (('queue_scans', "queue_scans", 16, ""), ('queue_downloads', "queue_downloads", 16, ""), ('queue_transfers', "queue_transfers", 256, ""), ('queue_bandwidth_kb', "queue_bandwidth", 1000000, " KB/s")):
+            sp = QSpinBox(); sp.setRange(1, top); sp.setSuffix(suffix); sp.setValue(int(self.settings.value(key, DEFAULTS[key])))
+            if key in ('queue_transfers', 'queue_bandwidth_kb'): sp.setMinimum(0); sp.setSpecialValueText(tr("queue_unlimited")); sp.setValue(int(self.settings.value(key, DEFAULTS[key])))
+            sp.valueChanged.connect(self.apply_limits); gl.addWidget(QLabel(tr(label))); gl.addWidget(sp); self.limit_spins.append((key, sp))
+        gl.addStretch(); l.addWidget(gb)
+        self.job.job_updated.connect(self.update_job); self.job.call(self.job.runner.notify_all)
+
+    def size_spin(self):
+        sp = QSpinBox(); sp.setRange(0, 1000000); sp.setSuffix(" MB"); sp.setSpecialValueText(tr("queue_any_size")); return sp
+
+    def browse_dest(self):
+        path = QFileDialog.getExistingDirectory(self, tr("dialog_select_folder"))
+        if path: self.dest_in.setText(path)
+
+    def add_job(self):
+        chat = self.chat_in.text().strip()
+        if not chat: return QMessageBox.warning(self, tr("error"), tr("error_no_group"))
+        self.job.call(self.job.runner.add, chat, dest=self.dest_in.text().strip() or None, types=self.type_cb.currentData(), search=self.search_in.text().strip(),
+                      min_size=self.min_spin.value() * 2**20, max_size=self.max_spin.value() * 2**20)
+        self.chat_in.clear()
+
+    def selected_ids(self) -> List[int]: return [job_id for job_id, row in self.rows.items() if self.table.item(row, 0).isSelected()]
+
+    def for_selected(self, method):
+        for job_id in self.selected_ids(): self.job.call(method, job_id)
+
+    def remove_selected(self):
+        for job_id in sorted(self.selected_ids(), key=self.rows.get, reverse=True): self.job.call(self.job.runner.remove, job_id); self.removed.add(job_id); self.table.removeRow(self.rows.pop(job_id))
+        self.rows = {job_id: row for row, job_id in enumerate(sorted(self.rows, key=self.rows.get))}
+
+    def apply_limits(self):
+        values = {key: sp.value() for key, sp in self.limit_spins}
+        for key, value in values.items(): self.settings.setValue(key, value)
+        self.job.call(self.job.runner.configure, values['queue_scans'], values['queue_downloads'], values['queue_transfers'], values['queue_bandwidth_kb'])
+
+    def update_job(self, job):
+        if job['id'] in self.removed: return
+        row = self.rows.get(job['id'])
+        if row is None:
+            row = self.rows[job['id']] = self.table.rowCount(); self.table.insertRow(row)
+            rules = job['rules']; sizes = f"{rules['min_size'] >> 20}-{rules['max_size'] >> 20 or '∞'} MB" if rules['min_size'] or rules['max_size'] else ""
+            self.table.setItem(row, 0, QTableWidgetItem(f"#{job['id']} {job['chat']}")); self.table.setItem(row, 1, QTableWidgetItem(" • ".join(filter(None, [",".join(rules['types'] or []), rules['search'] and f"“{rules['search']}”", sizes]))))
+            self.table.setItem(row, 2, QTableWidgetItem()); bar = QProgressBar(); bar.setTextVisible(True); self.table.setCellWidget(row, 3, bar)
+        self.table.item(row, 2).setText(tr(f"queue_state_{job['state']}"))
+        bar, p, result = self.table.cellWidget(row, 3), job['progress'], job['result']
+        if job['state'] == 'scanning' and 'seen' in p: bar.setValue(int(p['seen'] * 100 / p['total']) if p['total'] else 0); bar.setFormat(tr("queue_scan_progress", seen=p['seen'], found=p['found']))
+        elif job['state'] == 'waiting': bar.setValue(0); bar.setFormat(tr("queue_selected", selected=p.get('selected', 0), found=p.get('found', 0)))
+        elif job['state'] == 'downloading' and 'percent' in p:
+            bar.setValue(p['percent']); bar.setFormat(f"{p['percent']}% • {tr('download_progress', current=p['files_done'], total=p['total_files'])} • {naturalsize(p['speed'])}/s • {format_eta(p['eta'])}")
+        elif job['state'] == 'failed': bar.setValue(0); bar.setFormat(job['error'] or "")
+        elif result and job['state'] in ('done', 'paused'):
+            bar.setValue(100 if job['state'] == 'done' else bar.value()); bar.setFormat(tr('download_stats', downloaded=result['downloaded'], failed=result['failed']))
+        elif job['state'] == 'queued': bar.setValue(0); bar.setFormat("")
 
 class ModernWindow(QMainWindow):
+    SCAN_TYPES = QueueDialog.TYPE_FILTERS
+
     def __init__(self):
         super().__init__()
         self.settings = QSettings('AvielAI', 'TelegramDownloaderUltimate')
         self.translator = get_translator()
         self.is_dark = self.settings.value('theme', 'light') == 'dark'
         self.translator.set_language(self.settings.value('language', 'he'))
+        self.service = None  # one connection for the whole session, shared by auth, scans and downloads - started after the first paint
+        self.registry = None  # content registry, opened on the first scan results (the GUI thread's own connection)
+        self.thumbnails = ThumbnailLoader(lambda: self.service, self)
+        self.queue_job = None  # job queue runner, started on first use or when saved jobs are waiting
+        self.tray = None  # tray icon for notifications, created on the first one
+        self.file_config = None  # (config.json mtime, load_config()) - read again only when the file changes
         self.init_ui()
     
     def init_ui(self):
@@ -271,6 +606,7 @@ class ModernWindow(QMainWindow):
         header = QFrame(); header.setFixedHeight(70); header.setStyleSheet(f"background-color: {'#1e1e1e' if self.is_dark else 'white'}; border-bottom: 1px solid {'#333' if self.is_dark else '#dee2e6'};")
         h_l = QHBoxLayout(header); h_l.addWidget(QLabel(f"⚡ {tr('app_name')} <span style='color: #0088cc;'>ULTIMATE</span>", font=QFont("Arial", 18, QFont.Weight.Bold))); h_l.addStretch()
         
+        self.queue_btn = QPushButton("📋"); self.queue_btn.setFixedSize(40, 40); self.queue_btn.setToolTip(tr("menu_queue")); self.queue_btn.clicked.connect(self.show_queue); h_l.addWidget(self.queue_btn)
         self.theme_btn = QPushButton("🌙" if not self.is_dark else "☀️"); self.theme_btn.setFixedSize(40, 40); self.theme_btn.clicked.connect(self.toggle_theme); h_l.addWidget(self.theme_btn)
         self.menu_btn = QPushButton("⚙️"); self.menu_btn.setFixedSize(40, 40); self.menu_btn.clicked.connect(self.show_settings_menu); h_l.addWidget(self.menu_btn)
         self.main_l.addWidget(header)
@@ -278,14 +614,60 @@ class ModernWindow(QMainWindow):
         self.steps_w = self.create_steps_indicator(); self.main_l.addWidget(self.steps_w)
         self.stack = QStackedWidget(); self.main_l.addWidget(self.stack)
         
-        self.stack.addWidget(self.create_setup_page())
-        self.stack.addWidget(self.create_scan_page())
-        self.stack.addWidget(self.create_select_page())
-        self.stack.addWidget(self.create_download_page())
+        # Pages are built on first navigation - only the one shown at startup is created here
+        self.page_builders = [self.create_setup_page, self.create_scan_page, self.create_select_page, self.create_download_page]
+        self.pages_built = set()
+        for _ in self.page_builders: self.stack.addWidget(QWidget())
         
-        if self.settings.value('api_id'): self.init_telegram_client(); self.show_scan_page()
+        if self.settings.value('api_id'): self.show_scan_page()
         else: self.show_setup_page()
 
+    def ensure_page(self, i: int):
+        if i in self.pages_built: return
+        self.pages_built.add(i)
+        placeholder, page = self.stack.widget(i), self.page_builders[i]()
+        current = self.stack.currentIndex()
+        self.stack.removeWidget(placeholder); self.stack.insertWidget(i, page); placeholder.deleteLater()
+        self.stack.setCurrentIndex(current)
+
+    def start_services(self):
+        """Everything that can wait until the window is on screen"""
+        if self.settings.value('api_id'): self.init_telegram_client()
+
+    def ensure_service(self):
+        if self.service is None:
+            from core.client_service import ClientService
+            self.service = ClientService()
+            config = self.engine_config()
+            self.service.use_accounts = config['extra_accounts']; self.service.enable_metrics(config)
+        return self.service
+
+    def engine_config(self) -> dict:
+        """Core settings for jobs run outside the wizard (the job queue), from the same QSettings the pages save - config.json adds the engine-only ones"""
+        try: stamp = CONFIG_PATH.stat().st_mtime_ns
+        except OSError: stamp = None
+        if self.file_config is None or self.file_config[0] != stamp:  # a bad file is reported once, not on every job
+            try: loaded = load_config()  # engine-only keys (extra_accounts, postprocess, metrics...) from config.json or TGDL_*
+            except ValueError as e: loaded = dict(DEFAULTS); QMessageBox.warning(self, tr("error"), tr("error_config", error=e))
+            self.file_config = (stamp, loaded)
+        config = dict(self.file_config[1])
+        config['session'] = str(Path.home() / '.telegram_downloader' / 'session')
+        for key in ('concurrency_min', 'concurrency_max', 'split_threshold_mb', 'split_connections', 'queue_scans', 'queue_downloads', 'queue_transfers', 'queue_bandwidth_kb'):
+            config[key] = int(self.settings.value(key, DEFAULTS[key]))
+        for key in ('use_index', 'verify_deleted'): config[key] = self.settings.value(key, 'true' if DEFAULTS[key] else 'false') == 'true'
+        config.update(download_order=self.settings.value('download_order', DEFAULTS['download_order']), link_mode=self.settings.value('link_mode', DEFAULTS['link_mode']))
+        return config
+
+    def ensure_queue(self) -> QueueJob:
+        if self.queue_job is None:
+            self.queue_job = QueueJob(self.engine_config()); self.queue_job.error.connect(lambda e: QMessageBox.critical(self, tr("error"), f"{tr('error_connection', error=e)}"))
+            self.queue_job.start(self.ensure_service())
+        return self.queue_job
+
+    def show_queue(self):
+        if not self.settings.value('api_id'): return self.show_setup_page()
+        QueueDialog(self.ensure_queue(), self.settings, self).show()
+
     def toggle_theme(self):
         self.is_dark = not self.is_dark
         self.settings.setValue('theme', 'dark' if self.is_dark else 'light')
@@ -295,6 +677,7 @@ class ModernWindow(QMainWindow):
         menu = QMenu(self); lang_m = menu.addMenu(tr("menu_language"))
         for c, n in self.translator.get_available_languages().items():
             a = lang_m.addAction(n); a.triggered.connect(lambda checked, code=c: self.change_lang(code))
+        menu.addAction(tr("menu_queue"), self.show_queue)
         menu.addSeparator(); menu.addAction("Logout", self.logout); menu.addAction(tr("menu_about"), self.show_about)
         menu.exec(self.menu_btn.mapToGlobal(self.menu_btn.rect().bottomLeft()))
 
@@ -324,7 +707,7 @@ class ModernWindow(QMainWindow):
         cl.addWidget(QLabel("🔐", font=QFont("Arial", 40), alignment=Qt.AlignmentFlag.AlignCenter))
         cl.addWidget(QLabel(tr("setup_title"), font=QFont("Arial", 18, QFont.Weight.Bold), alignment=Qt.AlignmentFlag.AlignCenter))
         cl.addWidget(QLabel(tr("setup_instructions"), wordWrap=True, alignment=Qt.AlignmentFlag.AlignCenter))
-        ob = QPushButton(tr("btn_open_telegram")); ob.setObjectName("primaryBtn"); ob.clicked.connect(lambda: webbrowser.open('https://my.telegram.org/apps')); cl.addWidget(ob)
+        ob = QPushButton(tr("btn_open_telegram")); ob.setObjectName("primaryBtn"); ob.clicked.connect(self.open_api_site); cl.addWidget(ob)
         form = QFormLayout(); self.aid_in = QLineEdit(self.settings.value('api_id', '')); self.ah_in = QLineEdit(self.settings.value('api_hash', '')); self.ph_in = QLineEdit(self.settings.value('phone', ''))
         form.addRow(tr("label_api_id"), self.aid_in); form.addRow(tr("label_api_hash"), self.ah_in); form.addRow(tr("label_phone"), self.ph_in); cl.addLayout(form)
         sb = QPushButton(tr("btn_save_continue")); sb.setObjectName("successBtn"); sb.setFixedHeight(50); sb.clicked.connect(self.save_and_continue); cl.addWidget(sb); l.addWidget(card)
@@ -334,7 +717,12 @@ class ModernWindow(QMainWindow):
         p = QWidget(); l = QVBoxLayout(p); l.setContentsMargins(100, 50, 100, 50); l.setSpacing(20)
         l.addWidget(QLabel(tr("scan_title"), font=QFont("Arial", 20, QFont.Weight.Bold)))
         gb = QGroupBox(tr("scan_group_label")); gl = QVBoxLayout(gb); self.group_in = QLineEdit(); self.group_in.setPlaceholderText(tr("scan_group_placeholder")); self.group_in.setFixedHeight(50); gl.addWidget(self.group_in); l.addWidget(gb)
-        ob = QGroupBox(tr("scan_options")); ol = QHBoxLayout(ob); ol.addWidget(QLabel(tr("scan_max_messages"))); self.max_spin = QSpinBox(); self.max_spin.setRange(10, 200000); self.max_spin.setValue(1000); ol.addWidget(self.max_spin); l.addWidget(ob)
+        ob = QGroupBox(tr("scan_options")); ol = QHBoxLayout(ob); ol.addWidget(QLabel(tr("scan_max_messages"))); self.max_spin = QSpinBox(); self.max_spin.setRange(10, 200000); self.max_spin.setValue(1000); ol.addWidget(self.max_spin)
+        self.index_cb = QCheckBox(tr("scan_use_index")); self.index_cb.setChecked(self.settings.value('use_index', 'true' if DEFAULTS['use_index'] else 'false') == 'true'); ol.addWidget(self.index_cb)
+        self.verify_cb = QCheckBox(tr("scan_verify_deleted")); self.verify_cb.setChecked(self.settings.value('verify_deleted', 'true' if DEFAULTS['verify_deleted'] else 'false') == 'true'); ol.addWidget(self.verify_cb)
+        ol.addWidget(QLabel(tr("scan_media_types"))); self.scan_types_cb = QComboBox()  # narrower scans read through Telegram's search filters
+        for key, types in self.SCAN_TYPES: self.scan_types_cb.addItem(tr(key), types)
+        self.scan_types_cb.setCurrentIndex(next((i for i, (key, _) in enumerate(self.SCAN_TYPES) if key == self.settings.value('scan_types', 'filter_all')), 0)); ol.addWidget(self.scan_types_cb); l.addWidget(ob)
         self.scan_st = QLabel(""); self.scan_st.setAlignment(Qt.AlignmentFlag.AlignCenter); l.addWidget(self.scan_st)
         self.scan_pr = QProgressBar(); self.scan_pr.setVisible(False); l.addWidget(self.scan_pr)
         self.scan_btn = QPushButton(tr("btn_start_scan")); self.scan_btn.setObjectName("primaryBtn"); self.scan_btn.setFixedHeight(60); self.scan_btn.clicked.connect(self.start_scan); l.addWidget(self.scan_btn)
@@ -344,14 +732,38 @@ class ModernWindow(QMainWindow):
     def create_select_page(self):
         p = QWidget(); l = QVBoxLayout(p); l.setContentsMargins(30, 20, 30, 20)
         h = QHBoxLayout(); h.addWidget(QLabel(tr("select_title"), font=QFont("Arial", 18, QFont.Weight.Bold))); h.addStretch()
-        sa = QPushButton(tr("btn_select_all")); sa.clicked.connect(self.select_all); h.addWidget(sa); sn = QPushButton(tr("btn_select_none")); sn.clicked.connect(self.select_none); h.addWidget(sn); l.addLayout(h)
+        self.sel_all_b = QPushButton(tr("btn_select_all")); self.sel_all_b.clicked.connect(self.select_all); h.addWidget(self.sel_all_b)
+        self.sel_none_b = QPushButton(tr("btn_select_none")); self.sel_none_b.clicked.connect(self.select_none); h.addWidget(self.sel_none_b); l.addLayout(h)
         
         fl = QHBoxLayout(); fl.addWidget(QLabel(tr("filter_label"))); self.filter_cb = QComboBox(); self.filter_cb.addItems([tr("filter_all"), tr("filter_photos"), tr("filter_videos"), tr("filter_documents"), tr("filter_archives")]); self.filter_cb.currentTextChanged.connect(self.apply_filter); fl.addWidget(self.filter_cb)
-        self.search_in = QLineEdit(); self.search_in.setPlaceholderText(tr("search_placeholder")); self.search_in.textChanged.connect(self.apply_filter); fl.addWidget(self.search_in)
+        self.search_in = QLineEdit(); self.search_in.setPlaceholderText(tr("search_placeholder")); fl.addWidget(self.search_in)
+        self.search_timer = QTimer(self.search_in); self.search_timer.setSingleShot(True); self.search_timer.setInterval(150); self.search_timer.timeout.connect(self.apply_filter)
+        self.search_in.textChanged.connect(lambda _: self.search_timer.start())  # one filter pass when typing pauses, not one per key
         self.sel_lab = QLabel(tr("selected_count", count=0)); self.sel_lab.setStyleSheet("font-weight: bold; color: #0088cc;"); fl.addWidget(self.sel_lab); l.addLayout(fl)
+        self.sel_scan_w = QWidget(); sl = QHBoxLayout(self.sel_scan_w); sl.setContentsMargins(0, 0, 0, 0); self.sel_scan_st = QLabel(""); sl.addWidget(self.sel_scan_st); self.sel_scan_pr = QProgressBar(); sl.addWidget(self.sel_scan_pr, 1)
+        ss = QPushButton(tr("btn_stop_scan")); ss.setObjectName("dangerBtn"); ss.clicked.connect(self.stop_scan); sl.addWidget(ss); self.sel_scan_w.setVisible(False); l.addWidget(self.sel_scan_w)
         
-        self.scroll = QScrollArea(); self.scroll.setWidgetResizable(True); self.cont = QWidget(); self.files_l = QVBoxLayout(self.cont); self.files_l.setSpacing(8); self.scroll.setWidget(self.cont); l.addWidget(self.scroll)
-        path_l = QHBoxLayout(); path_l.addWidget(QLabel(tr("download_path_label"))); self.path_in = QLineEdit(str(Path.home() / "Downloads" / "Telegram")); path_l.addWidget(self.path_in); bb = QPushButton(tr("btn_browse")); bb.clicked.connect(self.browse_path); path_l.addWidget(bb); l.addWidget(QLabel(f"{tr('menu_settings')}: Parallel Downloads (3)")); l.addLayout(path_l)
+        if not hasattr(self, 'media_model'):  # survives init_ui rebuilds (theme/language) so results are kept
+            self.media_model = MediaListModel(); self.media_model.selection_changed.connect(self.update_selected_count)
+        self.media_proxy = MediaFilterProxy(); self.media_proxy.setSourceModel(self.media_model)
+        self.files_v = QListView(); self.files_v.setModel(self.media_proxy); self.files_v.setItemDelegate(MediaItemDelegate(self.is_dark, self.thumbnails, self.files_v))
+        self.thumbnails.updated.connect(self.files_v.viewport().update); self.media_model.repaint_needed.connect(self.files_v.viewport().update)
+        self.files_v.setUniformItemSizes(True); self.files_v.setMouseTracking(True); self.files_v.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.files_v.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection); self.files_v.setStyleSheet("QListView { border: none; background: transparent; }"); l.addWidget(self.files_v)
+        self.files_v.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu); self.files_v.customContextMenuRequested.connect(self.show_item_menu)
+        path_l = QHBoxLayout(); path_l.addWidget(QLabel(tr("download_path_label"))); self.path_in = QLineEdit(str(Path.home() / "Downloads" / "Telegram")); path_l.addWidget(self.path_in); bb = QPushButton(tr("btn_browse")); bb.clicked.connect(self.browse_path); path_l.addWidget(bb); par_l = QHBoxLayout(); par_l.addWidget(QLabel(tr("parallel_label"))); par_l.addWidget(QLabel(tr("parallel_min")))
+        self.min_conc_spin = QSpinBox(); self.min_conc_spin.setRange(1, 64); self.min_conc_spin.setValue(int(self.settings.value('concurrency_min', DEFAULTS['concurrency_min']))); par_l.addWidget(self.min_conc_spin)
+        par_l.addWidget(QLabel(tr("parallel_max"))); self.max_conc_spin = QSpinBox(); self.max_conc_spin.setRange(1, 64); self.max_conc_spin.setValue(int(self.settings.value('concurrency_max', DEFAULTS['concurrency_max']))); par_l.addWidget(self.max_conc_spin)
+        self.min_conc_spin.valueChanged.connect(lambda v: self.max_conc_spin.setValue(max(v, self.max_conc_spin.value()))); self.max_conc_spin.valueChanged.connect(lambda v: self.min_conc_spin.setValue(min(v, self.min_conc_spin.value())))
+        par_l.addSpacing(20); par_l.addWidget(QLabel(tr("order_label"))); self.order_cb = QComboBox()
+        for policy in POLICIES: self.order_cb.addItem(tr(f"order_{policy}"), policy)
+        self.order_cb.setCurrentIndex(max(0, self.order_cb.findData(self.settings.value('download_order', DEFAULTS['download_order'])))); par_l.addWidget(self.order_cb)
+        par_l.addStretch(); l.addLayout(par_l)
+        seg_l = QHBoxLayout(); seg_l.addWidget(QLabel(tr("split_threshold_label"))); self.split_spin = QSpinBox(); self.split_spin.setRange(1, 4096); self.split_spin.setSuffix(" MB"); self.split_spin.setValue(int(self.settings.value('split_threshold_mb', DEFAULTS['split_threshold_mb']))); seg_l.addWidget(self.split_spin)
+        seg_l.addWidget(QLabel(tr("split_connections_label"))); self.conn_spin = QSpinBox(); self.conn_spin.setRange(1, 16); self.conn_spin.setValue(int(self.settings.value('split_connections', DEFAULTS['split_connections']))); seg_l.addWidget(self.conn_spin)
+        seg_l.addSpacing(20); seg_l.addWidget(QLabel(tr("link_mode_label"))); self.link_cb = QComboBox()
+        for mode in LINK_MODES: self.link_cb.addItem(tr(f"link_{mode}"), mode)
+        self.link_cb.setCurrentIndex(max(0, self.link_cb.findData(self.settings.value('link_mode', DEFAULTS['link_mode'])))); seg_l.addWidget(self.link_cb); seg_l.addStretch(); l.addLayout(seg_l); l.addLayout(path_l)
         bl = QHBoxLayout(); back = QPushButton(tr("btn_back")); back.setFixedWidth(120); back.clicked.connect(self.show_scan_page); bl.addWidget(back); self.dl_btn = QPushButton(tr("btn_download_selected")); self.dl_btn.setObjectName("successBtn"); self.dl_btn.setFixedHeight(55); self.dl_btn.clicked.connect(self.start_download); bl.addWidget(self.dl_btn, 1); l.addLayout(bl)
         return p
 
@@ -367,10 +779,14 @@ class ModernWindow(QMainWindow):
         self.open_f_b = QPushButton(tr("btn_open_folder")); self.open_f_b.setObjectName("successBtn"); self.open_f_b.setFixedSize(180, 50); self.open_f_b.setVisible(False); self.open_f_b.clicked.connect(self.open_folder); done_l.addWidget(self.open_f_b); l.addLayout(done_l)
         return p
 
-    def show_setup_page(self): self.stack.setCurrentIndex(0); self.update_progress_step(1)
-    def show_scan_page(self): self.stack.setCurrentIndex(1); self.update_progress_step(2)
-    def show_select_page(self): self.stack.setCurrentIndex(2); self.update_progress_step(3)
-    def show_download_page(self): self.stack.setCurrentIndex(3); self.update_progress_step(4)
+    def show_page(self, i: int): self.ensure_page(i); self.stack.setCurrentIndex(i); self.update_progress_step(i + 1)
+    def show_setup_page(self): self.show_page(0)
+    def show_scan_page(self): self.show_page(1)
+    def show_select_page(self): self.show_page(2); self.update_selected_count()
+    def show_download_page(self): self.show_page(3)
+    def open_api_site(self):
+        import webbrowser
+        webbrowser.open('https://my.telegram.org/apps')
 
     def save_and_continue(self):
         aid, ah, ph = self.aid_in.text().strip(), self.ah_in.text().strip(), self.ph_in.text().strip()
@@ -381,9 +797,10 @@ class ModernWindow(QMainWindow):
     def init_telegram_client(self):
         self.aid, self.ah, self.ph = int(self.settings.value('api_id')), self.settings.value('api_hash'), self.settings.value('phone')
         self.sp = Path.home() / '.telegram_downloader' / 'session'; self.sp.parent.mkdir(exist_ok=True)
-        self.at = AuthThread(self.aid, self.ah, self.sp, self.ph)
+        self.ensure_service().configure(self.aid, self.ah, self.sp)
+        self.at = AuthJob(self.ph)
         self.at.code_needed.connect(self.handle_code_request); self.at.password_needed.connect(self.handle_password_request)
-        self.at.auth_success.connect(self.handle_auth_success); self.at.auth_error.connect(self.handle_auth_error); self.at.start()
+        self.at.auth_success.connect(self.handle_auth_success); self.at.auth_error.connect(self.handle_auth_error); self.at.start(self.service)
 
     def handle_code_request(self, ph):
         code, ok = QInputDialog.getText(self, tr("dialog_code_title"), tr("dialog_code_message", phone=ph))
@@ -391,80 +808,114 @@ class ModernWindow(QMainWindow):
     def handle_password_request(self):
         pwd, ok = QInputDialog.getText(self, tr("dialog_password_title"), tr("dialog_password_message"), QLineEdit.EchoMode.Password)
         if ok: self.at.password = pwd
-    def handle_auth_success(self): self.scan_st.setText(tr("scan_connected")); self.scan_st.setStyleSheet("color: #28a745; font-weight: bold;")
+    def handle_auth_success(self):
+        from core.job_queue import JOBS_PATH
+        if JOBS_PATH.exists(): self.ensure_queue()  # saved jobs carry on in the background
+        self.ensure_page(1); self.scan_st.setText(tr("scan_connected")); self.scan_st.setStyleSheet("color: #28a745; font-weight: bold;")
     def handle_auth_error(self, e): QMessageBox.critical(self, tr("error"), f"{tr('error_connection', error=e)}")
 
     def start_scan(self):
         l = self.group_in.text().strip()
         if not l: return QMessageBox.warning(self, tr("error"), tr("error_no_group"))
+        self.ensure_page(2)  # results stream into the select page while scanning
         self.scan_btn.setVisible(False); self.stop_scan_btn.setVisible(True); self.scan_pr.setVisible(True)
-        self.st = ScanThread(self.aid, self.ah, self.sp, l, self.max_spin.value())
-        self.st.progress.connect(self.update_scan_progress); self.st.content_found.connect(self.show_content); self.st.error.connect(self.scan_error); self.st.start()
+        self.clear_content(); self.sel_scan_w.setVisible(True); self.thumbnails.reset()
+        use_index, verify = self.index_cb.isChecked(), self.verify_cb.isChecked()
+        self.settings.setValue('use_index', 'true' if use_index else 'false'); self.settings.setValue('verify_deleted', 'true' if verify else 'false')
+        if hasattr(self, 'st'): self.st.stop()
+        from core.media_store import MediaFilter
+        self.settings.setValue('scan_types', self.SCAN_TYPES[self.scan_types_cb.currentIndex()][0])
+        self.st = ScanJob(l, self.max_spin.value(), use_index, verify, MediaFilter(self.scan_types_cb.currentData()))
+        self.st.progress.connect(self.update_scan_progress); self.st.batch_found.connect(self.add_content); self.st.content_found.connect(self.scan_finished); self.st.removed.connect(self.media_model.remove_msg_ids); self.st.error.connect(self.scan_error); self.st.start(self.ensure_service())
 
     def stop_scan(self):
         if hasattr(self, 'st'): self.st.stop()
         self.reset_scan_ui()
-    def reset_scan_ui(self): self.scan_btn.setVisible(True); self.stop_scan_btn.setVisible(False); self.scan_pr.setVisible(False)
-    def update_scan_progress(self, p, s): self.scan_pr.setValue(p); self.scan_st.setText(s)
+    def reset_scan_ui(self): self.ensure_page(1); self.ensure_page(2); self.scan_btn.setVisible(True); self.stop_scan_btn.setVisible(False); self.scan_pr.setVisible(False); self.sel_scan_w.setVisible(False)
+    def update_scan_progress(self, p, s): self.ensure_page(1); self.ensure_page(2); self.scan_pr.setValue(p); self.scan_st.setText(s); self.sel_scan_pr.setValue(p); self.sel_scan_st.setText(s)
     def scan_error(self, e): self.reset_scan_ui(); QMessageBox.critical(self, tr("error"), f"{tr('error_scan', error=e)}")
 
-    def show_content(self, items):
-        self.reset_scan_ui()
-        while self.files_l.count():
-            c = self.files_l.takeAt(0)
-            if c.widget(): c.widget().deleteLater()
-        for item in items:
-            w = MediaItemWidget(item, self.is_dark)
-            w.changed.connect(self.update_selected_count)
-            self.files_l.addWidget(w)
-        self.files_l.addStretch(); self.update_selected_count(); self.show_select_page()
-
-    def select_all(self):
-        for i in range(self.files_l.count()):
-            w = self.files_l.itemAt(i).widget()
-            if isinstance(w, MediaItemWidget): w.set_checked(True)
-        self.update_selected_count()
-    def select_none(self):
-        for i in range(self.files_l.count()):
-            w = self.files_l.itemAt(i).widget()
-            if isinstance(w, MediaItemWidget): w.set_checked(False)
-        self.update_selected_count()
+    def clear_content(self): self.media_model.clear()
+
+    def add_content(self, batch):
+        start = len(self.media_model.store); self.media_model.append_store(batch); self.mark_already_have(start)
+        if self.stack.currentIndex() == 1: self.show_select_page()  # first results arrived - show them while the scan goes on
+
+    def scan_finished(self, count):
+        self.reset_scan_ui(); self.update_selected_count(); self.show_select_page()
+
+    def mark_already_have(self, start: int):
+        from core.content_registry import ContentRegistry, content_key
+        if self.registry is None: self.registry = ContentRegistry()
+        store = self.media_model.store
+        self.media_model.mark_have(start, self.registry.known([content_key(store, i) for i in range(start, len(store))]))
+
+    def show_item_menu(self, pos):
+        idx = self.files_v.indexAt(pos)
+        if not idx.isValid(): return
+        row = self.media_proxy.mapToSource(idx).row()
+        menu = QMenu(self)
+        menu.addAction(tr("priority_first"), lambda: self.set_item_priority(row, 1))
+        menu.addAction(tr("priority_normal"), lambda: self.set_item_priority(row, 0))
+        menu.exec(self.files_v.viewport().mapToGlobal(pos))
+
+    def set_item_priority(self, row, p):
+        self.media_model.set_priority([row], p)
+        if p: self.order_cb.setCurrentIndex(self.order_cb.findData('priority'))
+
+    def select_all(self): self.set_shown_checked(True)
+    def select_none(self): self.set_shown_checked(False)
+    def set_shown_checked(self, c: bool):
+        # with a filter or search active the buttons act on the matching rows only
+        rows = self.media_proxy.rows
+        if rows is None: self.media_model.set_all_checked(c)
+        else: self.media_model.set_rows_checked(rows, c)
     def update_selected_count(self):
-        count = sum(1 for i in range(self.files_l.count()) if isinstance(self.files_l.itemAt(i).widget(), MediaItemWidget) and self.files_l.itemAt(i).widget().is_checked())
-        self.sel_lab.setText(tr("selected_count", count=count))
+        m = self.media_model; text = tr("selected_count", count=m.checked_count()) + (f" ({naturalsize(m.selected_bytes)})" if m.selected_count else "")
+        self.sel_lab.setText(f"{text} • {tr('already_have_count', count=m.have_count, size=naturalsize(m.have_bytes))}" if m.have_count else text)
 
     def apply_filter(self):
         text = self.filter_cb.currentText()
-        search = self.search_in.text().lower()
         mapping = {tr("filter_photos"): ["photo", "image"], tr("filter_videos"): ["video"], tr("filter_documents"): ["document"], tr("filter_archives"): ["archive"]}
-        types = mapping.get(text, None)
-        for i in range(self.files_l.count()):
-            w = self.files_l.itemAt(i).widget()
-            if isinstance(w, MediaItemWidget):
-                type_match = types is None or w.item['type'] in types
-                search_match = search in w.item['name'].lower()
-                w.setVisible(type_match and search_match)
+        self.search_timer.stop(); self.media_proxy.set_filter(mapping.get(text, None), self.search_in.text())
+        filtered = self.media_proxy.rows is not None
+        self.sel_all_b.setText(tr("btn_select_matching" if filtered else "btn_select_all")); self.sel_none_b.setText(tr("btn_select_none_matching" if filtered else "btn_select_none"))
 
     def browse_path(self):
         path = QFileDialog.getExistingDirectory(self, tr("dialog_select_folder"))
         if path: self.path_in.setText(path)
 
     def start_download(self):
-        items = [self.files_l.itemAt(i).widget().item for i in range(self.files_l.count()) if isinstance(self.files_l.itemAt(i).widget(), MediaItemWidget) and self.files_l.itemAt(i).widget().is_checked()]
-        if not items: return QMessageBox.warning(self, tr("error"), tr("error_no_files_selected"))
+        if hasattr(self, 'st') and self.st.isRunning(): self.stop_scan()
+        indices = self.media_model.checked_indices()
+        if not indices: return QMessageBox.warning(self, tr("error"), tr("error_no_files_selected"))
         path = Path(self.path_in.text()); path.mkdir(parents=True, exist_ok=True)
         self.show_download_page()
-        self.dt = ParallelDownloadThread(self.aid, self.ah, self.sp, items, path)
-        self.dt.progress.connect(self.update_dl_progress); self.dt.finished.connect(self.dl_finished); self.dt.start()
+        self.settings.setValue('split_threshold_mb', self.split_spin.value()); self.settings.setValue('split_connections', self.conn_spin.value())
+        self.settings.setValue('concurrency_min', self.min_conc_spin.value()); self.settings.setValue('concurrency_max', self.max_conc_spin.value()); self.settings.setValue('download_order', self.order_cb.currentData()); self.settings.setValue('link_mode', self.link_cb.currentData())
+        config = self.engine_config()
+        self.dt = ParallelDownloadJob(self.media_model.store, indices, path, self.min_conc_spin.value(), self.max_conc_spin.value(), split_threshold=self.split_spin.value() * 2**20, connections=self.conn_spin.value(),
+                                         policy=self.order_cb.currentData(), priorities=dict(self.media_model.priorities), link_mode=self.link_cb.currentData(), verify_links=config['verify_links'],
+                                         chat=self.st.scanner.group_link if hasattr(self, 'st') else None, preallocate=config['preallocate'], fsync=config['fsync'], postprocess=config['postprocess'], postprocess_workers=config['postprocess_workers'])
+        self.dt.progress.connect(self.update_dl_progress); self.dt.finished.connect(self.dl_finished); self.dt.start(self.ensure_service())
 
     def update_dl_progress(self, p, f, c, t, speed, eta):
-        self.dl_pr.setValue(p); self.cur_f_lab.setText(tr("download_current", filename=f)); self.stats_lab.setText(f"{tr('download_progress', current=c, total=t)} | {tr('download_eta', eta=eta)}"); self.speed_lab.setText(tr("download_speed", speed=speed))
-
-    def dl_finished(self, d, f):
-        self.stop_dl_btn.setVisible(False); self.done_b.setVisible(True); self.open_f_b.setVisible(True)
-        self.dl_st.setText(tr("download_completed")); self.stats_lab.setText(tr("download_stats", downloaded=d, failed=f))
-        # Notification (simplified for sandbox)
-        print(f"NOTIFICATION: {tr('notify_title')} - {tr('notify_message', count=d)}")
+        self.ensure_page(3); self.dl_pr.setValue(p); self.cur_f_lab.setText(tr("download_current", filename=f)); self.stats_lab.setText(f"{tr('download_progress', current=c, total=t)} | {tr('download_eta', eta=eta)}"); self.speed_lab.setText(f"{tr('download_speed', speed=speed)} | {tr('download_parallel', active=self.dt.limiter.in_flight, limit=self.dt.limiter.limit)}")
+
+    def dl_finished(self, d, f, stats):
+        self.ensure_page(3); self.stop_dl_btn.setVisible(False); self.done_b.setVisible(True); self.open_f_b.setVisible(True)
+        engine = self.dt.engine; linked = f" • {tr('dedup_stats', count=engine.linked, size=naturalsize(engine.linked_bytes))}" if engine.linked else ""
+        self.dl_st.setText(tr("download_completed")); self.stats_lab.setText(f"{tr('download_stats', downloaded=d, failed=f)}{linked}\n{tr('retry_stats', **stats)}")
+        self.mark_already_have(0)  # what just finished counts as "already have" for the next selection
+        self.notify(tr('notify_title'), tr('notify_message', count=d))
+
+    def notify(self, title, message):
+        """Desktop notification from the tray; the status bar where there is no tray"""
+        if not QSystemTrayIcon.isSystemTrayAvailable(): return self.statusBar().showMessage(f"{title} - {message}", 10000)
+        if self.tray is None:
+            icon = self.windowIcon()
+            self.tray = QSystemTrayIcon(self.style().standardIcon(QStyle.StandardPixmap.SP_ArrowDown) if icon.isNull() else icon, self); self.tray.show()
+        self.tray.showMessage(title, message)
 
     def stop_download(self):
         if hasattr(self, 'dt'): self.dt.stop()
@@ -472,18 +923,32 @@ class ModernWindow(QMainWindow):
     def open_folder(self):
         p = self.path_in.text()
         if sys.platform == 'win32': os.startfile(p)
-        elif sys.platform == 'darwin': subprocess.Popen(['open', p])
-        else: subprocess.Popen(['xdg-open', p])
+        else:
+            import subprocess
+            subprocess.Popen(['open' if sys.platform == 'darwin' else 'xdg-open', p])
 
     def logout(self):
         if QMessageBox.question(self, tr("menu_settings"), tr("confirm_logout")) == QMessageBox.StandardButton.Yes:
-            self.settings.clear(); QMessageBox.information(self, tr("success"), tr("success_logout")); self.show_setup_page()
+            self.settings.clear()
+            if self.service: self.service.disconnect()
+            QMessageBox.information(self, tr("success"), tr("success_logout")); self.show_setup_page()
 
     def show_about(self): QMessageBox.about(self, tr("about_title"), tr("about_text"))
 
+    def closeEvent(self, event):
+        for job in ('st', 'dt'):
+            if hasattr(self, job): getattr(self, job).stop()
+        if self.queue_job: self.queue_job.stop()
+        self.thumbnails.stop()
+        if self.service: self.service.shutdown()
+        if self.registry: self.registry.close()
+        super().closeEvent(event)
+
 def main():
     app = QApplication(sys.argv)
     if not TELETHON_AVAILABLE: return QMessageBox.critical(None, tr("error"), tr("error_telethon_missing")), 1
-    window = ModernWindow(); window.show(); return app.exec()
+    window = ModernWindow(); window.show()
+    app.processEvents()  # first paint before Telethon and the client thread start
+    window.start_services(); return app.exec()
 
 if __name__ == '__main__': sys.exit(main())
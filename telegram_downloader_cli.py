@@ -0,0 +1,256 @@
+"""
+Telegram Downloader ULTIMATE PRO - command line (no PyQt6 needed)
+Created by Aviel.AI
+
+Usage:
+  python telegram_downloader_cli.py login [--account NAME]
+  python telegram_downloader_cli.py accounts
+  python telegram_downloader_cli.py scan @group [--full]
+  python telegram_downloader_cli.py download @group [--dest DIR] [--types video,photo]
+  python telegram_downloader_cli.py resume [@group]
+  python telegram_downloader_cli.py watch @group [--interval 300]
+  python telegram_downloader_cli.py queue add @group [--dest DIR] [--types video] [--search x] [--min-size MB] [--max-size MB]
+  python telegram_downloader_cli.py queue list | run | pause 3 | resume 3 | remove 3
+  python telegram_downloader_cli.py daemon
+  python telegram_downloader_cli.py send status | download @group | cancel --job 3 | shutdown
+
+Settings come from ~/.telegram_downloader/config.json, TGDL_* environment variables and the options below.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from core.config import load_config, CONFIG_PATH, LINK_MODES, FSYNC_POLICIES
+from i18n import tr, get_translator
+
+class ProgressLine:
+    """One self-overwriting status line on a terminal; silent when output goes to a log (cron)"""
+    INTERVAL = 0.5
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled and sys.stderr.isatty()
+        self.last = 0.0
+
+    def download(self, snap):
+        now = time.monotonic()
+        if not self.enabled or now - self.last < self.INTERVAL: return
+        self.last = now
+        from core.progress import format_eta
+        self.write(f"[{snap['percent']:3d}%] {tr('download_progress', current=snap['files_done'], total=snap['total_files'])} • "
+                   f"{tr('download_speed', speed=naturalsize(snap['speed']) + '/s')} • {tr('download_eta', eta=format_eta(snap['eta']))}")
+
+    def scan(self, seen, total, found):
+        if self.enabled: self.write(tr("scan_progress", seen=seen, total=total, count=found))
+
+    def write(self, text): sys.stderr.write(f"\r\033[K{text}"); sys.stderr.flush()
+
+    def done(self):
+        if self.enabled: sys.stderr.write("\r\033[K"); sys.stderr.flush()
+
+def report(args, result: dict):
+    if args.json: print(json.dumps(result, ensure_ascii=False)); return
+    if 'downloaded' in result:
+        linked = f" • {tr('dedup_stats', count=result['linked'], size=naturalsize(result['linked_bytes']))}" if result.get('linked') else ""
+        print(f"{result['chat']}: {tr('download_stats', downloaded=result['downloaded'], failed=result['failed'])}{linked} • {tr('retry_stats', **result['stats'])}")
+    else: print(f"{result['chat']}: {tr('scan_found_files', count=result['found'])}")
+
+def naturalsize(n) -> str:
+    import humanize
+    return humanize.naturalsize(n)
+
+def parse_types(value):
+    return [t.strip() for t in value.split(',') if t.strip()] if value else None
+
+def megabytes(value): return None if value is None else int(value * 2**20)
+
+async def cmd_login(args, config):
+    from getpass import getpass
+    from core.headless import connected
+    if args.account:  # an extra account: its own session file, its own phone
+        from core.accounts import ACCOUNTS_DIR
+        config = dict(config, session=str(ACCOUNTS_DIR / args.account), phone=None)
+    async with connected(config, login_required=False) as (client, _):
+        phone = config.get('phone') or (lambda: input(tr("cli_phone")))
+        await client.start(phone=phone, code_callback=lambda: input(tr("dialog_code_message", phone=config.get('phone') or '') + ' '),
+                           password=lambda: getpass(tr("dialog_password_message") + ' '))
+        me = await client.get_me()
+        print(tr("cli_logged_in", name=me.username or me.first_name or me.id))
+    return 0
+
+async def cmd_accounts(args, config):
+    from core.accounts import account_sessions, open_accounts
+    names = [path.name for path in account_sessions(dict(config, extra_accounts=True))]
+    async with open_accounts(dict(config, extra_accounts=True)) as accounts:
+        users = {a.name: await a.client.get_me() for a in accounts}
+    rows = [{'account': name, 'user': (users[name].username or users[name].first_name or users[name].id) if name in users else None} for name in names]
+    if args.json: print(json.dumps(rows, ensure_ascii=False)); return 0
+    if not rows: print(tr("cli_accounts_none"))
+    for row in rows: print(f"{row['account']}: {row['user'] if row['user'] is not None else tr('cli_account_logged_out')}")
+    if rows and not config['extra_accounts']: print(tr("cli_accounts_disabled"))
+    return 0
+
+async def cmd_scan(args, config):
+    from core.headless import connected, scan
+    line = ProgressLine(not args.quiet)
+    async with connected(config) as (client, _):
+        store, _scanner = await scan(client, config, args.chat, args.full, progress_callback=line.scan)
+    line.done(); report(args, {'chat': args.chat, 'found': len(store)})
+    return 0
+
+async def cmd_download(args, config, rescan=True):
+    from core.headless import connected, sync_chat, load_pending
+    if rescan: targets = {args.chat: {'dest': args.dest, 'types': parse_types(args.types)}}
+    else:
+        pending = load_pending()
+        targets = {args.chat: pending.get(args.chat, {})} if args.chat else pending
+        if not targets: print(tr("cli_nothing_pending")); return 0
+    from core.accounts import open_accounts
+    failed, line = 0, ProgressLine(not args.quiet)
+    async with connected(config) as (client, pool), open_accounts(config) as accounts:
+        for chat, job in targets.items():
+            result = await sync_chat(client, pool, config, chat, job.get('dest'), job.get('types'), getattr(args, 'full', False), rescan=rescan, progress_callback=line.download, accounts=accounts)
+            line.done(); report(args, result); failed += result['failed']
+    return 1 if failed else 0
+
+async def cmd_watch(args, config):
+    from core.headless import connected, sync_chat
+    from core.accounts import open_accounts
+    line, first = ProgressLine(not args.quiet), True
+    async with connected(config) as (client, pool), open_accounts(config) as accounts:
+        while True:
+            for chat in args.chat:
+                # the first round also picks up anything still missing; later rounds only what arrived since
+                result = await sync_chat(client, pool, config, chat, args.dest, parse_types(args.types), rescan=True, only_new=not first, progress_callback=line.download, accounts=accounts)
+                line.done()
+                if result['selected'] or args.json: report(args, result)
+            first = False
+            if not args.quiet: print(tr("cli_watch_waiting", seconds=args.interval), file=sys.stderr)
+            await asyncio.sleep(args.interval)
+
+async def cmd_queue(args, config):
+    from core.job_queue import JobQueue, JobRunner, PAUSED, QUEUED, DONE, FAILED
+    queue = JobQueue()
+    if args.action == 'add':
+        if not args.target: raise ValueError("chat is required")
+        job = queue.add(args.target, args.dest, parse_types(args.types), args.search, int(args.min_size * 2**20), int(args.max_size * 2**20))
+        print(json.dumps(job, ensure_ascii=False) if args.json else tr("cli_queue_added", id=job['id'], chat=job['chat'])); return 0
+    if args.action in ('pause', 'resume', 'remove'):  # editing jobs.json - for a queue that is not running
+        job_id = int(args.target) if (args.target or '').isdigit() else None
+        if job_id not in queue.jobs: print(tr("cli_queue_unknown", id=args.target), file=sys.stderr); return 1
+        if args.action == 'remove': queue.remove(job_id)
+        else: queue.jobs[job_id]['state'] = PAUSED if args.action == 'pause' else QUEUED; queue.save()
+        return 0
+    if args.action == 'list':
+        if args.json: print(json.dumps(list(queue.jobs.values()), ensure_ascii=False)); return 0
+        if not queue: print(tr("cli_queue_empty"))
+        for job in queue.jobs.values(): print(f"#{job['id']} {job['chat']} • {tr('queue_state_' + job['state'])}{' • ' + job['error'] if job['error'] else ''}")
+        return 0
+    from core.headless import connected
+    quiet, failed, states = args.quiet or args.json, set(), {}
+    def changed(job):
+        if states.get(job['id']) == job['state']: return
+        states[job['id']] = job['state']
+        if job['state'] == FAILED: failed.add(job['id'])
+        if not quiet: print(f"#{job['id']} {job['chat']}: {tr('queue_state_' + job['state'])}{' • ' + job['error'] if job['error'] else ''}", file=sys.stderr)
+        if job['state'] == DONE: report(args, job['result'])
+    from core.accounts import open_accounts
+    runner = JobRunner(queue, config, update_callback=changed)
+    async with connected(config) as (client, pool), open_accounts(config) as accounts:
+        await runner.run(client, pool, until_idle=True, accounts=accounts)
+    return 1 if failed else 0
+
+async def cmd_daemon(args, config):
+    from core.daemon import Daemon, use_unix_socket
+    address = config['daemon_socket'] if use_unix_socket(config) else f"127.0.0.1:{config['daemon_port']}"
+    await Daemon(config).serve(ready_callback=lambda: print(tr("cli_daemon_listening", address=address), file=sys.stderr))
+    return 0
+
+def cmd_send(args, config):
+    from core.daemon import send_request, use_unix_socket
+    request = {'cmd': args.request}
+    if args.chat: request['chat'] = args.chat
+    if args.dest: request['dest'] = args.dest
+    if args.types: request['types'] = parse_types(args.types)
+    if args.job is not None: request['job'] = args.job
+    try: reply = send_request(config, request)
+    except OSError as e:
+        address = config['daemon_socket'] if use_unix_socket(config) else f"127.0.0.1:{config['daemon_port']}"
+        print(tr("cli_daemon_unreachable", address=address, error=e), file=sys.stderr); return 2
+    print(json.dumps(reply, ensure_ascii=False, indent=None if args.json else 2))
+    return 0 if reply.get('ok') else 1
+
+async def with_metrics(command, args, config):
+    """Run a command with the metrics outlets config asks for (none by default)"""
+    from core.metrics import configure_metrics
+    metrics = configure_metrics(config)
+    await metrics.start()
+    try: return await command(args, config)
+    finally: await metrics.close()
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config', default=str(CONFIG_PATH), help="JSON settings file")
+    common.add_argument('--api-id', type=int); common.add_argument('--api-hash'); common.add_argument('--phone'); common.add_argument('--session')
+    common.add_argument('--lang', choices=('en', 'he')); common.add_argument('--json', action='store_true', help="machine-readable results")
+    common.add_argument('-q', '--quiet', action='store_true', help="no progress line")
+    common.add_argument('--metrics-port', type=int, help="serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    common.add_argument('--metrics-log', help="append JSON-lines metrics (per file, per scan, periodic samples) to this file")
+    storage = argparse.ArgumentParser(add_help=False)
+    storage.add_argument('--link-mode', choices=LINK_MODES, help="media already downloaded from another chat is linked instead of fetched again (default: hardlink)")
+    storage.add_argument('--fsync', choices=FSYNC_POLICIES, help="force data to disk: before the final rename, or also before each journal write (default: off)")
+    storage.add_argument('--no-preallocate', dest='preallocate', action='store_const', const=False, help="do not reserve file blocks up front")
+    storage.add_argument('--postprocess', type=parse_types, help="steps for each downloaded file, comma separated: mime,sha256,exif,duration,extract (results in manifest.jsonl)")
+    storage.add_argument('--postprocess-workers', type=int, help="processes for post-processing (default: one per CPU core)")
+    storage.add_argument('--no-accounts', dest='extra_accounts', action='store_const', const=False, help="download with the main session only")
+
+    scanning = argparse.ArgumentParser(add_help=False)  # read on the server where Telegram can filter, so text-heavy chats cost fewer requests
+    scanning.add_argument('--since', metavar='DATE', help="only media sent on or after this date (YYYY-MM-DD)"); scanning.add_argument('--until', metavar='DATE', help="only media sent up to this date, inclusive")
+    scanning.add_argument('--min-size', dest='scan_min_size', type=float, metavar='MB', help="only files of at least this many MB")
+    scanning.add_argument('--max-size', dest='scan_max_size', type=float, metavar='MB', help="only files of at most this many MB")
+
+    parser = argparse.ArgumentParser(prog='telegram_downloader_cli', description=__doc__.split('\n')[1])
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('login', parents=[common], help="log the session in (code / 2FA prompts)")
+    p.add_argument('--account', help="log in an extra account under this name - downloads are shared across all accounts")
+    sub.add_parser('accounts', parents=[common], help="list the extra accounts")
+    p = sub.add_parser('scan', parents=[common, scanning], help="update the local index of a chat"); p.add_argument('chat'); p.add_argument('--full', action='store_true')
+    p.add_argument('--types', dest='scan_types', type=parse_types, metavar='TYPES', help="only these, comma separated: photo,image,video,document,archive,file")
+    p = sub.add_parser('download', parents=[common, storage, scanning], help="scan a chat and download its media")
+    p.add_argument('chat'); p.add_argument('--dest'); p.add_argument('--types', help="comma separated: photo,image,video,document,archive,file"); p.add_argument('--full', action='store_true')
+    p = sub.add_parser('resume', parents=[common, storage], help="finish interrupted downloads from the index"); p.add_argument('chat', nargs='?')
+    p = sub.add_parser('watch', parents=[common, storage, scanning], help="keep downloading new media"); p.add_argument('chat', nargs='+'); p.add_argument('--dest'); p.add_argument('--types')
+    p.add_argument('--interval', type=int, default=300, help="seconds between checks")
+    p = sub.add_parser('queue', parents=[common, storage], help="persistent multi-chat job queue (run scans and downloads of many chats at once)")
+    p.add_argument('action', choices=('add', 'list', 'run', 'pause', 'resume', 'remove')); p.add_argument('target', nargs='?', help="chat to add, or job id")
+    p.add_argument('--dest'); p.add_argument('--types'); p.add_argument('--search', default='', help="file name contains")
+    p.add_argument('--min-size', type=float, default=0, help="MB"); p.add_argument('--max-size', type=float, default=0, help="MB (0 = no limit)")
+    p.add_argument('--scans', type=int, help="chats scanned at once"); p.add_argument('--downloads', type=int, help="chats downloading at once")
+    p.add_argument('--transfers', type=int, help="files in flight across all jobs (0 = no cap)"); p.add_argument('--bandwidth', type=int, help="KB/s across all jobs (0 = unlimited)")
+    sub.add_parser('daemon', parents=[common], help="accept jobs over a local socket")
+    p = sub.add_parser('send', parents=[common], help="send a request to a running daemon")
+    p.add_argument('request', choices=('status', 'scan', 'download', 'resume', 'cancel', 'shutdown')); p.add_argument('chat', nargs='?')
+    p.add_argument('--dest'); p.add_argument('--types'); p.add_argument('--job', type=int)
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    config = load_config({'api_id': args.api_id, 'api_hash': args.api_hash, 'phone': args.phone, 'session': args.session, 'language': args.lang,
+                          'link_mode': getattr(args, 'link_mode', None), 'fsync': getattr(args, 'fsync', None), 'preallocate': getattr(args, 'preallocate', None), 'extra_accounts': getattr(args, 'extra_accounts', None),
+                          'postprocess': getattr(args, 'postprocess', None), 'postprocess_workers': getattr(args, 'postprocess_workers', None), 'queue_scans': getattr(args, 'scans', None), 'queue_downloads': getattr(args, 'downloads', None),
+                          'queue_transfers': getattr(args, 'transfers', None), 'queue_bandwidth_kb': getattr(args, 'bandwidth', None),
+                          'scan_types': getattr(args, 'scan_types', None), 'scan_since': getattr(args, 'since', None), 'scan_until': getattr(args, 'until', None),
+                          'scan_min_size': megabytes(getattr(args, 'scan_min_size', None)), 'scan_max_size': megabytes(getattr(args, 'scan_max_size', None)),
+                          'metrics_port': args.metrics_port, 'metrics_log': args.metrics_log}, args.config)
+    get_translator().set_language(config['language'])
+    if args.command == 'send': return cmd_send(args, config)
+    commands = {'login': cmd_login, 'accounts': cmd_accounts, 'scan': cmd_scan, 'download': cmd_download, 'resume': lambda a, c: cmd_download(a, c, rescan=False), 'watch': cmd_watch, 'queue': cmd_queue, 'daemon': cmd_daemon}
+    from core.headless import NotAuthorizedError
+    try: return asyncio.run(with_metrics(commands[args.command], args, config))
+    except KeyboardInterrupt: return 130  # .part journals are saved on the way out - `resume` continues
+    except NotAuthorizedError: print(tr("cli_login_required"), file=sys.stderr); return 2
+    except ValueError as e: print(f"{tr('error')}: {e}", file=sys.stderr); return 2
+
+if __name__ == '__main__': sys.exit(main())
@@ -0,0 +1,37 @@
+"""
+Tests for core.config
+Created by Aviel.AI
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.config import DEFAULTS, load_config
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for key in DEFAULTS: monkeypatch.delenv('TGDL_' + key.upper(), raising=False)
+
+def test_layers(tmp_path, monkeypatch):
+    path = tmp_path / 'config.json'; path.write_text(json.dumps({'fsync': 'finish', 'split_connections': 6, 'link_mode': 'copy'}))
+    monkeypatch.setenv('TGDL_SPLIT_CONNECTIONS', '8')
+    config = load_config({'link_mode': 'symlink', 'fsync': None}, path=path)
+    assert config['fsync'] == 'finish' and config['split_connections'] == 8 and config['link_mode'] == 'symlink'
+
+@pytest.mark.parametrize('key, value', [('fsync', 'alwasy'), ('link_mode', 'hardlnk')])
+def test_unknown_choice_in_file(tmp_path, key, value):
+    path = tmp_path / 'config.json'; path.write_text(json.dumps({key: value}))
+    with pytest.raises(ValueError, match=key): load_config(path=path)
+
+def test_unknown_choice_in_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv('TGDL_FSYNC', 'sometimes')
+    with pytest.raises(ValueError, match='fsync'): load_config(path=tmp_path / 'missing.json')
+
+def test_malformed_file(tmp_path):
+    path = tmp_path / 'config.json'; path.write_text('{')
+    with pytest.raises(ValueError, match='config.json'): load_config(path=path)
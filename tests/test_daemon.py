@@ -0,0 +1,70 @@
+"""
+Tests for core.daemon
+Created by Aviel.AI
+"""
+
+import asyncio
+import json
+import os
+import socket
+import stat
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import core.daemon as daemon
+from core.daemon import Daemon, send_request
+
+@asynccontextmanager
+async def offline(config): yield None, None  # no Telegram connection: only the socket is under test
+
+@asynccontextmanager
+async def no_accounts(config): yield []
+
+def free_port() -> int:
+    with socket.socket() as s: s.bind(('127.0.0.1', 0)); return s.getsockname()[1]
+
+def raw(port: int, line: bytes) -> dict:
+    with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+        sock.sendall(line)
+        reply = sock.makefile('rb').readline()
+        assert sock.recv(1) == b''  # the daemon hung up
+    return json.loads(reply)
+
+@pytest.fixture
+def tcp_config(tmp_path, monkeypatch):
+    monkeypatch.setattr(daemon, 'connected', offline)
+    monkeypatch.setattr(daemon, 'open_accounts', no_accounts)
+    return {'daemon_socket': '', 'daemon_port': free_port(), 'daemon_token': str(tmp_path / 'daemon.token')}
+
+def test_tcp_fallback_requires_the_token(tcp_config):
+    token_path = Path(tcp_config['daemon_token'])
+    async def main():
+        ready = asyncio.Event()
+        server = asyncio.ensure_future(Daemon(tcp_config).serve(ready_callback=ready.set))
+        await asyncio.wait_for(ready.wait(), 5)
+        loop = asyncio.get_running_loop()
+        assert stat.S_IMODE(os.stat(token_path).st_mode) == 0o600
+        port = tcp_config['daemon_port']
+        assert await loop.run_in_executor(None, raw, port, b'{"cmd": "status"}\n') == {'ok': False, 'error': 'bad token'}
+        assert (await loop.run_in_executor(None, raw, port, b'{"cmd": "shutdown", "token": "guess"}\n'))['error'] == 'bad token'
+        assert not server.done()  # the shutdown without the token was ignored
+        assert await loop.run_in_executor(None, send_request, tcp_config, {'cmd': 'status'}) == {'ok': True, 'jobs': []}
+        assert await loop.run_in_executor(None, send_request, tcp_config, {'cmd': 'shutdown'}) == {'ok': True}
+        await asyncio.wait_for(server, 5)
+    asyncio.run(main())
+    assert not token_path.exists()  # removed with the daemon
+
+def test_new_token_each_start(tcp_config):
+    Path(tcp_config['daemon_token']).write_text('old')
+    os.chmod(tcp_config['daemon_token'], 0o644)
+    async def main():
+        d = Daemon(tcp_config); server = await d.listen(); server.close()
+        return d.token
+    token = asyncio.run(main())
+    assert token != 'old' and Path(tcp_config['daemon_token']).read_text() == token
+    assert stat.S_IMODE(os.stat(tcp_config['daemon_token']).st_mode) == 0o600
@@ -0,0 +1,160 @@
+"""
+Tests for core.partfile and core.writer
+Created by Aviel.AI
+"""
+
+import asyncio
+import json
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import core.writer as writer
+from core.partfile import PartFile
+from core.writer import PartWriter
+
+DATA = bytes(range(256)) * 64  # 16 KB
+
+def write(part: PartFile, start: int, end: int):
+    os.pwrite(part.fd, DATA[start:end], start); part.mark(start, end)
+
+def test_resume_half_written_part_and_finalize(tmp_path):
+    final = tmp_path / 'video.mp4'
+    part = PartFile(final, len(DATA), doc_id=7); part.open()
+    write(part, 0, 4096); write(part, 8192, 12288)
+    part.close()  # stopped half way: the journal holds what was written
+    assert json.loads(part.journal.read_text())['ranges'] == [[0, 4096], [8192, 12288]]
+
+    part = PartFile(final, len(DATA), doc_id=7)
+    assert part.ranges == [(0, 4096), (8192, 12288)] and part.done == 8192 and part.contiguous() == 4096
+    assert part.missing(4096) == [4096, 12288]
+    part.open()  # resumed, not truncated
+    assert os.pread(part.fd, 4096, 0) == DATA[:4096]
+    for offset in part.missing(4096): write(part, offset, offset + 4096)
+    assert part.ranges == [(0, len(DATA))] and part.missing(4096) == []
+    part.finalize()
+    assert final.read_bytes() == DATA
+    assert not part.part.exists() and not part.journal.exists()
+
+@pytest.mark.parametrize('size, doc_id', [(len(DATA) + 1, 7), (len(DATA), 8)])
+def test_journal_of_another_file_starts_over(tmp_path, size, doc_id):
+    part = PartFile(tmp_path / 'a.bin', len(DATA), doc_id=7); part.open(); write(part, 0, 4096); part.close()
+    part = PartFile(tmp_path / 'a.bin', size, doc_id)
+    assert part.ranges == []
+    part.open()
+    assert os.fstat(part.fd).st_size == size and os.pread(part.fd, 4096, 0) == bytes(4096)  # truncated, then sized again
+    part.close()
+
+def test_mark_merges_touching_and_overlapping_ranges(tmp_path):
+    part = PartFile(tmp_path / 'a.bin', 100, doc_id=1)
+    part.mark(10, 20); part.mark(30, 40); part.mark(50, 60)
+    assert part.ranges == [(10, 20), (30, 40), (50, 60)]
+    part.mark(20, 30)  # touches both neighbours
+    assert part.ranges == [(10, 40), (50, 60)]
+    part.mark(35, 55); part.mark(0, 5)
+    assert part.ranges == [(0, 5), (10, 60)] and part.done == 55 and part.contiguous() == 5
+
+def test_missing_short_last_part(tmp_path):
+    part = PartFile(tmp_path / 'a.bin', 10, doc_id=1)
+    part.mark(0, 4); part.mark(8, 10)
+    assert part.missing(4) == [4]
+    part.mark(4, 7)
+    assert part.missing(4) == [4]  # [4, 8) only partly covered
+
+def test_preallocate_falls_back_to_truncate(tmp_path, monkeypatch):
+    def no_fallocate(fd, offset, length): raise OSError(95, "not supported")
+    monkeypatch.setattr(os, 'posix_fallocate', no_fallocate, raising=False)
+    part = PartFile(tmp_path / 'a.bin', 5000, doc_id=1); part.open()
+    assert os.fstat(part.fd).st_size == 5000
+    part.close()
+
+def test_no_preallocate_gives_sized_file(tmp_path, monkeypatch):
+    def fail(*args): raise AssertionError("fallocate called")
+    monkeypatch.setattr(os, 'posix_fallocate', fail, raising=False)
+    part = PartFile(tmp_path / 'a.bin', 5000, doc_id=1, preallocate=False); part.open()
+    assert os.fstat(part.fd).st_size == 5000
+    part.close()
+
+def test_finalize_to_actual_size(tmp_path):
+    part = PartFile(tmp_path / 'photo.jpg', 1000, doc_id=1); part.open(); write(part, 0, 600)
+    part.finalize(600)
+    assert (tmp_path / 'photo.jpg').read_bytes() == DATA[:600]
+
+def run(coro): return asyncio.run(coro)
+
+def test_writer_gathers_contiguous_chunks(tmp_path, monkeypatch):
+    calls = []
+    real = writer.write_at
+    def counting(fd, data, offset): calls.append((offset, len(data))); return real(fd, data, offset)
+    monkeypatch.setattr(writer, 'write_at', counting)
+    monkeypatch.setattr(PartWriter, 'BUFFER_SIZE', 4096)
+    part = PartFile(tmp_path / 'a.bin', len(DATA), doc_id=1)
+    async def main():
+        w = PartWriter(part); await w.open()
+        for offset in range(0, len(DATA), 1024): await w.write(offset, DATA[offset:offset + 1024])
+        await w.close()
+    run(main())
+    assert calls == [(offset, 4096) for offset in range(0, len(DATA), 4096)]
+    assert part.ranges == [(0, len(DATA))]
+    part.finalize()
+    assert (tmp_path / 'a.bin').read_bytes() == DATA
+
+def test_writer_out_of_order_parts_start_new_buffers(tmp_path, monkeypatch):
+    calls = []
+    real = writer.write_at
+    def counting(fd, data, offset): calls.append(offset); return real(fd, data, offset)
+    monkeypatch.setattr(writer, 'write_at', counting)
+    part = PartFile(tmp_path / 'a.bin', len(DATA), doc_id=1)
+    async def main():
+        w = PartWriter(part); await w.open()
+        for offset in (8192, 0, 12288, 4096): await w.write(offset, DATA[offset:offset + 4096])
+        await w.close()
+    run(main())
+    assert calls == [8192, 0, 12288, 4096]
+    assert part.ranges == [(0, len(DATA))] and json.loads(part.journal.read_text())['ranges'] == [[0, len(DATA)]]
+
+def test_writer_keeps_at_most_max_pending_writes(tmp_path, monkeypatch):
+    monkeypatch.setattr(PartWriter, 'BUFFER_SIZE', 1024)
+    release, lock = threading.Event(), threading.Lock()
+    state = {'running': 0, 'peak': 0}
+    real = writer.write_at
+    def slow(fd, data, offset):
+        with lock: state['running'] += 1; state['peak'] = max(state['peak'], state['running'])
+        release.wait(5)
+        with lock: state['running'] -= 1
+        return real(fd, data, offset)
+    monkeypatch.setattr(writer, 'write_at', slow)
+    part = PartFile(tmp_path / 'a.bin', len(DATA), doc_id=1)
+    async def main():
+        w = PartWriter(part); await w.open()
+        for offset in range(0, 2048 * PartWriter.MAX_PENDING, 2048): await w.write(offset, DATA[offset:offset + 2048])
+        blocked = asyncio.ensure_future(w.write(4096, DATA[4096:6144]))
+        await asyncio.sleep(0.2)
+        assert not blocked.done() and len(w.pending) == PartWriter.MAX_PENDING  # backpressure
+        release.set()
+        await blocked; await w.close()
+    run(main())
+    assert state['peak'] == PartWriter.MAX_PENDING
+    assert part.ranges == [(0, 6144)]
+
+def test_writer_journals_only_written_ranges(tmp_path, monkeypatch):
+    monkeypatch.setattr(PartWriter, 'BUFFER_SIZE', 4096)
+    real = writer.write_at
+    part = PartFile(tmp_path / 'a.bin', len(DATA), doc_id=1)
+    def checked(fd, data, offset):
+        assert not any(s <= offset < e for s, e in part.ranges)  # not claimed before it is on disk
+        if offset == 8192: raise OSError(28, "No space left on device")
+        return real(fd, data, offset)
+    monkeypatch.setattr(writer, 'write_at', checked)
+    async def main():
+        w = PartWriter(part); await w.open()
+        await w.write(0, DATA[:4096]); await w.write(8192, DATA[8192:12288])
+        with pytest.raises(OSError): await w.close()
+    run(main())
+    assert part.ranges == [(0, 4096)]
+    assert PartFile(tmp_path / 'a.bin', len(DATA), doc_id=1).ranges == [(0, 4096)]  # the failed range is fetched again
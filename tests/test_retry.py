@@ -0,0 +1,189 @@
+"""
+Tests for core.retry and core.concurrency
+Created by Aviel.AI
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from telethon.errors import (
+    FloodError, FloodWaitError, FileReferenceExpiredError, FileReferenceInvalidError, RPCError, RpcCallFailError, ServerError, TimedOutError
+)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import core.concurrency as concurrency
+import core.retry as retry
+from core.concurrency import AdaptiveLimiter, TransferBudget
+from core.retry import FATAL, FLOOD, REFERENCE, TRANSIENT, RetryEngine, classify, is_retryable
+
+class Clock:
+    """time.monotonic and asyncio.sleep that only move when told to"""
+    def __init__(self): self.now, self.slept = 1000.0, []
+    def monotonic(self): return self.now
+    async def sleep(self, seconds): self.slept.append(seconds); self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(concurrency, 'time', SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(asyncio, 'sleep', clock.sleep)
+    monkeypatch.setattr(retry.random, 'uniform', lambda a, b: 1.0 if (a, b) == (0.5, 1.5) else 0.0)  # no jitter
+    return clock
+
+def run(coro): return asyncio.run(coro)
+
+@pytest.mark.parametrize('exc, kind', [
+    (FloodWaitError(None, capture=30), FLOOD),
+    (FileReferenceExpiredError(None), REFERENCE),
+    (FileReferenceInvalidError(None), REFERENCE),
+    (asyncio.TimeoutError(), TRANSIENT),
+    (ConnectionResetError(), TRANSIENT),
+    (ServerError(None, 'INTERNAL'), TRANSIENT),
+    (TimedOutError(None, 'Timeout'), TRANSIENT),
+    (RpcCallFailError(None), TRANSIENT),
+    (FloodError(None, 'FLOOD'), FATAL),  # no seconds to wait
+    (RPCError(None, 'CHANNEL_PRIVATE', 400), FATAL),
+    (ValueError("bad"), FATAL),
+])
+def test_classify(exc, kind):
+    assert classify(exc) == kind
+    assert is_retryable(exc) == (kind != FATAL)
+
+def test_backoff_doubles_up_to_max_delay(clock):
+    engine = RetryEngine(base_delay=1.0, max_delay=10.0)
+    assert [engine.backoff(a) for a in range(6)] == [1.0, 2.0, 4.0, 8.0, 10.0, 10.0]
+
+def test_transient_errors_back_off_until_attempts_run_out(clock):
+    engine = RetryEngine(max_attempts=4, base_delay=1.0)
+    calls = []
+    async def fail(): calls.append(clock.now); raise ConnectionError("dropped")
+    with pytest.raises(ConnectionError): run(engine.call(fail))
+    assert len(calls) == 4 and clock.slept == [1.0, 2.0, 4.0]
+    assert engine.stats['retries'] == 3
+
+def test_fatal_error_is_raised_at_once(clock):
+    engine = RetryEngine()
+    async def fail(): raise ValueError("bad")
+    with pytest.raises(ValueError): run(engine.call(fail))
+    assert clock.slept == [] and engine.stats['retries'] == 0
+
+def test_flood_wait_sleeps_what_the_server_asked(clock):
+    floods = []
+    engine = RetryEngine(on_flood=floods.append)
+    attempts = []
+    async def fn():
+        attempts.append(1)
+        if len(attempts) == 1: raise FloodWaitError(None, capture=42)
+        return 'ok'
+    assert run(engine.call(fn)) == 'ok'
+    assert clock.slept == [42] and floods == [42]
+    assert engine.stats['flood_waits'] == 1 and engine.stats['flood_seconds'] == 42
+
+def test_flood_wait_over_the_limit_gives_up(clock):
+    engine = RetryEngine(max_flood_wait=60)
+    async def fn(): raise FloodWaitError(None, capture=61)
+    with pytest.raises(FloodWaitError): run(engine.call(fn))
+    assert clock.slept == []
+
+def test_flood_delay_shortens_the_wait(clock):
+    engine = RetryEngine(flood_delay=lambda seconds: 0)  # another account is free
+    attempts = []
+    async def fn():
+        attempts.append(1)
+        if len(attempts) == 1: raise FloodWaitError(None, capture=300)
+        return 'ok'
+    assert run(engine.call(fn)) == 'ok' and clock.slept == [0]
+
+def test_reference_refreshes_once(clock):
+    engine = RetryEngine()
+    refreshes = []
+    async def refresh(): refreshes.append(1); return True
+    async def fn(): raise FileReferenceExpiredError(None)
+    with pytest.raises(FileReferenceExpiredError): run(engine.call(fn, refresh))
+    assert len(refreshes) == 1 and engine.stats['refreshes'] == 1 and clock.slept == []
+
+def test_reference_gone_gives_up(clock):
+    engine = RetryEngine()
+    async def refresh(): return False
+    async def fn(): raise FileReferenceExpiredError(None)
+    with pytest.raises(FileReferenceExpiredError): run(engine.call(fn, refresh))
+    assert engine.stats['refreshes'] == 0
+
+def busy(limiter: AdaptiveLimiter): limiter.in_flight = limiter.limit
+
+def test_limiter_additive_increase_while_busy_and_growing(clock):
+    limiter = AdaptiveLimiter(minimum=2, maximum=5, initial=3, interval=1.0)
+    for n in (100, 200, 300, 400, 500):
+        busy(limiter); limiter.add_bytes(n); limiter.observe_latency(0.1); limiter.adjust()
+    assert limiter.limit == 5  # capped at maximum
+    assert limiter.throughput == 500
+
+def test_limiter_no_increase_when_idle_or_slower(clock):
+    limiter = AdaptiveLimiter(minimum=2, maximum=12, initial=3, interval=1.0)
+    limiter.add_bytes(1000); limiter.adjust()
+    assert limiter.limit == 3  # slots not all in use
+    busy(limiter); limiter.add_bytes(500); limiter.adjust()
+    assert limiter.limit == 3  # throughput dropped
+
+def test_limiter_halves_on_error_and_flood(clock):
+    limiter = AdaptiveLimiter(minimum=2, maximum=12, initial=10, interval=1.0)
+    limiter.on_error(); limiter.adjust()
+    assert limiter.limit == 5
+    limiter.on_flood(30)
+    assert limiter.limit == 2 and limiter.hold_until == clock.now + 31
+    busy(limiter); limiter.add_bytes(1000); limiter.adjust()
+    assert limiter.limit == 2  # held while the FloodWait is served
+    clock.now += 31
+    busy(limiter); limiter.add_bytes(1000); limiter.adjust()
+    assert limiter.limit == 3
+
+def test_limiter_trims_on_latency_rise(clock):
+    limiter = AdaptiveLimiter(minimum=2, maximum=12, initial=6, interval=1.0)
+    limiter.observe_latency(0.1); limiter.adjust()
+    limiter.observe_latency(0.2); limiter.observe_latency(0.2); limiter.adjust()
+    assert limiter.limit == 5 and limiter.best_latency == 0.1
+
+def test_limiter_wakes_waiters_when_raised():
+    async def main():
+        limiter = AdaptiveLimiter(minimum=1, maximum=4, initial=1, interval=1.0)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0); await asyncio.sleep(0)
+        assert not waiter.done()
+        limiter.limit = 2; limiter.wake()
+        await waiter
+        assert limiter.in_flight == 2
+    run(main())
+
+def test_budget_throttles_to_the_rate(clock):
+    budget = TransferBudget(bytes_per_second=1000)
+    budget.refilled = clock.now
+    async def main():
+        await budget.throttle(500)   # no tokens yet: wait half a second
+        await budget.throttle(1000)  # the wait only paid off the debt: a full second more
+        clock.now += 2
+        await budget.throttle(800)   # the bucket holds at most one second
+    run(main())
+    assert clock.slept == [0.5, 1.0]
+    assert budget.tokens == 200
+
+def test_budget_unlimited_never_waits(clock):
+    budget = TransferBudget()
+    run(budget.throttle(10**9))
+    assert clock.slept == []
+
+def test_budget_caps_transfers_and_resizes():
+    async def main():
+        budget = TransferBudget(max_transfers=1)
+        await budget.__aenter__()
+        waiter = asyncio.ensure_future(budget.__aenter__())
+        await asyncio.sleep(0); await asyncio.sleep(0)
+        assert not waiter.done()
+        budget.configure(2, 0)
+        await waiter
+        assert budget.in_use == 2
+    run(main())
@@ -0,0 +1,133 @@
+"""
+Tests for core.scan_index and the Scanner's incremental ranges
+Created by Aviel.AI
+"""
+
+import asyncio
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fake_telegram import FakeTelegram, CHANNEL_ID
+from core.media_store import MediaStore
+from core.scan_index import ScanIndex
+from core.scanner import Scanner
+
+CHAT = -1000000000000 - CHANNEL_ID  # the fake channel's peer id
+
+def media_store(fake: FakeTelegram, ids) -> MediaStore:
+    store = MediaStore()
+    for i in ids: store.add_message(fake.message(i))
+    return store
+
+def truth(fake: FakeTelegram) -> int: return sum(1 for i in range(1, fake.messages + 1) if fake.draw(i))
+
+@pytest.fixture
+def index():
+    index = ScanIndex(':memory:')
+    yield index
+    index.close()
+
+def test_add_leaves_the_watermark(index):
+    fake = FakeTelegram(messages=50)
+    assert index.watermark(CHAT) == 0 and index.low_water(CHAT) == 0
+    index.add(CHAT, media_store(fake, range(50, 0, -1)))
+    assert index.watermark(CHAT) == 0  # rows are in, the range is not complete yet
+    assert index.msg_ids(CHAT) == [i for i in range(50, 0, -1) if fake.draw(i)]
+    assert index.load(CHAT).msg_ids.tolist() == index.msg_ids(CHAT)  # newest first
+
+def test_set_watermark(index):
+    index.set_watermark(CHAT, 500, 301)
+    assert (index.watermark(CHAT), index.low_water(CHAT)) == (500, 301)
+    index.set_watermark(CHAT, 500, 0)  # the older range finished
+    assert (index.watermark(CHAT), index.low_water(CHAT)) == (500, 0)
+    index.set_watermark(CHAT, 400, 0)  # never moves down
+    assert index.watermark(CHAT) == 500
+    index.clear(CHAT)
+    assert (index.watermark(CHAT), index.low_water(CHAT)) == (0, 0)
+
+def test_migrates_an_index_without_low_id_and_preview(tmp_path):
+    path = tmp_path / 'index.db'
+    db = sqlite3.connect(str(path))
+    db.executescript("""
+        CREATE TABLE chats (chat_id INTEGER PRIMARY KEY, max_id INTEGER NOT NULL DEFAULT 0, scanned_at REAL);
+        CREATE TABLE media (chat_id INTEGER NOT NULL, msg_id INTEGER NOT NULL, date INTEGER NOT NULL, type INTEGER NOT NULL, name TEXT,
+                            size INTEGER NOT NULL, doc_id INTEGER NOT NULL, access_hash INTEGER NOT NULL, dc_id INTEGER NOT NULL,
+                            file_ref BLOB, thumb TEXT, PRIMARY KEY (chat_id, msg_id)) WITHOUT ROWID;
+        INSERT INTO chats VALUES (-100123, 900, 0);
+        INSERT INTO media VALUES (-100123, 900, 0, 2, 'a.mp4', 10, 1, 2, 2, X'00', 'm');
+    """)
+    db.commit(); db.close()
+    index = ScanIndex(path)
+    try:
+        assert (index.watermark(-100123), index.low_water(-100123)) == (900, 0)  # an old index was complete below its watermark
+        store = index.load(-100123)
+        assert store.msg_ids.tolist() == [900] and store.name(0) == 'a.mp4'
+        index.set_watermark(-100123, 950, 0)
+        assert index.watermark(-100123) == 950
+    finally: index.close()
+
+async def scan(fake: FakeTelegram, path, max_messages=100000, stop_at=None):
+    """One Scanner run; returns (distinct ids reported, messages read, requests made)"""
+    store = MediaStore()
+    scanner = Scanner('@fake', max_messages, index_path=path, batch_callback=store.extend)
+    if stop_at:
+        flush = scanner.flush
+        def stopping():
+            flush()
+            if scanner.seen >= stop_at: scanner.stop()
+        scanner.flush = stopping
+    before = fake.requests
+    await scanner.run(fake.client())
+    return len(set(store.msg_ids)), scanner.seen, fake.requests - before
+
+def marks(path):
+    index = ScanIndex(path)
+    try: return index.watermark(CHAT), index.low_water(CHAT), len(index.msg_ids(CHAT))
+    finally: index.close()
+
+def test_first_then_incremental_scan(tmp_path):
+    path, fake = tmp_path / 'index.db', FakeTelegram(messages=3000)
+    found, seen, _ = asyncio.run(scan(fake, path))
+    assert found == truth(fake) and seen == 3000
+    assert marks(path) == (3000, 0, truth(fake))
+    fake.messages = 3250
+    found, seen, _ = asyncio.run(scan(fake, path))
+    assert found == truth(fake) and seen == 250  # only the new messages are read
+    assert marks(path) == (3250, 0, truth(fake))
+
+def test_interrupted_scan_records_the_range_it_read(tmp_path):
+    path, fake = tmp_path / 'index.db', FakeTelegram(messages=3000)
+    _, seen, _ = asyncio.run(scan(fake, path, stop_at=800))
+    watermark, low, rows = marks(path)
+    assert (watermark, low) == (3000, 3000 - seen + 1) and 0 < rows < truth(fake)  # [low, 3000] is indexed, older ids are not
+    found, seen, _ = asyncio.run(scan(fake, path))
+    assert seen == low - 1  # only the ids below the recorded range
+    assert found == truth(fake) and marks(path) == (3000, 0, truth(fake))
+
+def test_limited_scans_fill_in_older_messages(tmp_path):
+    path, fake = tmp_path / 'index.db', FakeTelegram(messages=5000)
+    asyncio.run(scan(fake, path, max_messages=1500))
+    watermark, low, _ = marks(path)
+    assert watermark == 5000 and 0 < low <= 3501
+    lows = [low]
+    while lows[-1]:
+        asyncio.run(scan(fake, path, max_messages=1500))
+        lows.append(marks(path)[1])
+        assert lows[-1] < lows[-2] and len(lows) < 6
+    fake.messages = 5100
+    found, seen, _ = asyncio.run(scan(fake, path, max_messages=1500))
+    assert seen == 100 and found == truth(fake) and marks(path) == (5100, 0, truth(fake))
+
+def test_mostly_text_chat_scans_through_search(tmp_path):
+    path, fake = tmp_path / 'index.db', FakeTelegram(messages=5000, media_ratio=0.05)
+    store = MediaStore()
+    scanner = Scanner('@fake', 100000, index_path=path, batch_callback=store.extend)
+    asyncio.run(scanner.run(fake.client()))
+    assert scanner.search and len(set(store.msg_ids)) == truth(fake)
+    assert fake.requests < 5000 // 100  # fewer than paging the history
+    assert marks(path) == (5000, 0, truth(fake))
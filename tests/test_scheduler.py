@@ -0,0 +1,28 @@
+"""
+Tests for core.scheduler
+Created by Aviel.AI
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.scheduler import DownloadScheduler
+
+class Store:
+    """Just the columns the scheduler reads"""
+    def __init__(self, sizes): self.sizes, self.dates = sizes, list(range(len(sizes)))
+
+def test_upcoming_returns_at_most_n_with_both_lanes_over_n():
+    sizes = [2**20] * 10 + [2**30] * 10  # ten small files, ten large ones
+    scheduler = DownloadScheduler(Store(sizes), list(range(len(sizes))), large_threshold=64 * 2**20)
+    assert len(scheduler.small) > 4 and len(scheduler.large) > 4
+    upcoming = scheduler.upcoming(4)
+    assert upcoming == [0, 1, 2, 3]
+    assert len(scheduler.upcoming(15)) == 15
+
+def test_upcoming_falls_back_to_the_large_lane():
+    sizes = [2**20] * 2 + [2**30] * 5
+    scheduler = DownloadScheduler(Store(sizes), list(range(len(sizes))), large_threshold=64 * 2**20)
+    assert scheduler.upcoming(4) == [0, 1, 2, 3]
@@ -0,0 +1,97 @@
+"""
+Tests for core.search_index and core.media_store.MediaFilter
+Created by Aviel.AI
+"""
+
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from core.media_store import TYPE_CODES, MediaFilter
+from core.search_index import SearchIndex
+
+PHOTO, VIDEO, DOCUMENT, ARCHIVE = (TYPE_CODES[t] for t in ('photo', 'video', 'document', 'archive'))
+
+class Store:
+    """Just what SearchIndex reads"""
+    def __init__(self, rows): self.names, self.types = [n for n, _ in rows], [t for _, t in rows]
+    def __len__(self): return len(self.names)
+    def name(self, i): return self.names[i]
+    def append(self, name, code): self.names.append(name); self.types.append(code)
+
+ROWS = [('Holiday_Video.mp4', VIDEO), ('photo_1.jpg', PHOTO), ('report.pdf', DOCUMENT), ('holiday.zip', ARCHIVE),
+        ('video_2.mp4', VIDEO), ('ÉTÉ.jpg', PHOTO), ('notes.pdf', DOCUMENT), ('backup_holiday.zip', ARCHIVE)]
+
+def linear(store, types, text):
+    """The answer query() must give, the slow way"""
+    return [i for i in range(len(store)) if (types is None or store.types[i] in types) and text.casefold() in store.name(i).casefold()]
+
+@pytest.fixture
+def index(): return SearchIndex(Store(ROWS))
+
+def test_type_filter(index):
+    assert list(index.query()) == list(range(len(ROWS)))
+    assert list(index.query([VIDEO])) == [0, 4]
+    assert list(index.query([PHOTO, ARCHIVE])) == [1, 3, 5, 7]
+    assert list(index.query([TYPE_CODES['image']])) == []
+
+@pytest.mark.parametrize('types, text', [(None, 'holiday'), (None, 'HOL'), ([ARCHIVE], 'holiday'), ([VIDEO, PHOTO], '.jp'), (None, 'été'),
+                                         (None, 'p'), (None, 'mp'), (None, 'xyz'), ([DOCUMENT], 'pdf'), (None, 'day_v'), (None, 'olid')])
+def test_text_and_types_combine(index, types, text):
+    assert list(index.query(types, text)) == linear(Store(ROWS), types, text)
+
+def test_extended_text_narrows_the_previous_answer(index):
+    assert list(index.query(None, 'h')) == [0, 1, 3, 7]
+    index.names[2] = 'hover.pdf'  # not in the previous answer, so a narrowed search does not look at it
+    assert list(index.query(None, 'ho')) == [0, 1, 3, 7]
+    assert list(index.query(None, 'hol')) == [0, 3, 7]
+
+def test_replaced_or_shortened_text_starts_over(index):
+    assert list(index.query(None, 'holiday')) == [0, 3, 7]
+    assert list(index.query(None, 'repo')) == [2]  # not an extension of 'holiday'
+    assert list(index.query(None, 'rep')) == [2]
+    assert list(index.query(None, 'p')) == linear(Store(ROWS), None, 'p')  # shortened: every row again
+    assert list(index.query([ARCHIVE], 'holiday')) == [3, 7]  # other types: not narrowed from the untyped answer
+
+def test_start_returns_only_appended_rows():
+    store = Store(ROWS)
+    index = SearchIndex(store)
+    assert list(index.query(None, 'holiday')) == [0, 3, 7]
+    n = len(store)
+    store.append('holiday_2.mp4', VIDEO); store.append('other.mp4', VIDEO); store.append('HOLIDAY.zip', ARCHIVE)
+    index.extend(store, n)
+    assert list(index.query(None, 'holiday', start=n)) == [8, 10]
+    assert list(index.query([VIDEO], 'holiday', start=n)) == [8]
+    assert list(index.query([VIDEO], start=n)) == [8, 9]
+    assert list(index.query(None, 'holiday')) == linear(store, None, 'holiday')  # extend() dropped the cached answer
+
+def test_trigram_lists(index):
+    assert list(index.grams['hol']) == [0, 3, 7]
+    assert list(index.gram_rows('holiday')) == [0, 3, 7]
+    assert index.gram_rows('ho') is None and list(index.gram_rows('qqq')) == []
+
+def test_media_filter_empty_keeps_everything():
+    assert not MediaFilter() and not MediaFilter(['photo', 'image', 'video', 'document', 'archive', 'file'])
+    assert MediaFilter().accepts(PHOTO, 0, 0)
+
+def test_media_filter_types_dates_sizes():
+    since, until = datetime(2024, 1, 1, tzinfo=timezone.utc), datetime(2024, 2, 1, tzinfo=timezone.utc)
+    f = MediaFilter(['video', 'photo'], since, until, min_size=100, max_size=1000)
+    assert f and f.types == ['photo', 'video']
+    t = int(since.timestamp())
+    assert f.accepts(VIDEO, t, 100) and f.accepts(PHOTO, t, 1000)
+    assert not f.accepts(ARCHIVE, t, 500)
+    assert not f.accepts(VIDEO, t - 1, 500) and not f.accepts(VIDEO, int(until.timestamp()), 500)  # max_date is exclusive
+    assert not f.accepts(VIDEO, t, 99) and not f.accepts(VIDEO, t, 1001)
+
+def test_media_filter_rows():
+    store = Store(ROWS)
+    store.dates, store.sizes = [0] * len(ROWS), [10, 20, 30, 40, 50, 60, 70, 80]
+    assert MediaFilter(['archive'], min_size=50).rows(store) == [7]
+
+def test_media_filter_unknown_type():
+    with pytest.raises(ValueError, match='gif'): MediaFilter(['video', 'gif'])
@@ -0,0 +1,86 @@
+"""
+Tests for core.segmented
+Created by Aviel.AI
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from telethon.tl import functions
+from telethon.tl.alltlobjects import LAYER
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import core.segmented as segmented
+from core.partfile import PartFile
+from core.retry import is_retryable
+from core.segmented import STREAM_REQUEST_SIZE, SenderPool, StreamDownload
+
+class Sender:
+    """MTProtoSender that records what is sent; a new auth key is made when none is given"""
+    made = 0
+    def __init__(self, auth_key, loggers=None):
+        self.auth_key, self.sent = auth_key, []
+    async def connect(self, connection):
+        if self.auth_key is None: Sender.made += 1; self.auth_key = f'key{Sender.made}'
+    async def send(self, request): self.sent.append(request)
+    async def disconnect(self): pass
+
+class Client:
+    def __init__(self):
+        self.session = SimpleNamespace(dc_id=2, auth_key='home-key')
+        self._log, self._proxy = None, None
+        self._init_request = functions.InitConnectionRequest(api_id=1, device_model='d', system_version='s', app_version='a',
+                                                             system_lang_code='en', lang_pack='', lang_code='en', query=functions.help.GetConfigRequest())
+        self.exports = 0
+    async def _get_dc(self, dc_id): return SimpleNamespace(ip_address='127.0.0.1', port=443, id=dc_id)
+    def _connection(self, *args, **kwargs): return None
+    async def __call__(self, request):
+        assert isinstance(request, functions.auth.ExportAuthorizationRequest)
+        self.exports += 1
+        return SimpleNamespace(id=request.dc_id, bytes=b'auth')
+
+def first_request(sender):
+    request = sender.sent[0]
+    assert isinstance(request, functions.InvokeWithLayerRequest) and request.layer == LAYER
+    assert isinstance(request.query, functions.InitConnectionRequest) and request.query.api_id == 1
+    return request.query.query
+
+def test_every_sender_starts_with_layer_and_init_connection(monkeypatch):
+    monkeypatch.setattr(segmented, 'MTProtoSender', Sender)
+    client = Client(); original = client._init_request.query
+    pool = SenderPool(client)
+    async def main(): return await pool.get(4, 3), await pool.get(2, 2), await pool.get(4, 4)
+    foreign, home, more = asyncio.run(main())
+    assert len(foreign) == 3 and len(home) == 2 and len(more) == 4 and more[:3] == foreign
+    assert client.exports == 1  # the authorization is exported once per DC
+    assert isinstance(first_request(foreign[0]), functions.auth.ImportAuthorizationRequest)
+    assert all(isinstance(first_request(s), functions.help.GetConfigRequest) for s in foreign[1:] + home + more[3:])
+    assert all(s.auth_key == foreign[0].auth_key for s in more) and all(s.auth_key == 'home-key' for s in home)
+    assert client._init_request.query is original  # the client's own init request is not touched
+
+class StreamClient:
+    """iter_download that stops after `end` bytes"""
+    def __init__(self, data: bytes, end: int): self.data, self.end = data, end
+    async def iter_download(self, location, offset=0, request_size=0, file_size=None, dc_id=None):
+        for o in range(offset, self.end, request_size): yield self.data[o:min(o + request_size, self.end)]
+
+def test_stream_cut_short_is_retried_and_resumes(tmp_path):
+    data = bytes(range(256)) * 4096  # 1 MB: two stream requests
+    final = tmp_path / 'a.zip'
+    part = PartFile(final, len(data), doc_id=1)
+    with pytest.raises(ConnectionError): asyncio.run(StreamDownload(StreamClient(data, STREAM_REQUEST_SIZE), None, part, 2).run())
+    assert is_retryable(ConnectionError()) and not final.exists()
+    part = PartFile(final, len(data), doc_id=1)
+    assert part.contiguous() == STREAM_REQUEST_SIZE
+    asyncio.run(StreamDownload(StreamClient(data, len(data)), None, part, 2).run())
+    assert final.read_bytes() == data and not part.journal.exists()
+
+def test_photo_stream_end_is_its_size(tmp_path):
+    data = b'p' * 70000
+    part = PartFile(tmp_path / 'a.jpg', 90000, doc_id=1)  # estimated from the largest PhotoSize
+    asyncio.run(StreamDownload(StreamClient(data, len(data)), None, part, 2, size_estimated=True).run())
+    assert (tmp_path / 'a.jpg').read_bytes() == data
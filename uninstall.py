@@ -47,6 +47,7 @@ class UninstallThread(QThread):
                     'telegram_downloader.py',
                     'telegram_downloader_v2.py',
                     'i18n.py',
+                    'telegram_downloader_cli.py',
                     'requirements.txt',
                     'telegram_downloader.spec',
                     'uninstall.py',
@@ -69,10 +70,10 @@ class UninstallThread(QThread):
                             except:
                                 pass
                 
-                # Remove __pycache__
-                pycache = app_path / '__pycache__'
-                if pycache.exists():
-                    shutil.rmtree(pycache, ignore_errors=True)
+                # Remove the engine package and __pycache__
+                for folder in ('core', 'benchmarks', '__pycache__'):
+                    if (app_path / folder).exists():
+                        shutil.rmtree(app_path / folder, ignore_errors=True)
                 
                 current_step += 1
             